@@ -42,7 +42,19 @@ a = Analysis(
         'json',
         'threading',
         'platform',
-        'numpy'
+        'numpy',
+        # App modules imported by name in a background thread (startup.BackgroundImport),
+        # invisible to PyInstaller's analysis of the main script
+        'transcription_engine',
+        'checkpoint',
+        'audio_stream',
+        'batch_scheduler',
+        'batch_sizing',
+        'chunking',
+        'model_registry',
+        'parallel',
+        'quantization',
+        'vad'
     ],
     hookspath=[],
     hooksconfig={},
@@ -2,6 +2,9 @@ import os
 import sys
 import subprocess
 
+from model_catalog import MODEL_CATALOG
+from model_registry import ModelRegistry
+
 # Check if running as a frozen application
 is_frozen = getattr(sys, 'frozen', False)
 
@@ -18,9 +21,9 @@ def main():
     main_app_path = os.path.join(app_dir, "audio transcription code.py")
     main_exe_path = os.path.join(app_dir, "AudioTransPro.exe")
     
-    # Check if the model directory exists
-    model_dir = os.path.join(app_dir, "models")
-    models_exist = os.path.exists(model_dir) and os.path.isdir(model_dir)
+    # Check that at least one catalogue model is downloaded and complete
+    registry = ModelRegistry(os.path.join(app_dir, "models"))
+    models_exist = any(registry.is_available(entry["id"]) for entry in MODEL_CATALOG.values())
     
     if not models_exist:
         # Models don't exist, run the downloader first
@@ -1,10 +1,8 @@
-import torch
+from startup import BackgroundImport, check_startup_budget
 import os
-from datetime import datetime
 import threading
+import multiprocessing
 import time
-import librosa
-from docx import Document
 import json
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
@@ -13,15 +11,29 @@ from PIL import Image, ImageTk
 import sys
 import platform
 
-# Try to import accelerate - it's optional but will improve performance
-try:
-    import accelerate
-    HAS_ACCELERATE = True
-except ImportError:
-    HAS_ACCELERATE = False
+from audio_cache import AudioCache
+from instrumentation import enable_metrics_log, format_metrics_summary
+from model_catalog import AUTO_MODEL, DEFAULT_MODEL, MODEL_CATALOG, catalog_name, select_model_id
+from preferences import PREFERENCES_FILE, load_preferences_file
+from progress import CancellationToken, TranscriptionCancelled, format_duration
+from result_cache import ResultCache
+from service import DEFAULT_SERVICE_URL, ServiceClient
+from transcript_files import format_chunk_line, get_audio_duration, save_docx_file, save_txt_file
 
-# Now import the transformers components
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+# Le moteur partagé avec la ligne de commande (modèle, pipeline et sauvegarde) importe torch
+# et transformers : il est importé en arrière-plan, une fois la fenêtre affichée
+engine_import = BackgroundImport("transcription_engine", "checkpoint")
+# Délai avant de lancer l'import, pour laisser la fenêtre se dessiner (ms)
+ENGINE_INIT_DELAY_MS = 50
+
+
+def engine_api():
+    """Module transcription_engine (attend la fin de son import si nécessaire)"""
+    return engine_import.module("transcription_engine")
+
+
+# Délai maximal sans aucun segment terminé avant d'abandonner une transcription
+STALL_TIMEOUT_S = 600
 
 # Définir les thèmes et l'apparence
 ctk.set_appearance_mode("System")  # Modes: "Dark", "Light", "System"
@@ -51,6 +63,13 @@ class ModernAudioTranscriptionApp(ctk.CTk):
         # Nouveaux paramètres
         self.timestamps_var = ctk.BooleanVar(value=False)
         self.beam_size_var = ctk.IntVar(value=1)
+        self.streaming_var = ctk.BooleanVar(value=False)
+        self.vad_var = ctk.BooleanVar(value=False)
+        self.result_cache_var = ctk.BooleanVar(value=True)
+        self.int8_var = ctk.BooleanVar(value=False)
+        self.model_choice = ctk.StringVar(value=DEFAULT_MODEL)
+        self.assisted_var = ctk.BooleanVar(value=False)
+        self.preload_var = ctk.BooleanVar(value=False)
 
         # Mappings
         self.lang_mapping = {
@@ -62,27 +81,127 @@ class ModernAudioTranscriptionApp(ctk.CTk):
         }
         self.reverse_lang_mapping = {v: k for k, v in self.lang_mapping.items()}
         self.format_mapping = {"Texte (.txt)": "txt", "Document Word (.docx)": "docx"}
+        self.model_mapping = {"Automatique": AUTO_MODEL, **{name: name for name in MODEL_CATALOG}}
         self.reverse_format_mapping = {v: k for k, v in self.format_mapping.items()}
         
-        # Variables du modèle
-        self.model = None
-        self.processor = None
-        self.pipe = None
+        # Variables du modèle (le moteur est créé en arrière-plan, voir start_engine_init)
+        self._engine = None
+        self.engine_error = None
+        self.engine_ready = threading.Event()
+        # Transcriptions confiées au service local (modèle chargé une fois pour tous les clients)
+        self.service_mode = False
+        self.audio_cache = self.create_audio_cache()
         self.audio_duration = 0
         self.progress_stop = False
         self.transcription_running = False  # Nouvelle variable pour suivre l'état de la transcription
+        self.cancel_token = None
+        # Chargement du modèle en cours, et transcription demandée pendant ce chargement
+        self.model_loading = False
+        self.pending_transcription = False
         
         # Charger les préférences si disponibles
         self.load_preferences()
         
         # Configurer l'interface utilisateur
         self.setup_ui()
+        self.after(ENGINE_INIT_DELAY_MS, self.start_engine_init)
+
+    @property
+    def engine(self):
+        """Moteur de transcription (attend la fin de son initialisation en arrière-plan)"""
+        self.engine_ready.wait()
+        if self._engine is None:
+            raise RuntimeError(f"Le moteur de transcription n'a pas pu être initialisé: {self.engine_error}")
+        return self._engine
+
+    def engine_loaded(self):
+        """Indiquer, sans attendre l'initialisation du moteur, si le modèle est chargé et préchauffé"""
+        return not self.model_loading and self._engine is not None and self._engine.is_loaded
+
+    def start_engine_init(self):
+        """Importer le moteur et le créer dans un thread, sans bloquer la fenêtre"""
+        check_startup_budget()
+        engine_prefs = load_preferences_file()
+        if engine_prefs.get("metrics_log"):
+            enable_metrics_log(engine_prefs["metrics_log"])
+        preload = self.preload_var.get()
+
+        def _init():
+            try:
+                # Un service local (audiotrans serve) garde déjà un modèle chargé : la fenêtre
+                # lui confie les transcriptions au lieu de charger son propre modèle
+                engine = ServiceClient.connect(engine_prefs.get("service_url", DEFAULT_SERVICE_URL))
+                self.service_mode = engine is not None
+                if engine is None:
+                    module = engine_api()
+                    print(f"Moteur importé en arrière-plan : {engine_import.report()}")
+                    if not module.HAS_ACCELERATE:
+                        print("WARNING: The 'accelerate' package is not installed.")
+                        print("The application will still function, but for better performance")
+                        print("consider installing it with: pip install 'accelerate>=0.26.0'")
+                    engine = module.TranscriptionEngine(audio_cache=self.audio_cache,
+                                                        result_cache=self.create_result_cache(),
+                                                        checkpoints=self.create_checkpoint_store())
+                    engine.memory_budget_mb = engine_prefs.get("memory_budget_mb")
+                    engine.workers = max(1, int(engine_prefs.get("workers", 1)))
+                    engine.chunking = engine_prefs.get("chunking", "stride")
+                self._engine = engine
+                self.apply_engine_settings()
+                self.after(0, self.show_device_info)
+                if preload:
+                    self.after(0, self.load_model)
+            except Exception as e:
+                self.engine_error = e
+                self.status_var.set("Erreur lors de l'initialisation du moteur de transcription")
+            finally:
+                self.engine_ready.set()
+
+        threading.Thread(target=_init, daemon=True).start()
+
+    def apply_engine_settings(self):
+        """Reporter sur le moteur les options de la fenêtre (INT8, décodage assisté)"""
+        self._engine.int8 = self.int8_var.get() and self._engine.device == "cpu"
+        self._engine.assisted = self.assisted_var.get()
+
+    def show_device_info(self):
+        """Afficher le périphérique de calcul détecté par le moteur"""
+        if self.service_mode:
+            self.device_info.set(f"Service local: {self._engine.model_id} ({self._engine.device})")
+        elif self._engine.device.startswith("cuda"):
+            import torch  # déjà importé par le moteur
+            self.device_info.set(f"GPU: {torch.cuda.get_device_name(0)}")
+        else:
+            self.device_info.set("Périphérique: CPU")
         
+    def create_audio_cache(self):
+        """Créer le cache de l'audio décodé (désactivé si son dossier est inaccessible)"""
+        try:
+            return AudioCache()
+        except OSError as e:
+            print(f"Cache audio désactivé: {e}")
+            return None
+        
+    def create_result_cache(self):
+        """Créer le cache des transcriptions (désactivé si son dossier est inaccessible)"""
+        try:
+            return ResultCache()
+        except OSError as e:
+            print(f"Cache des transcriptions désactivé: {e}")
+            return None
+        
+    def create_checkpoint_store(self):
+        """Créer le dossier des points de reprise (désactivé s'il est inaccessible)"""
+        try:
+            return engine_import.module("checkpoint").CheckpointStore()
+        except OSError as e:
+            print(f"Points de reprise désactivés: {e}")
+            return None
+
     def load_preferences(self):
         """Charger les préférences utilisateur depuis un fichier JSON"""
         try:
-            if os.path.exists("audiotrans_preferences.json"):
-                with open("audiotrans_preferences.json", "r") as f:
+            if os.path.exists(PREFERENCES_FILE):
+                with open(PREFERENCES_FILE, "r") as f:
                     prefs = json.load(f)
                     
                     if "theme" in prefs:
@@ -105,6 +224,20 @@ class ModernAudioTranscriptionApp(ctk.CTk):
                         self.timestamps_var.set(prefs["timestamps"])
                     if "beam_size" in prefs:
                         self.beam_size_var.set(prefs["beam_size"])
+                    if "streaming" in prefs:
+                        self.streaming_var.set(prefs["streaming"])
+                    if "vad" in prefs:
+                        self.vad_var.set(prefs["vad"])
+                    if "result_cache" in prefs:
+                        self.result_cache_var.set(prefs["result_cache"])
+                    if "int8" in prefs:
+                        self.int8_var.set(prefs["int8"])
+                    if "model" in prefs:
+                        self.model_choice.set(prefs["model"])
+                    if "assisted" in prefs:
+                        self.assisted_var.set(prefs["assisted"])
+                    if "preload_model" in prefs:
+                        self.preload_var.set(prefs["preload_model"])
         except Exception as e:
             print(f"Erreur lors du chargement des préférences: {e}")
             
@@ -117,10 +250,19 @@ class ModernAudioTranscriptionApp(ctk.CTk):
                 "format": self.output_format.get(),
                 "precision": self.precision_value.get(),  # Sauvegarde de la précision
                 "timestamps": self.timestamps_var.get(),  # Sauvegarde des timestamps
-                "beam_size": self.beam_size_var.get()     # Sauvegarde de la taille du faisceau
+                "beam_size": self.beam_size_var.get(),    # Sauvegarde de la taille du faisceau
+                "streaming": self.streaming_var.get(),    # Sauvegarde de l'affichage en continu
+                "vad": self.vad_var.get(),                # Sauvegarde de la détection de parole
+                "result_cache": self.result_cache_var.get(),  # Réutilisation des transcriptions
+                "int8": self.int8_var.get(),              # Modèle quantifié INT8 sur CPU
+                "model": self.model_choice.get(),         # Taille du modèle (ou "auto")
+                "assisted": self.assisted_var.get(),      # Décodage assisté par un modèle d'ébauche
+                "preload_model": self.preload_var.get()   # Chargement du modèle au démarrage
             }
             
-            with open("audiotrans_preferences.json", "w") as f:
+            # Conserver les réglages sans équivalent dans la fenêtre (ligne de commande)
+            prefs = {**load_preferences_file(), **prefs}
+            with open(PREFERENCES_FILE, "w") as f:
                 json.dump(prefs, f)
         except Exception as e:
             print(f"Erreur lors de la sauvegarde des préférences: {e}")
@@ -166,6 +308,30 @@ class ModernAudioTranscriptionApp(ctk.CTk):
         )
         self.load_model_btn.pack(side="left", padx=15)
         
+        # Choix du modèle (catalogue ou choix automatique selon la machine)
+        model_menu = ctk.CTkOptionMenu(
+            toolbar_frame,
+            values=list(self.model_mapping.keys()),
+            command=self.on_model_select,
+            width=150,
+            height=36,
+            dynamic_resizing=False,
+            font=("Segoe UI", 12)
+        )
+        model_menu.set(next((label for label, name in self.model_mapping.items()
+                             if name == self.model_choice.get()), self.model_choice.get()))
+        model_menu.pack(side="left", padx=(0, 10))
+        
+        # Chargement et préchauffage du modèle dès l'ouverture de la fenêtre
+        preload_cb = ctk.CTkCheckBox(
+            toolbar_frame,
+            text="Charger au démarrage",
+            variable=self.preload_var,
+            font=("Segoe UI", 12),
+            command=self.save_preferences
+        )
+        preload_cb.pack(side="left", padx=(0, 10))
+        
         # Information sur le périphérique
         device_label = ctk.CTkLabel(
             toolbar_frame, 
@@ -330,6 +496,46 @@ class ModernAudioTranscriptionApp(ctk.CTk):
         )
         timestamps_cb.pack(side="left", padx=(0, 30))
         
+        # Case à cocher pour l'affichage en continu des segments décodés
+        streaming_cb = ctk.CTkCheckBox(
+            advanced_inner_frame,
+            text="Affichage en continu",
+            variable=self.streaming_var,
+            font=("Segoe UI", 12),
+            command=self.save_preferences
+        )
+        streaming_cb.pack(side="left", padx=(0, 30))
+        
+        # Case à cocher pour ignorer les silences (détection d'activité vocale)
+        vad_cb = ctk.CTkCheckBox(
+            advanced_inner_frame,
+            text="Ignorer les silences",
+            variable=self.vad_var,
+            font=("Segoe UI", 12),
+            command=self.save_preferences
+        )
+        vad_cb.pack(side="left", padx=(0, 30))
+        
+        # Case à cocher pour réutiliser une transcription identique déjà effectuée
+        result_cache_cb = ctk.CTkCheckBox(
+            advanced_inner_frame,
+            text="Réutiliser les transcriptions",
+            variable=self.result_cache_var,
+            font=("Segoe UI", 12),
+            command=self.save_preferences
+        )
+        result_cache_cb.pack(side="left", padx=(0, 30))
+        
+        # Case à cocher pour le modèle quantifié INT8 (plus rapide sur CPU)
+        int8_cb = ctk.CTkCheckBox(
+            advanced_inner_frame,
+            text="Modèle INT8 (CPU)",
+            variable=self.int8_var,
+            font=("Segoe UI", 12),
+            command=self.on_int8_change
+        )
+        int8_cb.pack(side="left", padx=(0, 30))
+        
         # Cadre pour la qualité de transcription
         beam_frame = ctk.CTkFrame(advanced_inner_frame, fg_color="transparent")
         beam_frame.pack(side="left")
@@ -343,7 +549,7 @@ class ModernAudioTranscriptionApp(ctk.CTk):
         
         beam_options = ctk.CTkSegmentedButton(
             beam_frame,
-            values=["Rapide", "Standard", "Élevée"],
+            values=["Rapide", "Assisté", "Standard", "Élevée"],
             command=self.on_beam_change,
             font=("Segoe UI", 12)
         )
@@ -351,7 +557,7 @@ class ModernAudioTranscriptionApp(ctk.CTk):
         
         # Définir la valeur initiale
         if self.beam_size_var.get() == 1:
-            beam_options.set("Rapide")
+            beam_options.set("Assisté" if self.assisted_var.get() else "Rapide")
         elif self.beam_size_var.get() == 2:  # Modifié: 3 -> 2
             beam_options.set("Standard")
         else:
@@ -504,6 +710,13 @@ class ModernAudioTranscriptionApp(ctk.CTk):
         ctk.set_appearance_mode(new_theme)
         self.save_preferences()
         
+    def on_model_select(self, choice):
+        """Gestion de la sélection du modèle (appliquée au prochain chargement)"""
+        self.model_choice.set(self.model_mapping[choice])
+        self.save_preferences()
+        if self.engine_loaded():
+            self.status_var.set("Rechargez le modèle pour appliquer ce changement")
+        
     def on_lang_select(self, choice):
         """Gestion de la sélection de langue"""
         self.language.set(self.lang_mapping[choice])
@@ -553,11 +766,8 @@ class ModernAudioTranscriptionApp(ctk.CTk):
             
         try:
             # Utiliser librosa pour obtenir la durée audio
-            self.audio_duration = librosa.get_duration(path=file_path)
-            # S'assurer que la durée n'est pas None
-            if self.audio_duration is None:
-                self.audio_duration = 0
-                
+            self.audio_duration = get_audio_duration(file_path, self.audio_cache)
+            
             duration_min = int(self.audio_duration // 60)
             duration_sec = int(self.audio_duration % 60)
             self.status_var.set(f"Prêt - Durée audio: {duration_min}m {duration_sec}s")
@@ -578,13 +788,7 @@ class ModernAudioTranscriptionApp(ctk.CTk):
         if isinstance(text, dict) and "chunks" in text:
             formatted_text = "Transcription avec horodatages :\n\n"
             for chunk in text["chunks"]:
-                start = chunk.get("timestamp", [0])[0]
-                # Formater le temps en minutes:secondes
-                minutes = int(start // 60)
-                seconds = int(start % 60)
-                time_str = f"[{minutes:02d}:{seconds:02d}] "
-                chunk_text = chunk.get("text", "")
-                formatted_text += time_str + chunk_text + "\n"
+                formatted_text += format_chunk_line(chunk) + "\n"
             self.result_text.insert("end", formatted_text)
         else:
             # Affichage normal du texte
@@ -593,74 +797,61 @@ class ModernAudioTranscriptionApp(ctk.CTk):
         self.result_text.configure(state="disabled")
         self.result_text.see("end")
         
+    def append_stream_chunks(self, chunks):
+        """Ajouter à l'affichage les phrases d'un segment dès qu'il est décodé"""
+        if self.progress_stop or not chunks:
+            return
+        self.update_result_text("".join(format_chunk_line(chunk) + "\n" for chunk in chunks), append=True)
+        
     def load_model(self):
-        """Charger le modèle Whisper"""
+        """Charger le modèle Whisper puis le préchauffer
+
+        Une transcription demandée pendant le chargement est lancée dès qu'il se termine.
+        """
+        if self.model_loading:
+            return
+        self.model_loading = True
+
         def _load():
+            loaded = False
             try:
                 self.status_var.set("Chargement du modèle...")
                 self.progress_value.set(0)
                 self.progress_text.set("Chargement...")
                 self.load_model_btn.configure(state="disabled")
                 
-                # Configuration du périphérique
-                device = "cuda:0" if torch.cuda.is_available() else "cpu"
-                torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-                
                 # Mise à jour des informations du périphérique
-                device_name = "GPU" if torch.cuda.is_available() else "CPU"
+                device = self.engine.device
+                device_name = "GPU" if device.startswith("cuda") else "CPU"
                 self.device_info.set(f"Périphérique: {device_name} ({device})")
                 
-                # Chargement du modèle et du processeur
-                model_id = "openai/whisper-large-v3"
-                
-                self.status_var.set("Chargement du modèle Whisper...")
-                self.progress_value.set(0.2)
-                self.progress_text.set("20%")
-                time.sleep(0.5)  # Permettre à l'UI de se mettre à jour
+                def on_load_progress(fraction, message):
+                    if fraction >= 1.0:
+                        return
+                    self.status_var.set(message)
+                    self.progress_value.set(fraction)
+                    self.progress_text.set(f"{int(fraction * 100)}%")
                 
-                # Optimisations pour la mémoire et les performances
-                # Vérifier si accélerate est disponible avant d'utiliser les options qui en dépendent
-                model_kwargs = {
-                    "torch_dtype": torch_dtype,
-                    "attn_implementation": "eager"  # Optimisation pour l'attention
-                }
-                
-                # Ajouter les options qui nécessitent Accelerate uniquement si disponible
-                if HAS_ACCELERATE:
-                    model_kwargs.update({
-                        "low_cpu_mem_usage": True,
-                        "use_safetensors": True
-                    })
-                
-                self.model = AutoModelForSpeechSeq2Seq.from_pretrained(
-                    model_id,
-                    **model_kwargs
+                # Choix du modèle : en mode automatique, selon la machine et le fichier sélectionné
+                self.engine.model_id = select_model_id(
+                    self.model_choice.get(),
+                    self.engine.registry,
+                    duration=self.audio_duration or None,
+                    language=self.language.get(),
+                    int8=self.engine.int8
                 )
+                model_name = catalog_name(self.engine.model_id) or self.engine.model_id
+                self.device_info.set(f"Périphérique: {device_name} ({device}) - Modèle: {model_name}")
                 
-                self.progress_value.set(0.6)
-                self.progress_text.set("60%")
-                self.status_var.set("Chargement du processeur...")
-                time.sleep(0.5)  # Permettre à l'UI de se mettre à jour
-                
-                self.model.to(device)
-                self.processor = AutoProcessor.from_pretrained(model_id)
-                
-                self.progress_value.set(0.8)
-                self.progress_text.set("80%")
-                self.status_var.set("Initialisation du pipeline...")
-                time.sleep(0.5)  # Permettre à l'UI de se mettre à jour
+                # Chargement du modèle, du processeur et du pipeline
+                self.engine.load(progress_callback=on_load_progress)
+                if self.service_mode:
+                    self.show_device_info()
                 
-                # Création du pipeline avec des paramètres optimisés
-                self.pipe = pipeline(
-                    "automatic-speech-recognition",
-                    model=self.model,
-                    tokenizer=self.processor.tokenizer,
-                    feature_extractor=self.processor.feature_extractor,
-                    chunk_length_s=30,
-                    stride_length_s=5,
-                    torch_dtype=torch_dtype,
-                    device=device
-                )
+                # Préchauffage sur un court silence : la première transcription n'en paie pas le coût
+                self.status_var.set("Préchauffage du modèle...")
+                self.engine.warm_up(self.language.get())
+                loaded = True
                 
                 self.progress_value.set(1.0)
                 self.progress_text.set("100%")
@@ -677,6 +868,11 @@ class ModernAudioTranscriptionApp(ctk.CTk):
                 self.progress_text.set("Erreur")
             finally:
                 self.load_model_btn.configure(state="normal")
+                self.model_loading = False
+                if self.pending_transcription:
+                    self.pending_transcription = False
+                    if loaded:
+                        self.after(0, self.start_transcription)
                 
         # Exécuter dans un thread séparé pour éviter le gel de l'interface
         threading.Thread(target=_load, daemon=True).start()
@@ -690,107 +886,34 @@ class ModernAudioTranscriptionApp(ctk.CTk):
     def transcription_result(self, value):
         self._transcription_result = value
         
-    def simulate_progress(self, duration, beam_size=1):
-        """Simuler la progression de la transcription en tenant compte de la complexité"""
+    def reset_progress(self):
+        """Remettre la progression à zéro avant une nouvelle transcription"""
+        self.progress_stop = False
         self.progress_value.set(0)
         self.progress_text.set("0%")
-        self.progress_stop = False
-        
-        # S'assurer que duration n'est pas None
-        if duration is None or duration <= 0:
-            duration = 30  # valeur par défaut si la durée est inconnue ou invalide
-            
-        # Estimer le temps total (la transcription est généralement plus rapide que le temps réel)
-        # Ajuster le temps estimé en fonction de la complexité (beam_size)
-        complexity_factor = 1.0
-        if beam_size == 2:  # Standard (réduit de 3 à 2)
-            complexity_factor = 2.0
-        elif beam_size == 3:  # Élevée (réduit de 5 à 3)
-            complexity_factor = 3.0
-        
-        # Nouvelle approche: diviser la progression en phases
-        total_steps = 100
-        
-        if beam_size > 1:  # Pour Standard et Élevée
-            # Phases de progression pour les modes avancés
-            # Phase 1: 0-80% - progression normale
-            # Phase 2: 80-98% - progression plus lente (changé de 95% à 98%)
-            # Reste: attendre la fin réelle de la transcription
-            phase1_pct = 80   # Jusqu'à où va la phase 1 (augmenté de 75% à 80%)
-            phase2_pct = 98   # Jusqu'à où va la phase 2 (augmenté de 95% à 98%)
-            
-            phase1_steps = int(total_steps * phase1_pct / 100)
-            phase2_steps = int(total_steps * phase2_pct / 100)
-        else:
-            # Progression standard pour le mode rapide
-            phase1_pct = 90
-            phase2_pct = 98
-            
-            phase1_steps = int(total_steps * phase1_pct / 100)
-            phase2_steps = int(total_steps * phase2_pct / 100)
-        
-        # Calcul des temps pour chaque phase
-        estimated_time = max(3, duration * 0.5 * complexity_factor)
-        phase1_time = estimated_time * 0.6  # 60% du temps pour la première phase
-        phase2_time = estimated_time * 0.4  # 40% du temps pour la deuxième phase
-        
-        # Intervalle entre les mises à jour en ms pour chaque phase
-        phase1_interval = int((phase1_time * 1000) / phase1_steps)
-        phase2_interval = int((phase2_time * 1000) / (phase2_steps - phase1_steps))
-        
-        self.progress_thread = threading.Thread(target=self._update_progress, 
-                                             args=(phase1_steps, phase2_steps, phase1_interval, phase2_interval))
-        self.progress_thread.daemon = True
-        self.progress_thread.start()
+        self.time_label.configure(text="Temps: --")
     
-    def _update_progress(self, phase1_steps, phase2_steps, phase1_interval, phase2_interval):
-        """Mise à jour de la progression en plusieurs phases - CORRIGÉ"""
-        step = 0
-        total_steps = 100
-        
-        # Phase 1: progression rapide
-        while step < phase1_steps and not self.progress_stop:
-            step += 1
-            progress = step / total_steps
-            
-            # Mettre à jour l'interface
-            self.progress_value.set(progress)
-            self.progress_text.set(f"{int(progress * 100)}%")
-            
-            # Pause entre les mises à jour
-            time.sleep(phase1_interval / 1000)
-        
-        # Phase 2: progression plus lente
-        while step < phase2_steps and not self.progress_stop:
-            step += 1
-            progress = step / total_steps
-            
-            # Mettre à jour l'interface
-            self.progress_value.set(progress)
-            self.progress_text.set(f"{int(progress * 100)}%")
-            
-            # Pause plus longue entre les mises à jour
-            time.sleep(phase2_interval / 1000)
+    def on_transcription_progress(self, progress):
+        """Afficher l'avancement réel (segments terminés, temps restant, débit)"""
+        if self.progress_stop:
+            return
         
-        # Phase 3: rester à 99% en attendant la fin réelle
-        if not self.progress_stop:
-            self.progress_value.set(0.99)
-            self.progress_text.set("99%")
-            
-        # La méthode complete_progress sera appelée pour finaliser à 100%
+        self.progress_value.set(progress.fraction)
+        self.progress_text.set(f"{int(progress.fraction * 100)}%")
+        self.status_var.set(f"Transcription en cours... {progress.describe()}")
+        if progress.real_time_factor is not None:
+            self.time_label.configure(
+                text=f"Temps: {format_duration(progress.elapsed)} (RTF {progress.real_time_factor:.2f})")
         
     def stop_progress(self):
-        """Arrêter la simulation de progression"""
+        """Arrêter la mise à jour de la progression"""
         self.progress_stop = True
         
     def complete_progress(self):
-        """Finaliser la progression à 100% - CORRIGÉ"""
-        # D'abord arrêter la simulation
+        """Finaliser la progression à 100%"""
+        # D'abord arrêter les mises à jour de progression
         self.progress_stop = True
         
-        # Petit délai pour s'assurer que la simulation est bien arrêtée
-        time.sleep(0.1)
-        
         # Forcer la mise à jour directement, sans délai
         self.progress_value.set(1.0)
         self.progress_text.set("100%")
@@ -803,15 +926,31 @@ class ModernAudioTranscriptionApp(ctk.CTk):
         self.status_var.set("Transcription terminée!")
         
     def cancel_transcription(self):
-        """Annuler la transcription en cours"""
-        if self.transcription_running:
+        """Annuler la transcription en cours
+        
+        Le décodage s'arrête au prochain token ; le thread de transcription rend la main
+        (et les ressources) puis affiche le texte des segments déjà terminés.
+        """
+        if self.transcription_running and self.cancel_token is not None:
+            self.cancel_token.cancel()
             self.progress_stop = True
-            self.transcription_running = False
-            self.status_var.set("Transcription annulée")
-            self.progress_value.set(0)
-            self.progress_text.set("0%")
+            self.status_var.set("Annulation en cours...")
             self.cancel_btn.configure(state="disabled")
-            self.transcribe_btn.configure(state="normal")
+            
+    def show_cancelled_transcription(self, cancelled):
+        """Afficher le texte produit avant l'annulation et permettre de le sauvegarder"""
+        self.progress_value.set(0)
+        self.progress_text.set("0%")
+        self.status_var.set("Transcription annulée")
+        
+        if cancelled.partial_result:
+            self.transcription_result = cancelled.partial_result
+            self.transcription_metadata = cancelled.metadata
+            self.update_result_text("La transcription a été annulée par l'utilisateur.\n"
+                                    "Texte transcrit avant l'annulation :\n\n")
+            self.update_result_text(cancelled.partial_result, append=True)
+            self.save_btn.configure(state="normal")
+        else:
             self.update_result_text("La transcription a été annulée par l'utilisateur.")
             
     def start_transcription(self):
@@ -823,8 +962,12 @@ class ModernAudioTranscriptionApp(ctk.CTk):
             self.status_var.set("Erreur: fichier audio non valide")
             return
             
-        # Vérifier que le modèle est chargé
-        if self.pipe is None:
+        # Vérifier que le modèle est chargé (ou attendre la fin d'un chargement en cours)
+        if self.model_loading:
+            self.pending_transcription = True
+            self.status_var.set("Transcription en attente de la fin du chargement du modèle...")
+            return
+        if not self.engine_loaded():
             messagebox.showinfo("Information", "Chargement du modèle requis", 
                               detail="Veuillez d'abord charger le modèle de transcription.")
             self.status_var.set("Veuillez charger le modèle")
@@ -833,7 +976,7 @@ class ModernAudioTranscriptionApp(ctk.CTk):
         # Obtenir la durée de l'audio
         self.audio_duration = self.get_audio_duration(audio_file)
         
-        # Récupérer la taille du faisceau (beam_size) pour l'estimation de la progression
+        # Récupérer la taille du faisceau (beam_size)
         beam_size = self.beam_size_var.get()
             
         def _transcribe():
@@ -846,10 +989,16 @@ class ModernAudioTranscriptionApp(ctk.CTk):
                 self.status_var.set("Transcription en cours...")
                 self.update_result_text("Démarrage de la transcription...\n")
                 
-                # Démarrer la simulation de progression avec le beam_size pour une meilleure estimation
-                self.simulate_progress(self.audio_duration, beam_size)
+                # La progression est mise à jour à chaque segment réellement terminé
+                self.reset_progress()
+                self.cancel_token = CancellationToken()
+                cancel_token = self.cancel_token
+                last_progress = [time.time()]
+                
+                def on_progress(progress):
+                    last_progress[0] = time.time()
+                    self.on_transcription_progress(progress)
                 
-                start_time = time.time()
                 selected_lang = self.language.get()
                 
                 # Obtenir la valeur de précision (température)
@@ -857,6 +1006,9 @@ class ModernAudioTranscriptionApp(ctk.CTk):
                 
                 # Obtenir les valeurs des nouveaux paramètres
                 use_timestamps = self.timestamps_var.get()
+                chunk_callback = self.append_stream_chunks if self.streaming_var.get() else None
+                use_vad = self.vad_var.get()
+                use_result_cache = self.result_cache_var.get()
                 
                 # Variables pour le résultat et les erreurs
                 result = [None]
@@ -867,16 +1019,17 @@ class ModernAudioTranscriptionApp(ctk.CTk):
                 def run_transcription():
                     try:
                         # Effectuer la transcription avec les nouveaux paramètres
-                        result[0] = self.pipe(
+                        result[0] = self.engine.transcribe(
                             audio_file,
-                            batch_size=4,
+                            language=selected_lang,
+                            temperature=temperature,
+                            num_beams=beam_size,
                             return_timestamps=use_timestamps,
-                            generate_kwargs={
-                                "task": "transcribe",
-                                "language": selected_lang,
-                                "temperature": temperature,
-                                "num_beams": beam_size
-                            }
+                            progress_callback=on_progress,
+                            chunk_callback=chunk_callback,
+                            cancel_token=cancel_token,
+                            vad=use_vad,
+                            use_result_cache=use_result_cache
                         )
                         completed[0] = True
                     except Exception as e:
@@ -886,17 +1039,19 @@ class ModernAudioTranscriptionApp(ctk.CTk):
                 trans_thread = threading.Thread(target=run_transcription, daemon=True)
                 trans_thread.start()
                 
-                # Calculer le timeout en fonction de la durée audio et du beam_size
-                # Plus le beam_size est grand, plus le timeout est long
-                timeout = max(60, self.audio_duration * (2 + beam_size))
-                
-                # Attendre que la transcription se termine ou le timeout
-                trans_thread.join(timeout)
+                # Attendre la fin de la transcription : le délai ne s'applique qu'à l'absence
+                # de progrès, une longue transcription qui avance n'est jamais interrompue.
+                # Après une annulation on attend que le thread rende la main (au plus un segment)
+                timeout = STALL_TIMEOUT_S
+                while trans_thread.is_alive():
+                    trans_thread.join(1.0)
+                    if time.time() - last_progress[0] > timeout:
+                        cancel_token.cancel()
+                        break
                 
                 # Vérifier si la transcription a été annulée
-                if self.progress_stop and not completed[0]:
-                    # La transcription a été annulée, on sort proprement
-                    self.transcription_running = False
+                if isinstance(error[0], TranscriptionCancelled):
+                    self.show_cancelled_transcription(error[0])
                     return
                 
                 # Vérifier si la transcription s'est terminée avant le timeout
@@ -904,11 +1059,11 @@ class ModernAudioTranscriptionApp(ctk.CTk):
                     if error[0]:
                         raise error[0]
                     else:
-                        raise TimeoutError(f"La transcription a pris trop de temps (>{timeout}s)")
+                        raise TimeoutError(f"Aucun segment terminé depuis plus de {timeout}s")
                 
                 # Transcription terminée avec succès
-                end_time = time.time()
-                time_taken = end_time - start_time
+                self.transcription_result, self.transcription_metadata = result[0]
+                time_taken = self.transcription_metadata["processing_time"]
                 
                 # Formatage du temps pris
                 if time_taken < 60:
@@ -919,39 +1074,18 @@ class ModernAudioTranscriptionApp(ctk.CTk):
                     time_str = f"{minutes} minutes {seconds} secondes"
                 
                 # Mettre à jour le label de temps
+                if self.transcription_metadata.get("from_cache"):
+                    time_str = "instantané (transcription déjà effectuée)"
                 self.time_label.configure(text=f"Temps: {time_str}")
                 
                 # Forcer la mise à jour de la barre de progression à 100%
                 self.complete_progress()
-                
-                # Traitement du résultat selon son format (avec ou sans timestamps)
-                if isinstance(result[0], dict):
-                    if "chunks" in result[0]:
-                        # Résultat avec timestamps
-                        self.transcription_result = result[0]
-                        # On utilise le texte brut pour la sauvegarde
-                        raw_text = " ".join([chunk.get("text", "") for chunk in result[0]["chunks"]])
-                        # Stocker le texte brut pour la sauvegarde
-                        result[0]["text"] = raw_text
-                    else:
-                        # Résultat normal au format dict
-                        self.transcription_result = result[0]["text"]
-                else:
-                    # Résultat sous forme de chaîne
-                    self.transcription_result = str(result[0])
-                    
-                # Stocker les métadonnées pour la sauvegarde
-                self.transcription_metadata = {
-                    "source_file": audio_file,
-                    "date": datetime.now(),
-                    "language": selected_lang,
-                    "duration": self.audio_duration,
-                    "processing_time": time_taken,
-                    "has_timestamps": use_timestamps
-                }
+                metrics_summary = format_metrics_summary(self.transcription_metadata.get("metrics", {}))
+                if metrics_summary and not self.transcription_metadata.get("from_cache"):
+                    self.status_var.set(f"Transcription terminée - {metrics_summary}")
                 
                 # Afficher la transcription dans l'affichage des résultats
-                self.update_result_text(result[0] if use_timestamps else self.transcription_result)
+                self.update_result_text(self.transcription_result)
                 
                 # Activer le bouton de sauvegarde
                 self.save_btn.configure(state="normal")
@@ -963,7 +1097,7 @@ class ModernAudioTranscriptionApp(ctk.CTk):
                 self.progress_text.set("Erreur")
                 self.status_var.set("Erreur: Timeout de transcription")
                 self.update_result_text(
-                    f"La transcription a pris trop de temps et a été interrompue.\n\n"
+                    f"La transcription ne progressait plus et a été interrompue.\n\n"
                     f"Suggestions:\n"
                     f"1. Essayez le mode 'Rapide' pour les fichiers plus longs\n"
                     f"2. Vérifiez les ressources système disponibles\n"
@@ -987,35 +1121,7 @@ class ModernAudioTranscriptionApp(ctk.CTk):
     def save_txt_file(self, save_path):
         """Sauvegarder la transcription sous forme de fichier texte"""
         try:
-            with open(save_path, 'w', encoding='utf-8') as f:
-                f.write("TRANSCRIPTION AUDIO\n")
-                f.write("=" * 50 + "\n\n")
-                f.write(f"Fichier source: {self.transcription_metadata['source_file']}\n")
-                f.write(f"Date de transcription: {self.transcription_metadata['date'].strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"Langue: {self.transcription_metadata['language']}\n")
-                f.write(f"Durée: {self.format_duration(self.transcription_metadata['duration'])}\n")
-                f.write(f"Temps de traitement: {self.format_duration(self.transcription_metadata['processing_time'])}\n\n")
-                f.write("=" * 50 + "\n\n")
-                
-                # Si le résultat contient des timestamps, formatez-les
-                has_timestamps = self.transcription_metadata.get('has_timestamps', False)
-                if has_timestamps and isinstance(self.transcription_result, dict) and "chunks" in self.transcription_result:
-                    f.write("TRANSCRIPTION AVEC HORODATAGES :\n\n")
-                    for chunk in self.transcription_result["chunks"]:
-                        start = chunk.get("timestamp", [0])[0]
-                        # Formater le temps en minutes:secondes
-                        minutes = int(start // 60)
-                        seconds = int(start % 60)
-                        time_str = f"[{minutes:02d}:{seconds:02d}] "
-                        chunk_text = chunk.get("text", "")
-                        f.write(time_str + chunk_text + "\n")
-                else:
-                    # Texte normal sans horodatage
-                    if isinstance(self.transcription_result, dict) and "text" in self.transcription_result:
-                        f.write(self.transcription_result["text"])
-                    else:
-                        f.write(str(self.transcription_result))
-                
+            save_txt_file(save_path, self.transcription_result, self.transcription_metadata)
             self.status_var.set(f"Transcription sauvegardée: {save_path}")
             return True
         except Exception as e:
@@ -1026,78 +1132,7 @@ class ModernAudioTranscriptionApp(ctk.CTk):
     def save_docx_file(self, save_path):
         """Sauvegarder la transcription sous forme de document Word"""
         try:
-            # Créer un nouveau document
-            doc = Document()
-            
-            # Ajouter un titre
-            doc.add_heading('Transcription Audio', 0)
-            
-            # Ajouter les métadonnées
-            metadata_table = doc.add_table(rows=5, cols=2)
-            metadata_table.style = 'Table Grid'
-            
-            # Remplir les métadonnées
-            cells = metadata_table.rows[0].cells
-            cells[0].text = 'Fichier source'
-            cells[1].text = self.transcription_metadata['source_file']
-            
-            cells = metadata_table.rows[1].cells
-            cells[0].text = 'Date de transcription'
-            cells[1].text = self.transcription_metadata['date'].strftime('%Y-%m-%d %H:%M:%S')
-            
-            cells = metadata_table.rows[2].cells
-            cells[0].text = 'Langue'
-            cells[1].text = self.transcription_metadata['language']
-            
-            cells = metadata_table.rows[3].cells
-            cells[0].text = 'Durée'
-            cells[1].text = self.format_duration(self.transcription_metadata['duration'])
-            
-            cells = metadata_table.rows[4].cells
-            cells[0].text = 'Temps de traitement'
-            cells[1].text = self.format_duration(self.transcription_metadata['processing_time'])
-            
-            doc.add_paragraph('')  # Ajouter un espace
-            
-            # Vérifier si nous avons des timestamps
-            has_timestamps = self.transcription_metadata.get('has_timestamps', False)
-            if has_timestamps and isinstance(self.transcription_result, dict) and "chunks" in self.transcription_result:
-                doc.add_heading('Transcription avec horodatages', level=1)
-                
-                # Ajouter un tableau pour les horodatages
-                timestamps_table = doc.add_table(rows=1, cols=2)
-                timestamps_table.style = 'Table Grid'
-                
-                # En-têtes du tableau
-                header_cells = timestamps_table.rows[0].cells
-                header_cells[0].text = 'Temps'
-                header_cells[1].text = 'Texte'
-                
-                # Ajouter les chunks avec horodatages
-                for chunk in self.transcription_result["chunks"]:
-                    start = chunk.get("timestamp", [0])[0]
-                    # Formater le temps en minutes:secondes
-                    minutes = int(start // 60)
-                    seconds = int(start % 60)
-                    time_str = f"{minutes:02d}:{seconds:02d}"
-                    chunk_text = chunk.get("text", "")
-                    
-                    row_cells = timestamps_table.add_row().cells
-                    row_cells[0].text = time_str
-                    row_cells[1].text = chunk_text
-            else:
-                # Ajouter la transcription normale
-                doc.add_heading('Transcription', level=1)
-                
-                # Ajouter le texte de la transcription
-                if isinstance(self.transcription_result, dict) and "text" in self.transcription_result:
-                    doc.add_paragraph(self.transcription_result["text"])
-                else:
-                    doc.add_paragraph(str(self.transcription_result))
-            
-            # Sauvegarder le document
-            doc.save(save_path)
-            
+            save_docx_file(save_path, self.transcription_result, self.transcription_metadata)
             self.status_var.set(f"Transcription sauvegardée: {save_path}")
             return True
         except Exception as e:
@@ -1162,48 +1197,45 @@ class ModernAudioTranscriptionApp(ctk.CTk):
             messagebox.showerror("Erreur", f"Erreur lors de la sauvegarde: {str(e)}")
             self.status_var.set("Erreur lors de la sauvegarde")
 
+    def on_int8_change(self):
+        """Activer ou désactiver le modèle INT8 (pris en compte au prochain chargement)"""
+        self.save_preferences()
+        if self._engine is None:
+            return  # appliqué à la fin de l'initialisation du moteur
+        self.apply_engine_settings()
+        if self.int8_var.get() and self._engine.device != "cpu":
+            self.status_var.set("Le modèle INT8 ne concerne que l'inférence sur CPU")
+        elif self._engine.is_loaded:
+            self.status_var.set("Rechargez le modèle pour appliquer ce changement")
+            
     def on_beam_change(self, value):
         """Callback lorsque l'option de qualité change - CORRIGÉ"""
-        if value == "Rapide":
+        # "Assisté" : recherche gloutonne vérifiée par le grand modèle sur les jetons
+        # proposés par un modèle distillé (même texte que "Rapide", décodage plus court)
+        self.assisted_var.set(value == "Assisté")
+        if self._engine is not None:
+            self.apply_engine_settings()
+        if value in ("Rapide", "Assisté"):
             self.beam_size_var.set(1)
         elif value == "Standard":
             self.beam_size_var.set(2)  # Réduit de 3 à 2
         else:  # Élevée
             self.beam_size_var.set(3)  # Réduit de 5 à 3
         self.save_preferences()
+        if self.assisted_var.get() and self.engine_loaded() and self._engine.assistant_model is None:
+            self.status_var.set("Rechargez le modèle pour activer le décodage assisté")
 
     def format_duration(self, seconds):
         """Formater une durée en secondes en format lisible"""
-        if seconds < 60:
-            return f"{seconds:.1f} secondes"
-        else:
-            minutes = int(seconds // 60)
-            secs = int(seconds % 60)
-            if minutes < 60:
-                return f"{minutes} minute{'s' if minutes > 1 else ''} {secs} seconde{'s' if secs > 1 else ''}"
-            else:
-                hours = int(minutes // 60)
-                mins = int(minutes % 60)
-                return f"{hours} heure{'s' if hours > 1 else ''} {mins} minute{'s' if mins > 1 else ''} {secs} seconde{'s' if secs > 1 else ''}"
+        return format_duration(seconds)
 
 
 if __name__ == "__main__":
+    # Les processus de calcul relancent l'exécutable en mode gelé (PyInstaller)
+    multiprocessing.freeze_support()
     try:
-        # Check if accelerate is available and warn if not
-        if not HAS_ACCELERATE:
-            print("WARNING: The 'accelerate' package is not installed.")
-            print("The application will still function, but for better performance")
-            print("consider installing it with: pip install 'accelerate>=0.26.0'")
-            
+        # Le périphérique est affiché dès que le moteur est importé (show_device_info)
         app = ModernAudioTranscriptionApp()
-        
-        # Détecter le périphérique
-        if torch.cuda.is_available():
-            device_name = torch.cuda.get_device_name(0)
-            app.device_info.set(f"GPU: {device_name}")
-        else:
-            app.device_info.set("Périphérique: CPU")
-            
         app.mainloop()
     except Exception as e:
         print(f"Erreur lors du démarrage de l'application: {e}")
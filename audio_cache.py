@@ -0,0 +1,144 @@
+import os
+import hashlib
+import threading
+import numpy as np
+
+# Taille maximale par défaut du cache audio (en Mo)
+DEFAULT_MAX_MB = 4096
+# Version du format décodé : à incrémenter si le décodage change
+DECODER_VERSION = "ffmpeg-f32le-mono-1"
+
+
+def get_cache_dir(name):
+    """Dossier de cache local de l'application (LOCALAPPDATA sous Windows, ~/.cache sinon)"""
+    base_dir = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base_dir, "AudioTransPro", name)
+
+
+def file_content_hash(path, block_size=1 << 20):
+    """Empreinte SHA-256 du contenu d'un fichier, lu par blocs"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+_content_hashes = {}
+
+
+def cached_content_hash(path):
+    """Empreinte du fichier, mémorisée tant que sa taille et sa date ne changent pas"""
+    stat = os.stat(path)
+    signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    content_hash = _content_hashes.get(signature)
+    if content_hash is None:
+        content_hash = file_content_hash(path)
+        _content_hashes[signature] = content_hash
+    return content_hash
+
+
+class AudioCache:
+    """Cache disque de l'audio décodé (mono float32) sous forme de fichiers .npy projetés en mémoire
+
+    La clé combine l'empreinte du contenu du fichier et les paramètres de décodage, de sorte
+    qu'un fichier renommé ou déplacé est retrouvé et qu'un fichier modifié ne l'est pas.
+    Les entrées les moins récemment utilisées sont supprimées au-delà de max_mb.
+    """
+
+    def __init__(self, cache_dir=None, max_mb=DEFAULT_MAX_MB):
+        self.cache_dir = cache_dir or get_cache_dir("audio")
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def entry_path(self, path, sampling_rate):
+        key = hashlib.sha256(
+            f"{cached_content_hash(path)}:{sampling_rate}:{DECODER_VERSION}".encode("utf-8")
+        ).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, path, sampling_rate):
+        """Retourner l'audio en cache (projeté en mémoire, lecture seule) ou None"""
+        entry = self.entry_path(path, sampling_rate)
+        if not os.path.exists(entry):
+            return None
+        try:
+            audio = np.load(entry, mmap_mode="r")
+        except (OSError, ValueError):
+            # Entrée corrompue (écriture interrompue, disque plein...) : on la recrée
+            self._remove(entry)
+            return None
+        # Marquer l'entrée comme récemment utilisée pour l'éviction LRU
+        os.utime(entry)
+        return audio
+
+    def load(self, path, sampling_rate, decode):
+        """Retourner l'audio de path, en le décodant avec decode(path, sampling_rate) si absent"""
+        audio = self.get(path, sampling_rate)
+        if audio is not None:
+            return audio
+
+        audio = np.ascontiguousarray(decode(path, sampling_rate), dtype=np.float32)
+        self.put(path, sampling_rate, audio)
+        return audio
+
+    def put(self, path, sampling_rate, audio):
+        """Enregistrer l'audio décodé puis appliquer la limite de taille"""
+        entry = self.entry_path(path, sampling_rate)
+        temp_path = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                np.save(f, audio)
+            os.replace(temp_path, entry)
+        except OSError as e:
+            self._remove(temp_path)
+            print(f"Impossible d'écrire dans le cache audio: {e}")
+            return
+        self.evict()
+
+    def cached_duration(self, path, sampling_rate):
+        """Durée en secondes si l'audio est déjà en cache, sinon None (sans décodage)"""
+        entry = self.entry_path(path, sampling_rate)
+        if not os.path.exists(entry):
+            return None
+        try:
+            audio = np.load(entry, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        return len(audio) / sampling_rate
+
+    def evict(self):
+        """Supprimer les entrées les moins récemment utilisées au-delà de la taille maximale"""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".npy"):
+                    continue
+                entry = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(entry)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if self._remove(entry):
+                    total -= size
+
+    def clear(self):
+        """Vider entièrement le cache"""
+        for name in os.listdir(self.cache_dir):
+            self._remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            # Sous Windows un fichier encore projeté en mémoire ne peut pas être supprimé
+            return False
@@ -0,0 +1,110 @@
+import subprocess
+import threading
+
+import numpy as np
+
+# Durée d'un bloc lu à la sortie de ffmpeg (secondes)
+BLOCK_S = 10
+
+
+class AudioStream:
+    """Fichier audio décodé par blocs (ffmpeg) au fil de la transcription
+
+    Seuls le bloc courant et la fenêtre en cours sont en mémoire, quelle que soit la durée
+    du fichier. Le décodage (mono, float32, rééchantillonné par ffmpeg) est le même que
+    celui du pipeline : le fichier est transmis à ffmpeg par son entrée standard, comme le
+    fait ffmpeg_read, pour produire exactement les mêmes échantillons. len() donne le
+    nombre d'échantillons estimé d'après duration, pour la progression.
+    """
+
+    def __init__(self, file_path, sampling_rate, duration, block_s=BLOCK_S):
+        self.file_path = file_path
+        self.sampling_rate = sampling_rate
+        self.duration = duration
+        self.block_samples = int(block_s * sampling_rate)
+
+    def __len__(self):
+        return int(round(self.duration * self.sampling_rate))
+
+    def blocks(self):
+        """Générer l'audio décodé par blocs de block_samples échantillons"""
+        command = [
+            "ffmpeg", "-i", "pipe:0",
+            "-ac", "1", "-ar", str(self.sampling_rate), "-f", "f32le",
+            "-hide_banner", "-loglevel", "quiet", "pipe:1"
+        ]
+        try:
+            process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            raise ValueError("ffmpeg est introuvable : il est nécessaire pour décoder les fichiers audio")
+
+        def feed():
+            try:
+                with open(self.file_path, "rb") as f:
+                    for data in iter(lambda: f.read(1 << 20), b""):
+                        process.stdin.write(data)
+            except (OSError, ValueError):
+                pass  # ffmpeg arrêté (transcription interrompue)
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        block_bytes = self.block_samples * 4
+        pending = b""
+        try:
+            while True:
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                data = pending + data
+                usable = len(data) - len(data) % 4
+                pending = data[usable:]
+                if usable:
+                    yield np.frombuffer(data[:usable], dtype=np.float32)
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                # Transcription interrompue avant la fin du fichier
+                process.kill()
+            process.wait()
+            feeder.join()
+        if process.returncode != 0:
+            raise ValueError(f"Impossible de décoder {self.file_path} (ffmpeg code {process.returncode})")
+
+    def windows(self, chunk_len, stride_left, stride_right):
+        """Générer (fenêtre, stride, is_last) exactement comme le découpage du pipeline
+
+        Une fenêtre n'est rendue qu'une fois lu au moins un échantillon au-delà de sa fin
+        (ou la fin du fichier atteinte), pour savoir si c'est la dernière.
+        """
+        step = chunk_len - stride_left - stride_right
+        blocks = self.blocks()
+        buffer = np.zeros(0, dtype=np.float32)
+        offset = 0  # position de buffer[0] dans le fichier
+        start = 0
+        exhausted = False
+        while True:
+            while not exhausted and offset + len(buffer) <= start + chunk_len:
+                block = next(blocks, None)
+                if block is None:
+                    exhausted = True
+                else:
+                    buffer = np.concatenate([buffer, block])
+            if start >= offset + len(buffer):
+                return
+            chunk = buffer[start - offset:start - offset + chunk_len]
+            is_last = exhausted and offset + len(buffer) <= start + chunk_len
+            left = 0 if start == 0 else stride_left
+            right = 0 if is_last else stride_right
+            if len(chunk) > left:
+                yield chunk, (len(chunk), left, right), is_last
+            if is_last:
+                return
+            start += step
+            buffer = buffer[start - offset:]
+            offset = start
@@ -0,0 +1,770 @@
+import os
+import sys
+import time
+import signal
+import argparse
+import json
+import multiprocessing
+
+from audio_cache import DEFAULT_MAX_MB, AudioCache
+from benchmark_suite import BENCHMARK_CONFIGS, DEFAULT_CONFIGS, DEFAULT_DURATIONS, DEFAULT_FORMATS
+from chunking import CHUNKING_MODES
+from instrumentation import enable_metrics_log
+from job_queue import JobQueue
+from model_catalog import AUTO_MODEL, DEFAULT_MODEL, DEFAULT_TARGET_RTF, MODEL_CATALOG, catalog_name, select_model_id
+from model_registry import ModelNotAvailableError, ModelRegistry
+from preferences import load_preferences_file
+from progress import CancellationToken, TranscriptionCancelled, format_duration
+from result_cache import ResultCache
+from service import DEFAULT_HOST, DEFAULT_PORT, DEFAULT_SERVICE_URL, MAX_QUEUE, ServiceClient, ServiceError, serve
+from transcript_files import AUDIO_EXTENSIONS, SAVE_FUNCTIONS, StreamingTextWriter, format_chunk_line, get_audio_duration
+
+# torch et transformers (moteur, points de reprise) ne sont importés que par les commandes
+# qui exécutent le modèle ici : avec --service, le client reste léger
+
+
+def collect_audio_files(paths, recursive=True):
+    """Développer les fichiers et dossiers donnés en une liste de fichiers audio"""
+    audio_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                for root, dirs, files in os.walk(path):
+                    dirs.sort()
+                    for name in sorted(files):
+                        if name.lower().endswith(AUDIO_EXTENSIONS):
+                            audio_files.append(os.path.join(root, name))
+            else:
+                for name in sorted(os.listdir(path)):
+                    full_path = os.path.join(path, name)
+                    if os.path.isfile(full_path) and name.lower().endswith(AUDIO_EXTENSIONS):
+                        audio_files.append(full_path)
+        elif os.path.isfile(path):
+            audio_files.append(path)
+        else:
+            print(f"Ignoré (introuvable): {path}", file=sys.stderr)
+    return audio_files
+
+
+def output_paths(audio_file, formats, output_dir=None, suffix="_transcription"):
+    """Construire les chemins de sortie d'un fichier audio pour chaque format"""
+    base_name = os.path.splitext(os.path.basename(audio_file))[0]
+    target_dir = output_dir or os.path.dirname(os.path.abspath(audio_file))
+    return {fmt: os.path.join(target_dir, f"{base_name}{suffix}.{fmt}") for fmt in formats}
+
+
+def install_cancel_handler(cancel_token):
+    """Premier Ctrl+C : annuler proprement le fichier en cours ; second : arrêt immédiat"""
+    def on_interrupt(signum, frame):
+        if cancel_token.cancelled:
+            raise KeyboardInterrupt
+        cancel_token.cancel()
+        print("\nAnnulation demandée (Ctrl+C à nouveau pour forcer l'arrêt)...", file=sys.stderr)
+    signal.signal(signal.SIGINT, on_interrupt)
+
+
+def make_progress_printer(prefix):
+    """Afficher l'avancement réel d'un fichier sur la sortie d'erreur (terminal uniquement)"""
+    if not sys.stderr.isatty():
+        return None
+
+    def on_progress(progress):
+        line = f"{prefix}: {int(progress.fraction * 100)}% - {progress.describe()}"
+        print(f"\r{line[:150]:<150}", end="", file=sys.stderr, flush=True)
+        if progress.chunks_done >= progress.total_chunks:
+            print("\r" + " " * 150 + "\r", end="", file=sys.stderr, flush=True)
+    return on_progress
+
+
+def transcription_params(args):
+    """Paramètres de décodage d'un fichier (ceux enregistrés avec chaque tâche de la file)"""
+    return {
+        "language": args.language,
+        "temperature": args.temperature,
+        "num_beams": args.beam_size,
+        "return_timestamps": args.timestamps,
+        "vad": args.vad,
+        "use_result_cache": not args.no_result_cache
+    }
+
+
+def save_outputs(paths, result, metadata):
+    for fmt, save_path in paths.items():
+        SAVE_FUNCTIONS[fmt](save_path, result, metadata)
+
+
+def transcribe_file(engine, audio_file, paths, params, cancel_token, prefix, stream=False):
+    """Transcrire un fichier, écrire ses sorties et retourner ses métadonnées
+
+    En cas d'annulation, la transcription partielle est sauvegardée à côté des sorties
+    avant de propager TranscriptionCancelled.
+    """
+    stream_writer = None
+    chunk_callback = None
+    if stream:
+        stream_writer = StreamingTextWriter(next(iter(paths.values())), audio_file)
+
+        def chunk_callback(chunks, writer=stream_writer):
+            writer.write_chunks(chunks)
+            for chunk in chunks:
+                print(format_chunk_line(chunk), flush=True)
+
+    try:
+        result, metadata = engine.transcribe(
+            audio_file,
+            progress_callback=None if stream else make_progress_printer(prefix),
+            chunk_callback=chunk_callback,
+            cancel_token=cancel_token,
+            **params
+        )
+        save_outputs(paths, result, metadata)
+        if stream_writer is not None:
+            stream_writer.close()
+    except TranscriptionCancelled as e:
+        if stream_writer is not None:
+            stream_writer.close()
+        if e.partial_result:
+            for fmt, save_path in paths.items():
+                partial_path = f"{os.path.splitext(save_path)[0]}_partielle.{fmt}"
+                SAVE_FUNCTIONS[fmt](partial_path, e.partial_result, e.metadata)
+                print(f"{prefix}: transcription partielle sauvegardée dans {partial_path}")
+        raise
+    except Exception:
+        if stream_writer is not None:
+            # Conserver le fichier partiel : il contient le texte déjà décodé
+            stream_writer.close(remove=False)
+        raise
+    return metadata
+
+
+def print_file_result(prefix, metadata):
+    if metadata.get("from_cache"):
+        print(f"{prefix}: repris du cache des transcriptions")
+        return
+    rtf = metadata["processing_time"] / metadata["duration"] if metadata["duration"] else 0
+    resumed = f", repris après {metadata['resumed_chunks']} segment(s)" if metadata.get("resumed_chunks") else ""
+    print(f"{prefix}: {format_duration(metadata['duration'])} transcrits en "
+          f"{format_duration(metadata['processing_time'])} (RTF {rtf:.2f}{resumed})")
+
+
+def needs_reload(engine, model_id):
+    """Indiquer si une tâche demande un autre modèle que celui du moteur
+
+    Le service garde son propre modèle : seul un changement du modèle demandé compte.
+    """
+    if not model_id:
+        return False
+    if isinstance(engine, ServiceClient):
+        return model_id != engine.requested_model_id
+    return model_id != engine.model_id
+
+
+def load_model(engine, model_id):
+    """Charger le modèle d'une tâche ; en cas d'échec, le moteur garde son modèle précédent
+
+    model_id n'est conservé qu'après un chargement réussi : sinon les tâches suivantes de
+    ce modèle croiraient le trouver chargé et tourneraient sur l'ancien pipeline.
+    """
+    print(f"Chargement du modèle {model_id}...")
+    previous = engine.model_id
+    engine.model_id = model_id
+    try:
+        engine.load()
+    except BaseException:
+        engine.model_id = previous
+        raise
+
+
+def run_job_queue(engine, job_queue, cancel_token, stream=False):
+    """Traiter les tâches de la file par priorité jusqu'à ce qu'elle soit vide
+
+    Le modèle est rechargé quand une tâche en demande un autre. Une annulation remet la
+    tâche en cours en attente : elle reprendra au prochain lancement.
+    """
+    failures = 0
+    done = 0
+    total_audio = 0.0
+    batch_start = time.time()
+    while True:
+        job = job_queue.claim()
+        if job is None:
+            break
+        prefix = f"[tâche {job.id}] {job.audio_file}"
+        params = dict(job.params)
+        model_id = params.pop("model_id", None)
+        # Décoder la tâche suivante pendant celle-ci (même modèle : pas de rechargement entre les deux)
+        next_job = job_queue.peek()
+        if next_job is not None and next_job.params.get("model_id") == model_id:
+            engine.prefetch_audio(next_job.audio_file, vad=next_job.params.get("vad", False))
+        try:
+            with job_queue.heartbeat(job.id):
+                if needs_reload(engine, model_id):
+                    load_model(engine, model_id)
+                metadata = transcribe_file(engine, job.audio_file, job.outputs, params, cancel_token, prefix, stream)
+        except TranscriptionCancelled:
+            job_queue.release(job.id)
+            print("Traitement annulé : les tâches restantes reprendront au prochain lancement de la file",
+                  file=sys.stderr)
+            return 130
+        except Exception as e:
+            status = job_queue.fail(job.id, str(e))
+            failures += 1
+            retry = " (nouvelle tentative plus tard)" if status == "pending" else ""
+            print(f"{prefix}: erreur - {e}{retry}", file=sys.stderr)
+            continue
+        job_queue.complete(job.id)
+        done += 1
+        total_audio += metadata["duration"]
+        print_file_result(prefix, metadata)
+
+    elapsed = time.time() - batch_start
+    print(f"File terminée: {done} tâches, {failures} échecs, "
+          f"{format_duration(total_audio)} d'audio en {format_duration(elapsed)}")
+    return 1 if failures else 0
+
+
+def run_cross_batch(engine, requests, cancel_token):
+    """Transcrire des fichiers dont les segments partagent les lots du modèle
+
+    requests : ((préfixe, sorties), fichier, paramètres). Les fichiers se terminent dans
+    le désordre ; retourne (échecs, durée d'audio transcrite).
+    """
+    failures = 0
+    total_audio = 0.0
+    for (prefix, paths), result, metadata, error in engine.transcribe_batch(requests, cancel_token):
+        if error is None:
+            try:
+                save_outputs(paths, result, metadata)
+            except Exception as e:
+                error = e
+        if error is not None:
+            failures += 1
+            print(f"{prefix}: erreur - {error}", file=sys.stderr)
+            continue
+        total_audio += metadata["duration"]
+        print_file_result(prefix, metadata)
+    return failures, total_audio
+
+
+def run_job_queue_batched(engine, job_queue, cancel_token):
+    """Traiter la file en regroupant les segments de plusieurs tâches dans les lots du modèle
+
+    Les tâches sont prises une à une, à mesure que des lots sont à remplir ; toutes celles
+    dont des segments attendent encore restent signalées comme vivantes. Une tâche qui
+    demande un autre modèle attend que les tâches du modèle courant soient terminées.
+    """
+    failures = 0
+    done = 0
+    total_audio = 0.0
+    batch_start = time.time()
+    active = set()
+    exhausted = False
+
+    def claimed_jobs():
+        nonlocal exhausted, failures
+        first = True
+        while True:
+            job = job_queue.claim()
+            if job is None:
+                exhausted = True
+                return
+            params = dict(job.params)
+            model_id = params.pop("model_id", None)
+            if needs_reload(engine, model_id):
+                if not first:
+                    # Reprise au passage suivant, une fois les tâches en cours terminées
+                    job_queue.release(job.id)
+                    return
+                try:
+                    load_model(engine, model_id)
+                except Exception as e:
+                    job_queue.fail(job.id, str(e))
+                    failures += 1
+                    print(f"[tâche {job.id}] {job.audio_file}: erreur - {e}", file=sys.stderr)
+                    continue
+            first = False
+            active.add(job.id)
+            yield job, job.audio_file, params
+
+    with job_queue.heartbeat(active):
+        while not exhausted:
+            try:
+                for job, result, metadata, error in engine.transcribe_batch(claimed_jobs(), cancel_token):
+                    active.discard(job.id)
+                    prefix = f"[tâche {job.id}] {job.audio_file}"
+                    if error is None:
+                        try:
+                            save_outputs(job.outputs, result, metadata)
+                        except Exception as e:
+                            error = e
+                    if error is not None:
+                        status = job_queue.fail(job.id, str(error))
+                        failures += 1
+                        retry = " (nouvelle tentative plus tard)" if status == "pending" else ""
+                        print(f"{prefix}: erreur - {error}{retry}", file=sys.stderr)
+                        continue
+                    job_queue.complete(job.id)
+                    done += 1
+                    total_audio += metadata["duration"]
+                    print_file_result(prefix, metadata)
+            except TranscriptionCancelled:
+                for job_id in list(active):
+                    job_queue.release(job_id)
+                print("Traitement annulé : les tâches restantes reprendront au prochain lancement de la file",
+                      file=sys.stderr)
+                return 130
+
+    elapsed = time.time() - batch_start
+    print(f"File terminée: {done} tâches, {failures} échecs, "
+          f"{format_duration(total_audio)} d'audio en {format_duration(elapsed)}")
+    return 1 if failures else 0
+
+
+def cmd_transcribe(args):
+    """Transcrire une série de fichiers avec un seul chargement du modèle"""
+    audio_files = collect_audio_files(args.inputs, recursive=not args.no_recursive)
+    if not audio_files and not args.queue:
+        print("Aucun fichier audio à transcrire", file=sys.stderr)
+        return 1
+
+    formats = ["txt", "docx"] if args.format == "both" else [args.format]
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    if args.metrics_log:
+        enable_metrics_log(args.metrics_log)
+
+    audio_cache = None if args.no_audio_cache else AudioCache(max_mb=args.audio_cache_mb)
+    result_cache = None if args.no_result_cache else ResultCache()
+    registry = ModelRegistry()
+    duration = None
+    if args.model == AUTO_MODEL and audio_files:
+        # Le modèle est chargé une fois pour tout le lot : choix sur la durée moyenne des fichiers
+        durations = []
+        for audio_file in audio_files:
+            try:
+                durations.append(get_audio_duration(audio_file, audio_cache))
+            except Exception:
+                pass
+        duration = sum(durations) / len(durations) if durations else None
+    model_id = select_model_id(args.model, registry, duration=duration, language=args.language,
+                               int8=args.int8, target_rtf=args.target_rtf)
+    params = transcription_params(args)
+
+    job_queue = None
+    if args.queue:
+        # Les fichiers sont enregistrés avant le chargement du modèle : rien n'est perdu
+        # si le processus s'arrête, la commande suivante reprend la file
+        job_queue = JobQueue()
+        for audio_file in audio_files:
+            paths = output_paths(audio_file, formats, args.output_dir)
+            if args.skip_existing and all(os.path.exists(p) for p in paths.values()):
+                continue
+            job_queue.add(audio_file, {**params, "model_id": model_id},
+                          {fmt: os.path.abspath(path) for fmt, path in paths.items()}, priority=args.priority)
+        counts = job_queue.counts()
+        pending = counts.get("pending", 0) + counts.get("running", 0)
+        if not pending:
+            print("Aucune tâche en attente dans la file")
+            return 0
+        print(f"{pending} tâche(s) dans la file {job_queue.db_path}")
+
+    if args.service:
+        # Le modèle reste chargé dans le service : pas de chargement par lancement
+        engine = ServiceClient(args.service)
+        engine.model_id = model_id
+        print(f"Connexion au service de transcription {args.service}...")
+    else:
+        from checkpoint import CheckpointStore
+        from transcription_engine import TranscriptionEngine
+
+        engine = TranscriptionEngine(model_id, audio_cache=audio_cache, result_cache=result_cache,
+                                     registry=registry, int8=args.int8, assisted=args.assisted,
+                                     assistant_model_id=args.draft_model, memory_budget_mb=args.memory_budget_mb,
+                                     workers=args.workers, chunking=args.chunking,
+                                     checkpoints=None if args.no_checkpoint else CheckpointStore())
+        print(f"Chargement du modèle {engine.model_id} sur {engine.device}"
+              + (" (INT8)" if engine.int8 else "") + "...")
+    load_start = time.time()
+    try:
+        engine.load(progress_callback=lambda fraction, message: print(f"  {message}"))
+    except (ModelNotAvailableError, ServiceError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Modèle chargé en {format_duration(time.time() - load_start)}")
+    if args.assisted and args.beam_size != 1:
+        print("Le décodage assisté ne s'applique qu'avec --beam-size 1", file=sys.stderr)
+
+    cancel_token = CancellationToken()
+    install_cancel_handler(cancel_token)
+    # Le mode continu diffuse un fichier à la fois ; le service traite ses tâches une à une
+    cross_batch = args.cross_batch and not args.stream and not args.service
+    if job_queue is not None:
+        if cross_batch:
+            return run_job_queue_batched(engine, job_queue, cancel_token)
+        return run_job_queue(engine, job_queue, cancel_token, stream=args.stream)
+
+    failures = 0
+    total_audio = 0.0
+    batch_start = time.time()
+    if cross_batch:
+        requests = []
+        for index, audio_file in enumerate(audio_files, start=1):
+            paths = output_paths(audio_file, formats, args.output_dir)
+            prefix = f"[{index}/{len(audio_files)}] {audio_file}"
+            if args.skip_existing and all(os.path.exists(p) for p in paths.values()):
+                print(f"{prefix}: déjà transcrit, ignoré")
+                continue
+            requests.append(((prefix, paths), audio_file, params))
+        try:
+            failures, total_audio = run_cross_batch(engine, requests, cancel_token)
+        except TranscriptionCancelled:
+            print("Traitement annulé", file=sys.stderr)
+            return 130
+    else:
+        for index, audio_file in enumerate(audio_files, start=1):
+            paths = output_paths(audio_file, formats, args.output_dir)
+            prefix = f"[{index}/{len(audio_files)}] {audio_file}"
+            if args.skip_existing and all(os.path.exists(p) for p in paths.values()):
+                print(f"{prefix}: déjà transcrit, ignoré")
+                continue
+            if index < len(audio_files):
+                # Décoder le fichier suivant pendant la transcription de celui-ci
+                engine.prefetch_audio(audio_files[index], vad=args.vad)
+
+            try:
+                metadata = transcribe_file(engine, audio_file, paths, params, cancel_token, prefix, stream=args.stream)
+            except TranscriptionCancelled:
+                print("Traitement annulé", file=sys.stderr)
+                return 130
+            except Exception as e:
+                failures += 1
+                print(f"{prefix}: erreur - {e}", file=sys.stderr)
+                continue
+            total_audio += metadata["duration"]
+            print_file_result(prefix, metadata)
+
+    elapsed = time.time() - batch_start
+    print(f"Terminé: {len(audio_files) - failures}/{len(audio_files)} fichiers, "
+          f"{format_duration(total_audio)} d'audio en {format_duration(elapsed)}"
+          + (f" ({total_audio / elapsed:.1f}x temps réel)" if elapsed > 0 else ""))
+    return 1 if failures else 0
+
+
+def cmd_jobs(args):
+    """Afficher et gérer la file persistante des transcriptions"""
+    job_queue = JobQueue()
+    if args.cancel is not None:
+        if not job_queue.cancel(args.cancel):
+            print(f"Tâche {args.cancel} introuvable ou déjà commencée", file=sys.stderr)
+            return 1
+        print(f"Tâche {args.cancel} retirée de la file")
+    if args.retry is not None:
+        if not job_queue.retry(args.retry):
+            print(f"Tâche {args.retry} introuvable ou pas en échec", file=sys.stderr)
+            return 1
+        print(f"Tâche {args.retry} remise en attente")
+    if args.purge:
+        print(f"{job_queue.purge()} tâche(s) terminée(s) supprimée(s)")
+
+    statuses = None if args.all else ("pending", "running", "failed")
+    jobs = job_queue.jobs(statuses)
+    if not jobs:
+        print(f"Aucune tâche dans {job_queue.db_path}")
+        return 0
+    for job in jobs:
+        line = (f"{job.id:>5}  {job.status:<9}  priorité {job.priority:<3}  "
+                f"essais {job.attempts}/{job.max_attempts}  {job.audio_file}")
+        if job.error and job.status != "done":
+            line += f"  ({job.error})"
+        print(line)
+    return 0
+
+
+def cmd_models(args):
+    """Lister les modèles locaux enregistrés et contrôler leurs fichiers"""
+    registry = ModelRegistry()
+    if args.register:
+        registry.register(args.register)
+        print(f"{args.register} enregistré dans {registry.manifest_path}")
+
+    models = registry.load_manifest()["models"]
+    if not models:
+        print(f"Aucun modèle enregistré dans {registry.models_dir}")
+        return 1
+
+    status = 0
+    for model_id, entry in sorted(models.items()):
+        size_mb = sum(f["size"] for f in entry["files"].values()) / (1024 * 1024)
+        default = " (par défaut)" if model_id == MODEL_CATALOG[DEFAULT_MODEL]["id"] else ""
+        name = catalog_name(model_id)
+        label = f"{name} - {model_id}" if name else model_id
+        print(f"{label}{default}: révision {entry['revision']}, {len(entry['files'])} fichiers, {size_mb:.0f} Mo")
+        if args.verify:
+            problems = registry.verify(model_id, check_hashes=True)
+            for problem in problems:
+                print(f"  {problem}")
+            print("  intègre" if not problems else "  corrompu ou incomplet")
+            status = status or (1 if problems else 0)
+    return status
+
+
+def cmd_quantize(args):
+    """Construire et enregistrer le modèle quantifié INT8 pour l'inférence sur CPU"""
+    from transcription_engine import TranscriptionEngine
+
+    engine = TranscriptionEngine(select_model_id(args.model, ModelRegistry()), int8=True)
+    if not engine.int8:
+        print("La quantification INT8 ne concerne que l'inférence sur CPU", file=sys.stderr)
+        return 1
+    start_time = time.time()
+    engine.load(progress_callback=lambda fraction, message: print(f"  {message}"))
+    print(f"Modèle INT8 prêt en {format_duration(time.time() - start_time)}")
+    return 0
+
+
+def cmd_benchmark_int8(args):
+    """Comparer les moteurs float32 et INT8 (RTF et WER) sur des fichiers audio"""
+    from benchmark import compare_int8
+
+    audio_files = collect_audio_files(args.inputs)
+    if not audio_files:
+        print("Aucun fichier audio à transcrire", file=sys.stderr)
+        return 1
+    report = compare_int8(audio_files, model_id=select_model_id(args.model, ModelRegistry()),
+                          language=args.language, num_beams=args.beam_size, references_dir=args.references)
+
+    for entry in report["files"]:
+        line = (f"{entry['file']}: RTF fp32 {entry['rtf_fp32']:.2f} / int8 {entry['rtf_int8']:.2f}, "
+                f"écart int8/fp32 {entry['wer_int8_vs_fp32']:.1%}")
+        if "wer_int8" in entry:
+            line += f", WER fp32 {entry['wer_fp32']:.1%} / int8 {entry['wer_int8']:.1%}"
+        print(line)
+    print(f"RTF global: fp32 {report['engines']['fp32']['rtf']:.2f}, int8 {report['engines']['int8']['rtf']:.2f} "
+          f"(x{report['speedup']:.2f})")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+def cmd_autotune(args):
+    """Calibrer l'inférence sur cette machine et enregistrer le profil le plus rapide"""
+    from autotune import autotune
+    from transcription_engine import PROFILE_FILE
+
+    registry = ModelRegistry()
+    model_id = select_model_id(args.model, registry, language=args.language)
+    print(f"Calibration de {model_id} (environ {args.duration:.0f} s d'audio par mesure)...")
+    try:
+        profile = autotune(model_id, registry, audio_path=args.audio, duration_s=args.duration,
+                           language=args.language)
+    except ModelNotAvailableError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Profil retenu : attention {profile['attn_implementation']}, {profile['dtype']}, "
+          f"lot {profile['batch_size']}, {profile['intra_op_threads']} threads "
+          f"(+{profile['inter_op_threads']} inter-op), {profile['throughput']:.2f}x temps réel")
+    print(f"Enregistré dans {PROFILE_FILE}")
+    return 0
+
+
+def cmd_benchmark(args):
+    """Mesurer chargement, RTF, pic mémoire et jetons/s sur de l'audio synthétique"""
+    from benchmark_suite import run_suite
+
+    model_id = select_model_id(args.model, ModelRegistry()) if args.model else None
+    report = run_suite(model_id, durations=args.durations, formats=args.formats, configs=args.configs,
+                       language=args.language)
+    for name, result in report["configs"].items():
+        if "error" in result:
+            print(f"{name}: échec ({result['error']})")
+            continue
+        peak = f"{result['peak_rss_mb']:.0f} Mo" if result["peak_rss_mb"] is not None else "?"
+        print(f"{name}: chargement {result['load_time']:.2f} s, RTF {result['rtf']:.3f}, "
+              f"{result['tokens_per_s']:.1f} jetons/s, {result['windows']} fenêtres, pic mémoire {peak}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Rapport écrit dans {args.json}")
+    return 0
+
+
+def cmd_serve(args):
+    """Garder le modèle chargé et transcrire pour l'interface et la ligne de commande"""
+    from checkpoint import CheckpointStore
+    from transcription_engine import TranscriptionEngine
+
+    engine = TranscriptionEngine(select_model_id(args.model, ModelRegistry()), audio_cache=AudioCache(),
+                                 result_cache=ResultCache(), checkpoints=CheckpointStore(), int8=args.int8, assisted=args.assisted,
+                                 memory_budget_mb=args.memory_budget_mb, workers=args.workers, chunking=args.chunking)
+    print(f"Chargement du modèle {engine.model_id} sur {engine.device}"
+          + (" (INT8)" if engine.int8 else "") + "...")
+    try:
+        serve(engine, host=args.host, port=args.port, max_queue=args.max_queue)
+    except ModelNotAvailableError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except OSError as e:
+        print(f"Impossible d'écouter sur {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def build_parser(prefs=None):
+    """Construire l'analyseur d'arguments (valeurs par défaut issues des préférences)"""
+    prefs = prefs or {}
+    parser = argparse.ArgumentParser(prog="audiotrans", description="AudioTrans Pro en ligne de commande")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    transcribe = subparsers.add_parser("transcribe", help="Transcrire des fichiers ou des dossiers audio")
+    transcribe.add_argument("inputs", nargs="*", help="Fichiers audio ou dossiers à transcrire")
+    transcribe.add_argument("-l", "--language", default=prefs.get("language", "fr"),
+                            help="Code de langue (fr, en, de, es, it)")
+    transcribe.add_argument("-f", "--format", choices=["txt", "docx", "both"], default=prefs.get("format", "txt"),
+                            help="Format de sortie")
+    transcribe.add_argument("-o", "--output-dir", help="Dossier de sortie (par défaut à côté de chaque fichier)")
+    transcribe.add_argument("--temperature", type=float, default=prefs.get("precision", 0.0),
+                            help="Température de décodage (0.0 = précision maximale)")
+    transcribe.add_argument("--beam-size", type=int, choices=[1, 2, 3], default=prefs.get("beam_size", 1),
+                            help="Taille du faisceau (1 = Rapide, 2 = Standard, 3 = Élevée)")
+    transcribe.add_argument("-m", "--model", default=prefs.get("model", DEFAULT_MODEL),
+                            help=f"Modèle : {', '.join(MODEL_CATALOG)}, {AUTO_MODEL} ou identifiant Hugging Face "
+                                 "(auto = le plus précis respectant --target-rtf sur cette machine)")
+    transcribe.add_argument("--target-rtf", type=float, default=prefs.get("target_rtf", DEFAULT_TARGET_RTF),
+                            help="Facteur temps réel visé par le mode auto (0.5 = 2x plus rapide que le temps réel)")
+    transcribe.add_argument("--int8", action="store_true", default=prefs.get("int8", False),
+                            help="Utiliser le modèle quantifié INT8 (CPU uniquement)")
+    transcribe.add_argument("--assisted", action="store_true", default=prefs.get("assisted", False),
+                            help="Décodage assisté : un modèle distillé propose les jetons, le modèle "
+                                 "principal les vérifie (même texte, plus rapide ; --beam-size 1)")
+    transcribe.add_argument("--draft-model", default=None,
+                            help="Modèle d'ébauche du décodage assisté (par défaut distil-large-v3 pour large-v3)")
+    transcribe.add_argument("--timestamps", action="store_true", default=prefs.get("timestamps", False),
+                            help="Inclure les horodatages")
+    transcribe.add_argument("--stream", action="store_true", default=prefs.get("streaming", False),
+                            help="Afficher et écrire (<sortie>.part) chaque segment dès qu'il est décodé")
+    transcribe.add_argument("--vad", action="store_true", default=prefs.get("vad", False),
+                            help="Ne transcrire que les zones de parole détectées (ignorer les silences)")
+    transcribe.add_argument("--memory-budget-mb", type=float, default=prefs.get("memory_budget_mb"),
+                            help="Mémoire allouée aux lots de segments (Mo, par défaut 60%% de la mémoire libre)")
+    transcribe.add_argument("--workers", type=int, default=prefs.get("workers", 1),
+                            help="Processus de calcul sur CPU se partageant les segments de chaque fichier "
+                                 "(poids partagés, threads répartis entre eux)")
+    transcribe.add_argument("--service", nargs="?", const=prefs.get("service_url", DEFAULT_SERVICE_URL),
+                            default=None, metavar="URL",
+                            help="Transcrire dans le service local déjà lancé (audiotrans serve), "
+                                 "sans charger le modèle")
+    transcribe.add_argument("--chunking", choices=CHUNKING_MODES, default=prefs.get("chunking", "stride"),
+                            help="Découpage en fenêtres : stride (30 s recouvrantes de 5 s) ou silence "
+                                 "(coupées sur les pauses, sans recouvrement, moins de calcul)")
+    transcribe.add_argument("--cross-batch", action="store_true", default=prefs.get("cross_batch", False),
+                            help="Remplir chaque lot du modèle avec les segments de plusieurs fichiers courts "
+                                 "(débit multiplié sur de nombreux enregistrements brefs ; sans effet avec "
+                                 "--stream ou --service). Les fichiers de moins de 2 minutes n'ont alors pas "
+                                 "de point de reprise : interrompus, ils sont retranscrits en entier")
+    transcribe.add_argument("--metrics-log", metavar="FICHIER", default=prefs.get("metrics_log"),
+                            help="Ajouter les mesures par étape de chaque fichier à FICHIER (une ligne JSON par tâche)")
+    transcribe.add_argument("--no-audio-cache", action="store_true",
+                            help="Ne pas utiliser le cache de l'audio décodé")
+    transcribe.add_argument("--audio-cache-mb", type=int, default=prefs.get("audio_cache_mb", DEFAULT_MAX_MB),
+                            help="Taille maximale du cache de l'audio décodé (Mo)")
+    transcribe.add_argument("--no-result-cache", action="store_true",
+                            default=not prefs.get("result_cache", True),
+                            help="Toujours relancer l'inférence (ni lecture ni écriture du cache des transcriptions)")
+    transcribe.add_argument("--no-checkpoint", action="store_true",
+                            help="Ne pas enregistrer de point de reprise par segment (une transcription "
+                                 "interrompue repart alors du début)")
+    transcribe.add_argument("--skip-existing", action="store_true",
+                            help="Ignorer les fichiers dont les sorties existent déjà")
+    transcribe.add_argument("--no-recursive", action="store_true",
+                            help="Ne pas parcourir les sous-dossiers")
+    transcribe.add_argument("--queue", action="store_true",
+                            help="Passer par la file persistante : les fichiers y sont enregistrés, et les tâches "
+                                 "restantes (y compris celles d'un lancement interrompu) sont traitées par priorité")
+    transcribe.add_argument("--priority", type=int, default=0,
+                            help="Priorité des fichiers ajoutés à la file (les plus élevées d'abord)")
+    transcribe.set_defaults(func=cmd_transcribe)
+
+    jobs = subparsers.add_parser("jobs", help="Afficher et gérer la file persistante des transcriptions")
+    jobs.add_argument("--all", action="store_true", help="Afficher aussi les tâches terminées et annulées")
+    jobs.add_argument("--cancel", type=int, metavar="ID", help="Retirer une tâche en attente")
+    jobs.add_argument("--retry", type=int, metavar="ID", help="Remettre en attente une tâche en échec")
+    jobs.add_argument("--purge", action="store_true", help="Supprimer les tâches terminées et annulées")
+    jobs.set_defaults(func=cmd_jobs)
+
+    models = subparsers.add_parser("models", help="Lister et vérifier les modèles téléchargés")
+    models.add_argument("--verify", action="store_true",
+                        help="Recalculer les empreintes SHA-256 et les comparer au manifeste")
+    models.add_argument("--register", metavar="MODEL_ID",
+                        help="Enregistrer un modèle copié manuellement dans le dossier des modèles")
+    models.set_defaults(func=cmd_models)
+
+    quantize = subparsers.add_parser("quantize", help="Construire le modèle quantifié INT8 pour le CPU")
+    quantize.add_argument("-m", "--model", default=prefs.get("model", DEFAULT_MODEL),
+                          help="Modèle du catalogue ou identifiant Hugging Face")
+    quantize.set_defaults(func=cmd_quantize)
+
+    tune = subparsers.add_parser("autotune", help="Mesurer et enregistrer la configuration d'inférence la plus rapide")
+    tune.add_argument("-m", "--model", default=prefs.get("model", DEFAULT_MODEL),
+                      help="Modèle du catalogue ou identifiant Hugging Face")
+    tune.add_argument("-l", "--language", default=prefs.get("language", "fr"), help="Code de langue")
+    tune.add_argument("--audio", help="Enregistrement de parole pour la calibration (sinon signal synthétique)")
+    tune.add_argument("--duration", type=float, default=120, help="Durée d'audio par mesure (secondes)")
+    tune.set_defaults(func=cmd_autotune)
+
+    bench = subparsers.add_parser("benchmark-int8", help="Comparer RTF et WER des moteurs float32 et INT8")
+    bench.add_argument("inputs", nargs="+", help="Fichiers audio ou dossiers de test")
+    bench.add_argument("-m", "--model", default=prefs.get("model", DEFAULT_MODEL),
+                       help="Modèle du catalogue ou identifiant Hugging Face")
+    bench.add_argument("-l", "--language", default=prefs.get("language", "fr"), help="Code de langue")
+    bench.add_argument("--beam-size", type=int, choices=[1, 2, 3], default=1, help="Taille du faisceau")
+    bench.add_argument("--references", metavar="DOSSIER",
+                       help="Dossier des transcriptions de référence <nom>.txt (sinon WER par rapport au float32)")
+    bench.add_argument("--json", metavar="FICHIER", help="Écrire le rapport complet en JSON")
+    bench.set_defaults(func=cmd_benchmark_int8)
+
+    suite = subparsers.add_parser("benchmark", help="Suite de performance hors ligne sur de l'audio synthétique")
+    suite.add_argument("-m", "--model", default=None,
+                       help="Modèle à mesurer (par défaut un petit Whisper aléatoire, sans téléchargement)")
+    suite.add_argument("-l", "--language", default="fr", help="Code de langue")
+    suite.add_argument("--durations", type=float, nargs="+", default=DEFAULT_DURATIONS,
+                       help="Durées de l'audio généré (secondes)")
+    suite.add_argument("--formats", nargs="+", default=DEFAULT_FORMATS, help="Formats audio générés")
+    suite.add_argument("--configs", nargs="+", choices=list(BENCHMARK_CONFIGS), default=DEFAULT_CONFIGS,
+                       help="Configurations mesurées")
+    suite.add_argument("--json", metavar="FICHIER", help="Écrire le rapport complet en JSON")
+    suite.set_defaults(func=cmd_benchmark)
+
+    service = subparsers.add_parser("serve", help="Service local gardant le modèle chargé entre les transcriptions")
+    service.add_argument("-m", "--model", default=prefs.get("model", DEFAULT_MODEL),
+                         help="Modèle chargé par le service")
+    service.add_argument("--int8", action="store_true", default=prefs.get("int8", False),
+                         help="Utiliser le modèle quantifié INT8 (CPU uniquement)")
+    service.add_argument("--assisted", action="store_true", default=prefs.get("assisted", False),
+                         help="Décodage assisté par le modèle distil-large-v3 (large-v3 uniquement)")
+    service.add_argument("--memory-budget-mb", type=float, default=prefs.get("memory_budget_mb"),
+                         help="Mémoire allouée aux lots de segments (Mo)")
+    service.add_argument("--workers", type=int, default=prefs.get("workers", 1),
+                         help="Processus de calcul sur CPU")
+    service.add_argument("--chunking", choices=CHUNKING_MODES, default=prefs.get("chunking", "stride"),
+                         help="Découpage en fenêtres (stride ou silence)")
+    service.add_argument("--host", default=DEFAULT_HOST, help="Adresse d'écoute (locale par défaut)")
+    service.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port d'écoute")
+    service.add_argument("--max-queue", type=int, default=MAX_QUEUE,
+                         help="Tâches en attente acceptées avant de refuser les demandes")
+    service.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv=None):
+    """Point d'entrée de la ligne de commande"""
+    parser = build_parser(load_preferences_file())
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    # Les processus de calcul (--workers) relancent l'exécutable en mode gelé
+    multiprocessing.freeze_support()
+    sys.exit(main())
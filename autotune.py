@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+from datetime import datetime
+import numpy as np
+import torch
+
+from benchmark import word_error_rate
+from model_registry import ModelRegistry
+from transcript_files import result_text
+from transcription_engine import (
+    SAMPLING_RATE,
+    TranscriptionEngine,
+    apply_thread_settings,
+    decode_audio,
+    save_profile,
+)
+
+# Durée d'audio utilisée pour chaque mesure (secondes)
+CALIBRATION_S = 120
+# Longueur de génération plafonnée pour que toutes les mesures décodent autant de jetons
+MAX_NEW_TOKENS = 128
+# Écart de texte toléré par rapport à la configuration de référence (float32, eager)
+MAX_WER_DRIFT = 0.1
+BATCH_SIZES = [1, 2, 4, 8, 16]
+
+
+def cpu_supports_bf16():
+    """Indiquer si le CPU dispose d'instructions bfloat16 exploitées par oneDNN"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def physical_cores():
+    """Nombre de cœurs physiques (psutil si disponible, sinon cœurs logiques)"""
+    try:
+        import psutil
+        return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    except ImportError:
+        return os.cpu_count() or 1
+
+
+def thread_candidates(cores=None):
+    """Nombres de threads intra-opération à essayer : cœurs logiques, physiques et fractions"""
+    cores = cores or os.cpu_count() or 1
+    candidates = {cores, physical_cores(), max(1, cores // 2), max(1, cores // 4)}
+    return sorted(candidates, reverse=True)
+
+
+def calibration_audio(path=None, duration_s=CALIBRATION_S):
+    """Audio de calibration : le début d'un fichier fourni ou un signal synthétique
+
+    Un enregistrement de parole réel donne des mesures plus représentatives ; le signal
+    synthétique (harmoniques modulées et bruit) sert quand aucun fichier n'est fourni.
+    """
+    n_samples = int(duration_s * SAMPLING_RATE)
+    if path:
+        return np.ascontiguousarray(decode_audio(path, SAMPLING_RATE)[:n_samples], dtype=np.float32)
+    rng = np.random.default_rng(0)
+    t = np.arange(n_samples) / SAMPLING_RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLING_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = (np.sin(2 * np.pi * 2.5 * t) > -0.2).astype(np.float32)
+    audio = 0.2 * voiced * envelope + 0.01 * rng.standard_normal(n_samples)
+    return audio.astype(np.float32)
+
+
+def measure(engine, audio, batch_size, language="fr"):
+    """Transcrire audio avec un lot donné et retourner (secondes d'audio par seconde, texte)"""
+    preprocess_params, forward_params, postprocess_params = engine.pipeline_params(language)
+    forward_params["max_new_tokens"] = MAX_NEW_TOKENS
+    start_time = time.perf_counter()
+    outputs = list(engine.iter_chunk_outputs(audio, preprocess_params, forward_params, batch_size=batch_size))
+    elapsed = time.perf_counter() - start_time
+    text = result_text(engine.pipe.postprocess(outputs, **postprocess_params))
+    return len(audio) / SAMPLING_RATE / elapsed, text
+
+
+def build_engine(model_id, registry, attn_implementation, dtype):
+    """Charger un moteur avec une configuration d'attention et de type de données imposée"""
+    engine = TranscriptionEngine(model_id, registry=registry,
+                                 profile={"attn_implementation": attn_implementation, "dtype": dtype})
+    engine.load()
+    return engine
+
+
+class Autotuner:
+    """Calibration des paramètres d'inférence sur la machine locale
+
+    Recherche par étapes pour limiter le nombre de chargements du modèle : threads
+    intra-opération, puis taille de lot, puis implémentation de l'attention et type de
+    données (un chargement par combinaison), enfin threads inter-opération (réglables une
+    seule fois par processus, donc mesurés dans des processus séparés). Une configuration
+    dont le texte s'écarte de la référence float32 de plus de MAX_WER_DRIFT est écartée.
+    """
+
+    def __init__(self, model_id, registry=None, audio=None, language="fr", log=print):
+        self.model_id = model_id
+        self.registry = registry or ModelRegistry()
+        self.audio = calibration_audio() if audio is None else audio
+        self.language = language
+        self.log = log
+        self.reference_text = None
+        self.results = []
+
+    def trial(self, engine, label, batch_size, intra_op_threads):
+        """Mesurer une configuration et l'enregistrer dans les résultats"""
+        torch.set_num_threads(intra_op_threads)
+        try:
+            throughput, text = measure(engine, self.audio, batch_size, self.language)
+        except torch.cuda.OutOfMemoryError:
+            torch.cuda.empty_cache()
+            self.log(f"  {label}, lot {batch_size}: mémoire GPU insuffisante")
+            return None
+        if self.reference_text is None:
+            self.reference_text = text
+        drift = word_error_rate(self.reference_text, text)
+        result = {
+            "attn_implementation": engine.attn_implementation,
+            "dtype": str(engine.torch_dtype).replace("torch.", ""),
+            "batch_size": batch_size,
+            "intra_op_threads": intra_op_threads,
+            "throughput": throughput,
+            "drift": drift
+        }
+        self.results.append(result)
+        status = "" if drift <= MAX_WER_DRIFT else f" (écarté : écart de texte {drift:.0%})"
+        self.log(f"  {label}, lot {batch_size}, {intra_op_threads} threads: {throughput:.2f}x temps réel{status}")
+        return result
+
+    def best(self, results):
+        valid = [r for r in results if r is not None and r["drift"] <= MAX_WER_DRIFT]
+        return max(valid, key=lambda r: r["throughput"]) if valid else None
+
+    def precision_candidates(self, device):
+        """Combinaisons (attention, type de données) à essayer sur ce périphérique"""
+        if device.startswith("cuda"):
+            dtypes = ["float16", "float32"]
+        else:
+            dtypes = ["float32"] + (["bfloat16"] if cpu_supports_bf16() else [])
+        return [(attn, dtype) for dtype in dtypes for attn in ("eager", "sdpa")]
+
+    def run(self, inter_op=True):
+        """Exécuter la calibration complète et retourner le profil retenu"""
+        device = TranscriptionEngine(self.model_id, registry=self.registry).device
+        candidates = self.precision_candidates(device)
+        baseline_attn, baseline_dtype = candidates[0] if device.startswith("cuda") else ("eager", "float32")
+
+        self.log(f"Référence : attention {baseline_attn}, {baseline_dtype}")
+        engine = build_engine(self.model_id, self.registry, baseline_attn, baseline_dtype)
+        label = f"{baseline_attn}/{baseline_dtype}"
+        # Échauffement : la première exécution paie des initialisations ponctuelles
+        measure(engine, self.audio[:SAMPLING_RATE * 5], 1, self.language)
+
+        threads = self.best([self.trial(engine, label, 4, n) for n in thread_candidates()])
+        best_threads = threads["intra_op_threads"] if threads else torch.get_num_threads()
+
+        n_chunks = engine.chunk_layout(len(self.audio), engine.pipeline_params(self.language)[0])
+        batches = self.best([self.trial(engine, label, b, best_threads) for b in BATCH_SIZES if b <= max(1, n_chunks)])
+        best_batch = batches["batch_size"] if batches else 1
+        del engine
+
+        for attn, dtype in candidates:
+            if (attn, dtype) == (baseline_attn, baseline_dtype):
+                continue
+            try:
+                engine = build_engine(self.model_id, self.registry, attn, dtype)
+            except (ValueError, ImportError, RuntimeError) as e:
+                self.log(f"  {attn}/{dtype}: non disponible ({e})")
+                continue
+            measure(engine, self.audio[:SAMPLING_RATE * 5], 1, self.language)
+            self.trial(engine, f"{attn}/{dtype}", best_batch, best_threads)
+            del engine
+
+        best = self.best(self.results)
+        if best is None:
+            raise RuntimeError("Aucune configuration n'a pu être mesurée")
+        profile = dict(best)
+        profile["inter_op_threads"] = torch.get_num_interop_threads()
+        if inter_op and not getattr(sys, "frozen", False):
+            profile["inter_op_threads"] = self.tune_inter_op(profile)
+
+        profile.pop("drift", None)
+        profile["created"] = datetime.now().isoformat(timespec="seconds")
+        return profile
+
+    def tune_inter_op(self, profile):
+        """Comparer quelques nombres de threads inter-opération, chacun dans un processus neuf"""
+        best_value, best_throughput = profile["inter_op_threads"], 0.0
+        fd, audio_path = tempfile.mkstemp(suffix=".npy")
+        os.close(fd)
+        np.save(audio_path, self.audio)
+        try:
+            for value in sorted({1, 2, max(1, physical_cores() // 4)}):
+                config = {**profile, "inter_op_threads": value, "model_id": self.model_id,
+                          "models_dir": self.registry.models_dir, "language": self.language}
+                try:
+                    completed = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--trial", json.dumps(config), audio_path],
+                        capture_output=True, text=True, check=True
+                    )
+                    throughput = json.loads(completed.stdout.strip().splitlines()[-1])["throughput"]
+                except (subprocess.CalledProcessError, ValueError, IndexError, KeyError) as e:
+                    self.log(f"  inter-op {value}: échec de la mesure ({e})")
+                    continue
+                self.log(f"  inter-op {value}: {throughput:.2f}x temps réel")
+                if throughput > best_throughput:
+                    best_value, best_throughput = value, throughput
+        finally:
+            os.remove(audio_path)
+        return best_value
+
+
+def autotune(model_id, registry=None, audio_path=None, duration_s=CALIBRATION_S, language="fr", log=print,
+             save=True):
+    """Calibrer la machine pour model_id et enregistrer le profil retenu"""
+    tuner = Autotuner(model_id, registry, calibration_audio(audio_path, duration_s), language, log)
+    profile = tuner.run()
+    if save:
+        engine = TranscriptionEngine(model_id, registry=registry)
+        save_profile(profile, engine.model_id, engine.device)
+    return profile
+
+
+def _trial_main(config_json, audio_path):
+    """Point d'entrée d'une mesure isolée (threads inter-opération fixés au démarrage)"""
+    config = json.loads(config_json)
+    apply_thread_settings(config)
+    audio = np.load(audio_path)
+    engine = TranscriptionEngine(config["model_id"], registry=ModelRegistry(config["models_dir"]), profile=config)
+    engine.load()
+    measure(engine, audio[:SAMPLING_RATE * 5], 1, config["language"])
+    throughput, _ = measure(engine, audio, config["batch_size"], config["language"])
+    print(json.dumps({"throughput": throughput}))
+
+
+if __name__ == "__main__" and len(sys.argv) == 4 and sys.argv[1] == "--trial":
+    _trial_main(sys.argv[2], sys.argv[3])
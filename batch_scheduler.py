@@ -0,0 +1,80 @@
+# Fichiers plus longs (secondes) : transcrits seuls, leurs segments remplissent déjà les lots
+CROSS_BATCH_MAX_S = 120
+# Fichiers préparés d'avance (décodage, caractéristiques) pendant que le modèle calcule
+PREFETCH_FILES = 4
+
+
+class FileSlot:
+    """Segments d'un fichier répartis dans les lots partagés, et sorties déjà reçues"""
+
+    def __init__(self, key, group, total):
+        self.key = key
+        self.group = group
+        self.outputs = [None] * total
+        self.received = 0
+
+    @property
+    def done(self):
+        return self.received == len(self.outputs)
+
+
+class BatchScheduler:
+    """Remplir les lots du modèle avec les segments de plusieurs fichiers
+
+    Les segments attendent par groupe (mêmes paramètres de décodage : langue, température,
+    faisceaux, horodatages) ; les lots partent dès que leur groupe compte batches_per_call
+    lots complets de batch_size(groupe) segments, quels que soient leurs fichiers d'origine
+    (un lot par processus de calcul, envoyés ensemble). Chaque sortie est rangée à sa place
+    dans son fichier. forward(groupe, lots, clés) exécute le modèle sur les lots, clés donnant
+    le fichier de chaque segment, et rend les sorties dans l'ordre. add() et flush()
+    retournent les fichiers terminés, [(FileSlot, erreur)] : une erreur du modèle fait
+    échouer tous les fichiers de l'appel, dont les autres segments en attente sont abandonnés.
+    """
+
+    def __init__(self, forward, batch_size, batches_per_call=1):
+        self.forward = forward
+        self.batch_size = batch_size
+        self.batches_per_call = max(1, batches_per_call)
+        self.pending = {}  # groupe -> [(slot, index du segment, caractéristiques)]
+
+    def add(self, key, group, features):
+        """Mettre en attente les segments d'un fichier et exécuter les lots complets"""
+        slot = FileSlot(key, group, len(features))
+        queue = self.pending.setdefault(group, [])
+        queue.extend((slot, index, item) for index, item in enumerate(features))
+        finished = []
+        while len(self.pending.get(group, ())) >= self.batch_size(group) * self.batches_per_call:
+            finished.extend(self._run(group))
+        return finished
+
+    def flush(self):
+        """Exécuter les lots incomplets qui restent"""
+        finished = []
+        for group in list(self.pending):
+            while self.pending.get(group):
+                finished.extend(self._run(group))
+        return finished
+
+    def _run(self, group):
+        queue = self.pending[group]
+        size = self.batch_size(group)
+        batches = []
+        while queue and len(batches) < self.batches_per_call:
+            batches.append(queue[:size])
+            queue[:] = queue[size:]
+        batch = [entry for entries in batches for entry in entries]
+        try:
+            outputs = list(self.forward(group, [[item for _, _, item in entries] for entries in batches],
+                                        [[slot.key for slot, _, _ in entries] for entries in batches]))
+        except Exception as e:
+            failed = {id(slot): slot for slot, _, _ in batch}
+            for waiting in self.pending.values():
+                waiting[:] = [entry for entry in waiting if id(entry[0]) not in failed]
+            return [(slot, e) for slot in failed.values()]
+        finished = []
+        for (slot, index, _), output in zip(batch, outputs):
+            slot.outputs[index] = output
+            slot.received += 1
+            if slot.done:
+                finished.append((slot, None))
+        return finished
@@ -0,0 +1,82 @@
+import gc
+import torch
+
+from model_catalog import available_ram_mb
+
+# Plafond des lots adaptatifs (au-delà, le gain de débit est négligeable)
+MAX_ADAPTIVE_BATCH = 16
+# Part de la mémoire libre (après chargement du modèle) allouée aux lots par défaut
+MEMORY_BUDGET_FRACTION = 0.6
+# Marge pour les tampons temporaires non comptés (copies, allocateur, prétraitement)
+OVERHEAD_FACTOR = 1.5
+
+# Messages des erreurs d'allocation de PyTorch (CUDA et allocateur CPU)
+OUT_OF_MEMORY_MESSAGES = ("out of memory", "not enough memory", "can't allocate memory", "cannot allocate memory")
+
+
+def dtype_bytes(torch_dtype):
+    return torch.empty(0, dtype=torch_dtype).element_size()
+
+
+def estimate_chunk_memory_mb(config, torch_dtype=torch.float32, num_beams=1):
+    """Estimer la mémoire de travail (Mo) nécessaire pour décoder un segment de 30 s
+
+    Encodeur : scores d'attention (têtes x 1500 x 1500), couche FFN et états cachés.
+    Décodeur, par faisceau : cache clés/valeurs de l'auto-attention (jusqu'à
+    max_target_positions jetons), de l'attention croisée (1500 positions) et scores du
+    vocabulaire. Le nombre de faisceaux multiplie donc la part du décodeur.
+    """
+    size = dtype_bytes(torch_dtype)
+    source = config.max_source_positions
+    target = config.max_target_positions
+    d_model = config.d_model
+
+    encoder = (
+        config.encoder_attention_heads * source * source
+        + config.encoder_ffn_dim * source
+        + 4 * source * d_model
+    ) * size + config.num_mel_bins * source * 2 * 4  # caractéristiques log-mel en float32
+    decoder_per_beam = (
+        2 * config.decoder_layers * target * d_model
+        + 2 * config.decoder_layers * source * d_model
+        + 4 * config.vocab_size
+    ) * size
+    return (encoder + decoder_per_beam * max(1, num_beams)) * OVERHEAD_FACTOR / (1024 * 1024)
+
+
+def available_memory_mb(device):
+    """Mémoire libre du périphérique en Mo (None si indéterminée)"""
+    if device.startswith("cuda"):
+        free, _ = torch.cuda.mem_get_info(torch.device(device))
+        return free / (1024 * 1024)
+    return available_ram_mb()
+
+
+def adaptive_batch_size(config, torch_dtype, num_beams, device, memory_budget_mb=None, upper_bound=None):
+    """Nombre de segments par lot tenant dans le budget mémoire
+
+    Sans budget explicite, MEMORY_BUDGET_FRACTION de la mémoire actuellement libre est
+    utilisée. upper_bound (lot mesuré par autotune, par exemple) plafonne le résultat.
+    """
+    if memory_budget_mb is None:
+        free_mb = available_memory_mb(device)
+        if free_mb is None:
+            return upper_bound or 1
+        memory_budget_mb = free_mb * MEMORY_BUDGET_FRACTION
+    per_chunk = estimate_chunk_memory_mb(config, torch_dtype, num_beams)
+    size = int(memory_budget_mb // per_chunk)
+    return max(1, min(size, upper_bound or MAX_ADAPTIVE_BATCH))
+
+
+def is_out_of_memory(error):
+    """Indiquer si une exception correspond à un manque de mémoire"""
+    if isinstance(error, (torch.cuda.OutOfMemoryError, MemoryError)):
+        return True
+    return isinstance(error, RuntimeError) and any(m in str(error).lower() for m in OUT_OF_MEMORY_MESSAGES)
+
+
+def release_memory():
+    """Libérer la mémoire des tenseurs abandonnés après un échec d'allocation"""
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
@@ -0,0 +1,117 @@
+import os
+import re
+import time
+
+from transcript_files import result_text
+from transcription_engine import TranscriptionEngine
+
+# Mots : lettres et chiffres (accents compris), apostrophes internes conservées
+WORD_PATTERN = re.compile(r"\w+(?:'\w+)*")
+
+
+def normalize_words(text):
+    """Découper un texte en mots minuscules sans ponctuation, pour le calcul du WER"""
+    return WORD_PATTERN.findall(text.lower().replace("’", "'"))
+
+
+def word_error_rate(reference, hypothesis):
+    """Taux d'erreur de mots (substitutions + insertions + suppressions) / mots de référence"""
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    # Distance d'édition de Levenshtein sur les mots, une ligne à la fois
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def read_reference(audio_file, references_dir):
+    """Transcription de référence <nom>.txt d'un fichier audio (None si absente)"""
+    if not references_dir:
+        return None
+    base_name = os.path.splitext(os.path.basename(audio_file))[0]
+    path = os.path.join(references_dir, f"{base_name}.txt")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def run_engine(engine, audio_files, language="fr", num_beams=1):
+    """Charger un moteur, transcrire chaque fichier et retourner (temps de chargement, résultats)"""
+    load_start = time.time()
+    engine.load()
+    load_time = time.time() - load_start
+
+    results = []
+    for audio_file in audio_files:
+        # Décodage hors chronométrage pour ne mesurer que l'inférence
+        audio = engine.load_audio(audio_file)
+        start_time = time.time()
+        raw_result = engine.run_pipeline(audio_file, language, 0.0, num_beams, False, audio=audio)
+        processing_time = time.time() - start_time
+        duration = len(audio) / 16000
+        results.append({
+            "file": audio_file,
+            "duration": duration,
+            "processing_time": processing_time,
+            "rtf": processing_time / duration if duration else 0.0,
+            "text": result_text(raw_result)
+        })
+    return load_time, results
+
+
+def compare_int8(audio_files, model_id=None, language="fr", num_beams=1, references_dir=None, registry=None):
+    """Comparer le moteur float32 et le moteur INT8 sur CPU : RTF et WER
+
+    Le WER est calculé par rapport à la transcription de référence <nom>.txt de
+    references_dir si elle existe, sinon par rapport à la sortie float32 (écart dû à la
+    quantification seule).
+    """
+    report = {"files": [], "engines": {}}
+    outputs = {}
+    for name, int8 in (("fp32", False), ("int8", True)):
+        kwargs = {"registry": registry, "int8": int8}
+        if model_id:
+            kwargs["model_id"] = model_id
+        engine = TranscriptionEngine(**kwargs)
+        if engine.device != "cpu":
+            raise RuntimeError("La comparaison INT8 ne concerne que l'inférence sur CPU")
+        load_time, outputs[name] = run_engine(engine, audio_files, language, num_beams)
+        total_audio = sum(r["duration"] for r in outputs[name])
+        total_time = sum(r["processing_time"] for r in outputs[name])
+        report["engines"][name] = {
+            "load_time": load_time,
+            "processing_time": total_time,
+            "rtf": total_time / total_audio if total_audio else 0.0
+        }
+        del engine
+
+    for fp32_result, int8_result in zip(outputs["fp32"], outputs["int8"]):
+        reference = read_reference(fp32_result["file"], references_dir)
+        entry = {
+            "file": fp32_result["file"],
+            "duration": fp32_result["duration"],
+            "rtf_fp32": fp32_result["rtf"],
+            "rtf_int8": int8_result["rtf"],
+            "wer_int8_vs_fp32": word_error_rate(fp32_result["text"], int8_result["text"])
+        }
+        if reference is not None:
+            entry["wer_fp32"] = word_error_rate(reference, fp32_result["text"])
+            entry["wer_int8"] = word_error_rate(reference, int8_result["text"])
+        report["files"].append(entry)
+
+    fp32_rtf = report["engines"]["fp32"]["rtf"]
+    int8_rtf = report["engines"]["int8"]["rtf"]
+    report["speedup"] = fp32_rtf / int8_rtf if int8_rtf else 0.0
+    return report
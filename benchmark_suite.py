@@ -0,0 +1,286 @@
+import os
+import sys
+import json
+import wave
+import shutil
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+import time
+import numpy as np
+
+from instrumentation import peak_rss_mb
+from model_registry import ModelRegistry, get_models_dir
+from transcript_files import SAMPLING_RATE, result_text
+
+# Durées d'audio synthétique générées par défaut (secondes)
+DEFAULT_DURATIONS = [10, 60, 300]
+DEFAULT_FORMATS = ["wav", "flac", "mp3"]
+# Longueur de génération plafonnée : chaque segment décode autant de jetons d'une version à l'autre
+MAX_NEW_TOKENS = 128
+
+# Configurations comparées : celle de load_model (profil neutre) et des variantes
+# Chaque entrée donne les arguments du moteur (profile, int8, workers, chunking) et num_beams
+BENCHMARK_CONFIGS = {
+    "load_model": {"profile": {}},
+    "sdpa": {"profile": {"attn_implementation": "sdpa"}},
+    "bfloat16": {"profile": {"dtype": "bfloat16"}},
+    "int8": {"profile": {}, "int8": True},
+    "beam3": {"profile": {}, "num_beams": 3},
+    "workers2": {"profile": {}, "workers": 2},
+    "silence": {"profile": {}, "chunking": "silence"},
+}
+DEFAULT_CONFIGS = ["load_model", "sdpa", "int8", "beam3", "silence"]
+
+
+def build_tiny_model(path, seed=0):
+    """Créer un petit modèle Whisper à poids aléatoires (2 couches, d_model 64) dans path
+
+    Le vocabulaire est réduit aux 256 octets de base plus les jetons spéciaux de Whisper
+    (langues, tâches, horodatages) : le pipeline complet fonctionne sans aucun
+    téléchargement. Le texte produit n'a pas de sens ; seules les durées comptent.
+    """
+    import torch
+    from transformers import (GenerationConfig, WhisperConfig, WhisperFeatureExtractor,
+                              WhisperForConditionalGeneration, WhisperProcessor, WhisperTokenizer)
+    from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+    from transformers.models.whisper.tokenization_whisper import LANGUAGES
+
+    os.makedirs(path, exist_ok=True)
+    vocab = {char: i for i, char in enumerate(bytes_to_unicode().values())}
+    with open(os.path.join(path, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(path, "merges.txt"), "w", encoding="utf-8") as f:
+        f.write("#version: 0.2\n")
+
+    tokenizer = WhisperTokenizer(os.path.join(path, "vocab.json"), os.path.join(path, "merges.txt"),
+                                 unk_token="<|endoftext|>", bos_token="<|endoftext|>",
+                                 eos_token="<|endoftext|>", pad_token="<|endoftext|>")
+    specials = (["<|startoftranscript|>"] + [f"<|{code}|>" for code in LANGUAGES]
+                + ["<|translate|>", "<|transcribe|>", "<|startoflm|>", "<|startofprev|>", "<|nospeech|>",
+                   "<|notimestamps|>"])
+    tokenizer.add_special_tokens({"additional_special_tokens": specials})
+    tokenizer.add_tokens([f"<|{i * 0.02:.2f}|>" for i in range(1501)])
+    WhisperProcessor(WhisperFeatureExtractor(feature_size=80), tokenizer).save_pretrained(path)
+
+    token_id = tokenizer.convert_tokens_to_ids
+    eos = token_id("<|endoftext|>")
+    config = WhisperConfig(
+        vocab_size=len(tokenizer), num_mel_bins=80, encoder_layers=2, decoder_layers=2, d_model=64,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=128, decoder_ffn_dim=128,
+        max_source_positions=1500, max_target_positions=448, pad_token_id=eos, bos_token_id=eos,
+        eos_token_id=eos, decoder_start_token_id=token_id("<|startoftranscript|>"),
+        begin_suppress_tokens=None, suppress_tokens=None
+    )
+    torch.manual_seed(seed)
+    model = WhisperForConditionalGeneration(config)
+    model.generation_config = GenerationConfig(
+        decoder_start_token_id=token_id("<|startoftranscript|>"), eos_token_id=eos, pad_token_id=eos,
+        bos_token_id=eos, max_length=448, is_multilingual=True,
+        no_timestamps_token_id=token_id("<|notimestamps|>"),
+        lang_to_id={f"<|{code}|>": token_id(f"<|{code}|>") for code in LANGUAGES},
+        task_to_id={"transcribe": token_id("<|transcribe|>"), "translate": token_id("<|translate|>")},
+        max_initial_timestamp_index=50, prev_sot_token_id=token_id("<|startofprev|>"),
+        begin_suppress_tokens=[eos], suppress_tokens=[], forced_decoder_ids=None,
+        alignment_heads=[[1, 0], [1, 1]]
+    )
+    model.save_pretrained(path, safe_serialization=True)
+    return path
+
+
+def write_wav(path, audio):
+    """Écrire un tableau float32 mono en WAV PCM 16 bits"""
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLING_RATE)
+        f.writeframes(pcm.tobytes())
+
+
+def generate_audio_files(directory, durations=DEFAULT_DURATIONS, formats=DEFAULT_FORMATS, log=print):
+    """Générer les fichiers de test (signal synthétique déterministe) dans chaque format
+
+    Le WAV est écrit directement ; les autres formats sont encodés par ffmpeg, déjà requis
+    pour le décodage. Un format que ffmpeg ne sait pas encoder est ignoré.
+    """
+    from autotune import calibration_audio
+
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    for duration in durations:
+        wav_path = os.path.join(directory, f"synthetic_{duration:g}s.wav")
+        write_wav(wav_path, calibration_audio(None, duration))
+        for audio_format in formats:
+            path = os.path.splitext(wav_path)[0] + f".{audio_format}"
+            if audio_format != "wav":
+                try:
+                    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-i", wav_path, path],
+                                   capture_output=True, check=True)
+                except (OSError, subprocess.CalledProcessError) as e:
+                    log(f"  {audio_format}: encodage impossible ({e})")
+                    continue
+            files.append({"file": path, "format": audio_format, "duration": float(duration),
+                          "size_bytes": os.path.getsize(path)})
+    return files
+
+
+def count_tokens(outputs, pad_token_id):
+    """Nombre de jetons générés (hors remplissage) dans les sorties des segments"""
+    total = 0
+    for output in outputs:
+        tokens = output["tokens"]
+        total += int((tokens != pad_token_id).sum()) if pad_token_id is not None else tokens.numel()
+    return total
+
+
+def run_config(config):
+    """Mesurer une configuration : chargement, puis décodage et transcription de chaque fichier"""
+    import torch
+    from transcription_engine import TranscriptionEngine
+
+    torch.manual_seed(0)
+    num_beams = config.get("num_beams", 1)
+    engine = TranscriptionEngine(config["model_id"], registry=ModelRegistry(config["models_dir"]),
+                                 profile=config.get("profile"), int8=config.get("int8", False),
+                                 workers=config.get("workers", 1), chunking=config.get("chunking", "stride"))
+    load_start = time.perf_counter()
+    engine.load()
+    load_time = time.perf_counter() - load_start
+
+    def transcribe(audio):
+        preprocess_params, forward_params, postprocess_params = engine.pipeline_params(
+            config["language"], 0.0, num_beams)
+        forward_params["max_new_tokens"] = config["max_new_tokens"]
+        outputs = list(engine.iter_chunk_outputs(audio, preprocess_params, forward_params,
+                                                 batch_size=engine.plan_batch_size(num_beams)))
+        # Compter avant le post-traitement, qui consomme les jetons des sorties
+        tokens = count_tokens(outputs, engine.pipe.tokenizer.pad_token_id)
+        text = result_text(engine.stitch_outputs(outputs, postprocess_params))
+        return len(outputs), tokens, text
+
+    # Échauffement : la première inférence paie des initialisations ponctuelles
+    transcribe(np.zeros(SAMPLING_RATE * 5, dtype=np.float32))
+
+    results = []
+    for entry in config["files"]:
+        decode_start = time.perf_counter()
+        audio = engine.load_audio(entry["file"])
+        decode_time = time.perf_counter() - decode_start
+        start_time = time.perf_counter()
+        windows, tokens, text = transcribe(audio)
+        processing_time = time.perf_counter() - start_time
+        results.append({
+            **entry,
+            # Fenêtres de 30 s passées dans l'encodeur et le décodeur (coût du découpage)
+            "windows": windows,
+            "decode_time": decode_time,
+            "processing_time": processing_time,
+            "rtf": processing_time / entry["duration"],
+            "tokens": tokens,
+            "tokens_per_s": tokens / processing_time if processing_time else 0.0,
+            "text_chars": len(text)
+        })
+    engine.close()
+
+    total_audio = sum(r["duration"] for r in results)
+    total_time = sum(r["processing_time"] for r in results)
+    total_tokens = sum(r["tokens"] for r in results)
+    return {
+        "device": engine.device,
+        "dtype": str(engine.torch_dtype).replace("torch.", ""),
+        "attn_implementation": engine.attn_implementation,
+        "int8": engine.int8,
+        "workers": engine.workers,
+        "chunking": engine.chunking,
+        "num_beams": num_beams,
+        "load_time": load_time,
+        "peak_rss_mb": peak_rss_mb(),
+        "rtf": total_time / total_audio if total_audio else 0.0,
+        "tokens_per_s": total_tokens / total_time if total_time else 0.0,
+        "windows": sum(r["windows"] for r in results),
+        "files": results
+    }
+
+
+def run_config_isolated(config):
+    """Mesurer une configuration dans un processus neuf (temps de chargement et pic mémoire propres)"""
+    if getattr(sys, "frozen", False):
+        return run_config(config)
+    fd, config_path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    try:
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", config_path],
+                                   capture_output=True, text=True)
+    finally:
+        os.remove(config_path)
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"code de sortie {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment_info():
+    """Versions et matériel, pour comparer des rapports entre eux"""
+    import torch
+    import transformers
+
+    return {
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "cuda": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None
+    }
+
+
+def run_suite(model_id=None, durations=DEFAULT_DURATIONS, formats=DEFAULT_FORMATS, configs=DEFAULT_CONFIGS,
+              language="fr", max_new_tokens=MAX_NEW_TOKENS, log=print):
+    """Exécuter la suite de performance et retourner le rapport (dictionnaire sérialisable en JSON)
+
+    Sans model_id, un petit Whisper à poids aléatoires est construit dans un dossier
+    temporaire : la suite tourne hors ligne et sans GPU, et mesure le coût du pipeline
+    (découpage, caractéristiques, génération, post-traitement) indépendamment de la taille
+    du modèle. Chaque configuration est mesurée dans son propre processus.
+    """
+    workdir = tempfile.mkdtemp(prefix="audiotrans_bench_")
+    try:
+        if model_id is None:
+            log("Construction du modèle Whisper miniature...")
+            model_id = build_tiny_model(os.path.join(workdir, "tiny-whisper"))
+            models_dir = os.path.join(workdir, "models")
+        else:
+            models_dir = get_models_dir()
+
+        log("Génération de l'audio de test...")
+        files = generate_audio_files(os.path.join(workdir, "audio"), durations, formats, log)
+
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "environment": environment_info(),
+            "model": model_id if not model_id.startswith(workdir) else "tiny-random",
+            "language": language,
+            "max_new_tokens": max_new_tokens,
+            "configs": {}
+        }
+        for name in configs:
+            log(f"Configuration {name}...")
+            config = {**BENCHMARK_CONFIGS[name], "model_id": model_id, "models_dir": models_dir,
+                      "files": files, "language": language, "max_new_tokens": max_new_tokens}
+            result = run_config_isolated(config)
+            for entry in result.get("files", []):
+                entry["file"] = os.path.basename(entry["file"])
+            report["configs"][name] = result
+        return report
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__" and len(sys.argv) == 3 and sys.argv[1] == "--run":
+    with open(sys.argv[2], "r", encoding="utf-8") as f:
+        print(json.dumps(run_config(json.load(f))))
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import hashlib
+
+import torch
+
+from audio_cache import cached_content_hash, get_cache_dir
+
+# Points de reprise non repris depuis ce délai : supprimés (fichier abandonné)
+MAX_AGE_DAYS = 30
+
+
+class ChunkCheckpoint:
+    """Point de reprise d'une transcription : sortie du modèle de chaque segment terminé
+
+    Une ligne JSON par segment (jetons, stride), ajoutée et écrite sur disque dès que le
+    segment est décodé. Les jetons suffisent pour reconstruire exactement le texte et les
+    horodatages à l'assemblage final. Une dernière ligne tronquée (arrêt pendant
+    l'écriture) est ignorée à la relecture.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.resumed = 0
+        self._file = None
+
+    def load(self):
+        """Sorties des segments déjà terminés, dans l'ordre (liste vide sans point de reprise)"""
+        outputs = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    outputs.append({
+                        "is_last": entry["is_last"],
+                        "tokens": torch.tensor([entry["tokens"]], dtype=torch.long),
+                        "stride": tuple(entry["stride"]) if entry["stride"] is not None else None
+                    })
+        except OSError:
+            return []
+        self.resumed = len(outputs)
+        # Réécrire sans l'éventuelle ligne tronquée avant d'ajouter les segments suivants
+        self._file = open(self.path, "w", encoding="utf-8")
+        for output in outputs:
+            self._write(output)
+        self._sync()
+        return outputs
+
+    def append(self, output):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._write(output)
+        self._sync()
+
+    def _write(self, output):
+        stride = output.get("stride")
+        self._file.write(json.dumps({
+            "is_last": bool(output.get("is_last", False)),
+            "tokens": output["tokens"].reshape(-1).tolist(),
+            "stride": list(stride) if stride is not None else None
+        }) + "\n")
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Transcription terminée : le point de reprise n'a plus d'utilité"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class CheckpointStore:
+    """Dossier des points de reprise, un fichier par (contenu audio, paramètres de décodage)"""
+
+    def __init__(self, checkpoint_dir=None, max_age_days=MAX_AGE_DAYS):
+        self.checkpoint_dir = checkpoint_dir or get_cache_dir("checkpoints")
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        self.prune(max_age_days)
+
+    def open(self, audio_file, params):
+        payload = json.dumps({"audio": cached_content_hash(audio_file), **params}, sort_keys=True, default=str)
+        key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return ChunkCheckpoint(os.path.join(self.checkpoint_dir, f"{key}.jsonl"))
+
+    def prune(self, max_age_days):
+        """Supprimer les points de reprise plus anciens que max_age_days"""
+        limit = time.time() - max_age_days * 86400
+        for name in os.listdir(self.checkpoint_dir):
+            path = os.path.join(self.checkpoint_dir, name)
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,48 @@
+import numpy as np
+
+from vad import frame_energy_db
+
+# Découpage aligné sur les silences : fenêtres sans recouvrement, coupées au point le plus
+# calme des SEARCH_S dernières secondes avant la limite de 30 s du modèle
+SEARCH_S = 6.0
+FRAME_S = 0.02
+# Lissage de l'énergie (trames) : préférer une vraie pause à un creux bref entre deux syllabes
+SMOOTH_FRAMES = 5
+CHUNKING_MODES = ("stride", "silence")
+
+
+def find_cut(audio, search_start, frame_len, smooth_frames=SMOOTH_FRAMES):
+    """Position (en échantillons) du point le plus calme de audio à partir de search_start"""
+    energy = frame_energy_db(audio[search_start:], frame_len)
+    if len(energy) > smooth_frames:
+        energy = np.convolve(energy, np.ones(smooth_frames) / smooth_frames, mode="same")
+    best = int(np.argmin(energy))
+    return min(len(audio), search_start + best * frame_len + frame_len // 2)
+
+
+def silence_windows(blocks, chunk_len, search_len, frame_len):
+    """Générer (fenêtre, stride, is_last) d'au plus chunk_len échantillons, sans recouvrement
+
+    blocks est un itérable de tableaux (le signal entier, ou les blocs d'un AudioStream).
+    Chaque fenêtre se termine au point le plus calme de ses search_len derniers
+    échantillons ; la suivante commence exactement là. Le stride (longueur, 0, 0) indique
+    au pipeline qu'aucune partie de la fenêtre n'est partagée avec ses voisines.
+    """
+    blocks = iter(blocks)
+    buffer = np.zeros(0, dtype=np.float32)
+    exhausted = False
+    while True:
+        while not exhausted and len(buffer) <= chunk_len:
+            block = next(blocks, None)
+            if block is None:
+                exhausted = True
+            else:
+                buffer = np.concatenate([buffer, block]) if len(buffer) else block
+        if not len(buffer):
+            return
+        if len(buffer) <= chunk_len:
+            yield buffer, (len(buffer), 0, 0), True
+            return
+        cut = find_cut(buffer[:chunk_len], chunk_len - search_len, frame_len)
+        yield buffer[:cut], (cut, 0, 0), False
+        buffer = buffer[cut:]
@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import time
+import logging
+from contextlib import contextmanager
+
+# Libellés des étapes, dans l'ordre du traitement
+STAGE_LABELS = {
+    "decode_audio": "Décodage audio",
+    "vad": "Détection de parole",
+    "features": "Caractéristiques log-mel",
+    "encoder": "Encodeur",
+    "decoder": "Décodeur",
+    "inference": "Inférence (processus de calcul)",
+    "postprocess": "Post-traitement",
+}
+
+# Journal des mesures : une ligne JSON par transcription (inactif tant qu'aucun gestionnaire n'est ajouté)
+metrics_logger = logging.getLogger("audiotrans.metrics")
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus courant en Mo (None si indéterminé)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss est en octets sur macOS, en kilo-octets ailleurs
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except (ImportError, AttributeError):
+        return None
+
+
+def current_rss_mb():
+    """Mémoire résidente actuelle du processus en Mo (None si indéterminée)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def peak_gpu_mb():
+    """Pic d'allocation CUDA en Mo depuis la dernière remise à zéro (None sans GPU)"""
+    # torch n'est importé qu'ici : l'interface utilise ce module avant de charger le moteur
+    import torch
+
+    if not torch.cuda.is_available():
+        return None
+    return torch.cuda.max_memory_allocated() / (1024 * 1024)
+
+
+class StageMetrics:
+    """Temps (horloge et CPU) et pic mémoire par étape et par lot de segments d'une transcription
+
+    Les étapes peuvent s'imbriquer (l'encodeur s'exécute pendant l'appel au modèle) : le
+    temps d'une étape exclut celui des étapes mesurées à l'intérieur, si bien que la somme
+    des étapes ne compte rien deux fois. Le temps CPU est celui du processus (tous threads).
+    Mémoire par étape : rss_delta_mb, la plus forte variation de la mémoire résidente
+    pendant un appel de l'étape, et peak_gpu_mb, le pic d'allocation CUDA atteint pendant
+    l'étape (remis à zéro à son début). Les pics du processus sur toute la transcription
+    sont dans summary().
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.batches = []
+        self._stack = []
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        if peak_gpu_mb() is not None:
+            import torch
+            torch.cuda.reset_peak_memory_stats()
+
+    def begin(self, name):
+        gpu = peak_gpu_mb()
+        if gpu is not None:
+            import torch
+            # Le pic atteint jusqu'ici appartient à l'étape englobante, avant la remise à zéro
+            if self._stack:
+                self._stack[-1][6] = max(self._stack[-1][6] or 0.0, gpu)
+            torch.cuda.reset_peak_memory_stats()
+        self._stack.append([name, time.perf_counter(), time.process_time(), 0.0, 0.0, current_rss_mb(), None])
+
+    def end(self):
+        name, wall_start, cpu_start, nested_wall, nested_cpu, rss_start, gpu_peak = self._stack.pop()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        rss = current_rss_mb()
+        rss_delta = rss - rss_start if rss is not None and rss_start is not None else None
+        gpu = peak_gpu_mb()
+        if gpu is not None:
+            gpu_peak = max(gpu_peak or 0.0, gpu)
+        if self._stack:
+            parent = self._stack[-1]
+            parent[3] += wall
+            parent[4] += cpu
+            if gpu_peak is not None:
+                parent[6] = max(parent[6] or 0.0, gpu_peak)
+        self.add(name, wall - nested_wall, cpu - nested_cpu, rss_delta, gpu_peak)
+
+    def add(self, name, wall, cpu, rss_delta_mb=None, gpu_peak_mb=None):
+        stage = self.stages.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "calls": 0,
+                                              "rss_delta_mb": None, "peak_gpu_mb": None})
+        stage["wall_s"] += wall
+        stage["cpu_s"] += cpu
+        stage["calls"] += 1
+        for key, value in (("rss_delta_mb", rss_delta_mb), ("peak_gpu_mb", gpu_peak_mb)):
+            if value is not None:
+                stage[key] = value if stage[key] is None else max(stage[key], value)
+
+    @contextmanager
+    def stage(self, name):
+        depth = len(self._stack)
+        self.begin(name)
+        try:
+            yield
+        finally:
+            # Une exception peut laisser ouverte une étape imbriquée (encodeur interrompu)
+            while len(self._stack) > depth:
+                self.end()
+
+    def time_iter(self, name, iterable):
+        """Générer les éléments de iterable en comptant le temps de chaque élément dans l'étape name"""
+        iterator = iter(iterable)
+        while True:
+            self.begin(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.end()
+                return
+            except BaseException:
+                self.end()
+                raise
+            self.end()
+            yield item
+
+    @contextmanager
+    def track_module(self, module, name):
+        """Mesurer chaque exécution de module (ex. l'encodeur pendant la génération)"""
+        handles = [
+            module.register_forward_pre_hook(lambda *args: self.begin(name)),
+            module.register_forward_hook(lambda *args: self.end())
+        ]
+        try:
+            yield
+        finally:
+            for handle in handles:
+                handle.remove()
+
+    def snapshot(self):
+        return {name: (stage["wall_s"], stage["cpu_s"]) for name, stage in self.stages.items()}
+
+    def add_batch(self, chunks, since):
+        """Enregistrer un lot de segments : temps de chaque étape depuis le relevé since"""
+        batch = {"index": len(self.batches), "chunks": chunks}
+        for name, (wall, cpu) in self.snapshot().items():
+            previous_wall, previous_cpu = since.get(name, (0.0, 0.0))
+            if wall > previous_wall:
+                batch[name] = {"wall_s": round(wall - previous_wall, 4), "cpu_s": round(cpu - previous_cpu, 4)}
+        self.batches.append(batch)
+
+    def summary(self):
+        """Mesures sérialisables en JSON (secondes et Mo)"""
+        stages = {}
+        for name in sorted(self.stages, key=lambda n: list(STAGE_LABELS).index(n) if n in STAGE_LABELS else 99):
+            stage = self.stages[name]
+            stages[name] = {key: round(value, 4) if isinstance(value, float) else value
+                            for key, value in stage.items()}
+        return {
+            "wall_s": round(time.perf_counter() - self._start_wall, 4),
+            "cpu_s": round(time.process_time() - self._start_cpu, 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_gpu_mb": peak_gpu_mb(),
+            "stages": stages,
+            "batches": self.batches
+        }
+
+
+def format_metrics_lines(metrics):
+    """Une ligne par étape : temps, temps CPU et pic mémoire"""
+    lines = []
+    for name, stage in metrics.get("stages", {}).items():
+        line = f"{STAGE_LABELS.get(name, name)}: {stage['wall_s']:.2f} s (CPU {stage['cpu_s']:.2f} s)"
+        if stage.get("peak_gpu_mb") is not None:
+            line += f", pic GPU {stage['peak_gpu_mb']:.0f} Mo"
+        elif stage.get("rss_delta_mb") is not None:
+            line += f", mémoire {stage['rss_delta_mb']:+.0f} Mo"
+        lines.append(line)
+    return lines
+
+
+def format_metrics_summary(metrics):
+    """Résumé sur une ligne : part de chaque étape dans le temps total"""
+    stages = metrics.get("stages", {})
+    total = sum(stage["wall_s"] for stage in stages.values())
+    if not total:
+        return ""
+    return " · ".join(f"{STAGE_LABELS.get(name, name)} {stage['wall_s'] / total:.0%}"
+                      for name, stage in stages.items() if stage["wall_s"] / total >= 0.01)
+
+
+def enable_metrics_log(path):
+    """Écrire les mesures de chaque transcription dans path (une ligne JSON par tâche)"""
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    metrics_logger.addHandler(handler)
+    metrics_logger.setLevel(logging.INFO)
+    metrics_logger.propagate = False
+    return handler
+
+
+def log_metrics(metadata):
+    """Émettre les mesures d'une transcription sur le journal audiotrans.metrics"""
+    if "metrics" not in metadata or not metrics_logger.isEnabledFor(logging.INFO):
+        return
+    metrics_logger.info(json.dumps({
+        "event": "transcription",
+        "time": metadata["date"].isoformat(timespec="seconds"),
+        "source_file": metadata["source_file"],
+        "duration_s": metadata["duration"],
+        "processing_time_s": metadata["processing_time"],
+        "cancelled": metadata.get("cancelled", False),
+        **metadata["metrics"]
+    }, ensure_ascii=False))
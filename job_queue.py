@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from audio_cache import get_cache_dir
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+# Une tâche en cours dont le processus ne signale plus rien depuis LEASE_S est reprise
+# (plantage, arrêt de la machine) ; le processus actif la signale toutes les HEARTBEAT_S
+LEASE_S = 120
+HEARTBEAT_S = 30
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    audio_file TEXT NOT NULL,
+    params TEXT NOT NULL,
+    outputs TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    heartbeat REAL,
+    owner TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, id);
+"""
+
+
+def process_owner():
+    """Identifiant du processus qui traite une tâche (machine et pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def owner_gone(owner):
+    """Indiquer si le processus owner, sur cette machine, n'existe plus"""
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    pid = int(pid)
+    if pid == os.getpid():
+        return False
+    if HAS_PSUTIL:
+        return not psutil.pid_exists(pid)
+    if os.name == "nt":
+        return False  # indéterminé sans psutil : la tâche sera reprise après LEASE_S
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+class Job:
+    """Tâche de la file : fichier audio, paramètres de décodage et fichiers de sortie"""
+
+    def __init__(self, row):
+        self.id = row["id"]
+        self.audio_file = row["audio_file"]
+        self.params = json.loads(row["params"])
+        self.outputs = json.loads(row["outputs"])
+        self.priority = row["priority"]
+        self.status = row["status"]
+        self.attempts = row["attempts"]
+        self.max_attempts = row["max_attempts"]
+        self.error = row["error"]
+        self.created_at = row["created_at"]
+        self.updated_at = row["updated_at"]
+
+
+class JobQueue:
+    """File de transcriptions persistante (SQLite), partagée entre processus
+
+    Les tâches sont prises par ordre de priorité décroissante puis d'arrivée. Une tâche
+    prise passe à "running" et compte une tentative ; elle revient à "pending" après un
+    échec tant qu'il reste des tentatives. Une tâche dont le processus a disparu (arrêté
+    sur cette machine, ou sans signe de vie depuis LEASE_S) est reprise au lancement
+    suivant, si bien qu'un lot interrompu se termine simplement en relançant la file.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(get_cache_dir("jobs"), "jobs.sqlite3")
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Une connexion par opération : la file est utilisable depuis plusieurs threads
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def add(self, audio_file, params, outputs, priority=0, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Ajouter une tâche et retourner son identifiant
+
+        Une tâche identique (même fichier, paramètres et sorties) encore en attente ou en
+        cours n'est pas dupliquée : relancer la même commande reprend la file existante.
+        """
+        audio_file = os.path.abspath(audio_file)
+        params_json = json.dumps(params, sort_keys=True)
+        outputs_json = json.dumps(outputs, sort_keys=True)
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE audio_file = ? AND params = ? AND outputs = ? "
+                "AND status IN ('pending', 'running')",
+                (audio_file, params_json, outputs_json)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET priority = MAX(priority, ?) WHERE id = ?", (priority, row["id"]))
+                return row["id"]
+            cursor = conn.execute(
+                "INSERT INTO jobs (audio_file, params, outputs, priority, max_attempts, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (audio_file, params_json, outputs_json, priority, max_attempts, now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self):
+        """Prendre la tâche en attente la plus prioritaire (None si la file est vide)"""
+        now = time.time()
+        with self._transaction() as conn:
+            # Tâches abandonnées par un processus disparu : reprises, ou en échec si épuisées
+            running = conn.execute("SELECT id, heartbeat, owner FROM jobs WHERE status = 'running'").fetchall()
+            for row in running:
+                if row["heartbeat"] >= now - LEASE_S and not owner_gone(row["owner"]):
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END, "
+                    "error = 'Interrompue (processus arrêté)', updated_at = ? WHERE id = ?",
+                    (now, row["id"])
+                )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'pending' ORDER BY priority DESC, id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, heartbeat = ?, owner = ?, "
+                "updated_at = ? WHERE id = ?",
+                (now, process_owner(), now, row["id"])
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return Job(row)
+
+    def peek(self):
+        """Prochaine tâche qui sera prise, sans la prendre (None si la file est vide)"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'pending' ORDER BY priority DESC, id LIMIT 1"
+            ).fetchone()
+        return Job(row) if row is not None else None
+
+    def touch(self, job_id):
+        """Signaler que la tâche est toujours en cours"""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = 'running'",
+                         (time.time(), job_id))
+
+    @contextmanager
+    def heartbeat(self, job_id, interval=HEARTBEAT_S):
+        """Signaler la tâche comme vivante toutes les interval secondes pendant son traitement
+
+        job_id peut aussi être un ensemble d'identifiants, tenu à jour pendant le traitement
+        (tâches transcrites ensemble, dont les segments partagent les lots du modèle).
+        """
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                job_ids = list(job_id) if isinstance(job_id, (set, list, tuple)) else [job_id]
+                for active_id in job_ids:
+                    try:
+                        self.touch(active_id)
+                    except sqlite3.Error:
+                        pass
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def _set_status(self, job_id, status, error=None, where=""):
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ? {where}",
+                (status, error, time.time(), job_id)
+            )
+            return cursor.rowcount > 0
+
+    def complete(self, job_id):
+        self._set_status(job_id, "done")
+
+    def release(self, job_id):
+        """Remettre une tâche interrompue volontairement en attente, sans compter la tentative"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = MAX(0, attempts - 1), updated_at = ? "
+                "WHERE id = ? AND status = 'running'",
+                (time.time(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        """Enregistrer un échec : nouvelle tentative plus tard, ou échec définitif ; retourne le statut"""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            status = "pending" if row["attempts"] < row["max_attempts"] else "failed"
+            conn.execute("UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                         (status, error, time.time(), job_id))
+        return status
+
+    def cancel(self, job_id):
+        """Retirer une tâche en attente de la file"""
+        return self._set_status(job_id, "cancelled", where="AND status = 'pending'")
+
+    def retry(self, job_id):
+        """Remettre en attente une tâche en échec ou annulée, avec toutes ses tentatives"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = 0, error = NULL, updated_at = ? "
+                "WHERE id = ? AND status IN ('failed', 'cancelled')",
+                (time.time(), job_id)
+            )
+            return cursor.rowcount > 0
+
+    def purge(self, statuses=("done", "cancelled")):
+        """Supprimer les tâches terminées ; retourne leur nombre"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(statuses))})", tuple(statuses)
+            )
+            return cursor.rowcount
+
+    def jobs(self, statuses=None):
+        """Tâches de la file, dans l'ordre où elles seront traitées"""
+        query = "SELECT * FROM jobs"
+        args = ()
+        if statuses:
+            query += f" WHERE status IN ({', '.join('?' * len(statuses))})"
+            args = tuple(statuses)
+        query += " ORDER BY status = 'running' DESC, status = 'pending' DESC, priority DESC, id"
+        with self._connect() as conn:
+            return [Job(row) for row in conn.execute(query, args).fetchall()]
+
+    def counts(self):
+        """Nombre de tâches par statut"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
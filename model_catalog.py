@@ -0,0 +1,178 @@
+import os
+import sys
+
+# psutil est optionnel : il donne la mémoire disponible plutôt que la mémoire totale
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+# Catalogue des modèles Whisper, du plus petit au plus grand
+# cpu_cost : secondes de calcul d'un cœur CPU (float32) par seconde d'audio, ordre de grandeur
+# size_mb : taille des poids en float32 (mémoire nécessaire ~2x pendant le chargement)
+MODEL_CATALOG = {
+    "tiny": {"id": "openai/whisper-tiny", "size_mb": 150, "cpu_cost": 0.3, "multilingual": True},
+    "base": {"id": "openai/whisper-base", "size_mb": 290, "cpu_cost": 0.6, "multilingual": True},
+    "small": {"id": "openai/whisper-small", "size_mb": 970, "cpu_cost": 2.0, "multilingual": True},
+    "distil-small.en": {"id": "distil-whisper/distil-small.en", "size_mb": 670, "cpu_cost": 0.9,
+                        "multilingual": False},
+    "distil-medium.en": {"id": "distil-whisper/distil-medium.en", "size_mb": 1580, "cpu_cost": 1.6,
+                         "multilingual": False},
+    "medium": {"id": "openai/whisper-medium", "size_mb": 3060, "cpu_cost": 6.2, "multilingual": True},
+    "distil-large-v3": {"id": "distil-whisper/distil-large-v3", "size_mb": 3020, "cpu_cost": 2.4,
+                        "multilingual": False},
+    "large-v3": {"id": "openai/whisper-large-v3", "size_mb": 6170, "cpu_cost": 12.4, "multilingual": True},
+}
+
+# Ordre de préférence en mode automatique : du plus précis au moins précis
+QUALITY_ORDER = ["large-v3", "distil-large-v3", "medium", "distil-medium.en", "small", "distil-small.en",
+                 "base", "tiny"]
+
+DEFAULT_MODEL = "large-v3"
+# Modèle d'ébauche du décodage assisté : même vocabulaire que le modèle vérificateur
+DRAFT_MODELS = {"large-v3": "distil-large-v3"}
+AUTO_MODEL = "auto"
+# Facteur temps réel visé par le mode automatique (0.5 = deux fois plus rapide que le temps réel)
+DEFAULT_TARGET_RTF = 0.5
+# Débit de lecture des poids depuis le disque, pour estimer le temps de chargement (Mo/s)
+LOAD_THROUGHPUT_MB_S = 400
+# Gain approximatif de la quantification INT8 sur CPU
+INT8_SPEEDUP = 2.0
+
+
+def resolve_model_id(name):
+    """Identifiant Hugging Face d'un nom du catalogue (les autres valeurs sont rendues telles quelles)"""
+    entry = MODEL_CATALOG.get(name)
+    return entry["id"] if entry else name
+
+
+def catalog_name(model_id):
+    """Nom du catalogue correspondant à un identifiant (None s'il n'y figure pas)"""
+    for name, entry in MODEL_CATALOG.items():
+        if entry["id"] == model_id:
+            return name
+    return None
+
+
+def draft_model_id(model_id):
+    """Identifiant du modèle d'ébauche adapté à model_id (None s'il n'y en a pas)"""
+    draft = DRAFT_MODELS.get(catalog_name(model_id))
+    return resolve_model_id(draft) if draft else None
+
+
+def available_ram_mb():
+    """Mémoire vive disponible en Mo, None si indéterminée
+
+    Sans psutil, sous Linux : MemAvailable de /proc/meminfo (mémoire récupérable sans
+    swap), sinon les pages libres (SC_AVPHYS_PAGES, estimation basse). Jamais la mémoire
+    totale, qui ignorerait le modèle chargé et les autres processus.
+    """
+    if HAS_PSUTIL:
+        return psutil.virtual_memory().available / (1024 * 1024)
+    if sys.platform == "win32":
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys / (1024 * 1024)
+        return None
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES") / (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def detect_hardware():
+    """Cœurs CPU, mémoire vive et mémoire GPU (en Mo, None sans GPU CUDA)"""
+    import torch
+
+    gpu_memory_mb = None
+    if torch.cuda.is_available():
+        gpu_memory_mb = torch.cuda.get_device_properties(0).total_memory / (1024 * 1024)
+    return {
+        "cpu_cores": os.cpu_count() or 1,
+        "memory_mb": available_ram_mb(),
+        "gpu_memory_mb": gpu_memory_mb
+    }
+
+
+def estimate_processing_time(name, duration, hardware, int8=False):
+    """Estimer (chargement + transcription) en secondes pour duration secondes d'audio"""
+    entry = MODEL_CATALOG[name]
+    if hardware["gpu_memory_mb"] is not None:
+        # Sur GPU, le calcul est négligeable devant le temps réel pour toutes les tailles
+        rtf = entry["cpu_cost"] / 100
+        size_mb = entry["size_mb"] / 2  # float16
+    else:
+        rtf = entry["cpu_cost"] / hardware["cpu_cores"]
+        size_mb = entry["size_mb"]
+        if int8:
+            rtf /= INT8_SPEEDUP
+    return size_mb / LOAD_THROUGHPUT_MB_S + rtf * (duration or 0), rtf
+
+
+def fits_in_memory(name, hardware):
+    """Indiquer si le modèle tient dans la mémoire du périphérique"""
+    entry = MODEL_CATALOG[name]
+    if hardware["gpu_memory_mb"] is not None:
+        return entry["size_mb"] / 2 * 1.5 <= hardware["gpu_memory_mb"]
+    if hardware["memory_mb"] is None:
+        return True
+    return entry["size_mb"] * 2 <= hardware["memory_mb"]
+
+
+def choose_model(duration=None, language="fr", target_rtf=DEFAULT_TARGET_RTF, hardware=None,
+                 available=None, int8=False):
+    """Choisir le modèle le plus précis qui respecte le facteur temps réel visé
+
+    Pour une durée connue, le temps de chargement est compté : un message vocal de
+    quelques secondes ne justifie pas de charger large-v3. available limite le choix aux
+    noms de modèles présents localement ; les modèles anglais seuls sont écartés pour
+    les autres langues. Retourne le nom du catalogue retenu.
+    """
+    hardware = hardware or detect_hardware()
+    candidates = [name for name in QUALITY_ORDER
+                  if (MODEL_CATALOG[name]["multilingual"] or language == "en")
+                  and (available is None or name in available)]
+    if not candidates:
+        return DEFAULT_MODEL
+
+    for name in candidates:
+        if not fits_in_memory(name, hardware):
+            continue
+        total_time, rtf = estimate_processing_time(name, duration, hardware, int8)
+        if duration:
+            if total_time <= target_rtf * duration:
+                return name
+        elif rtf <= target_rtf:
+            return name
+    # Aucun modèle n'atteint l'objectif : le plus rapide
+    return candidates[-1]
+
+
+def available_models(registry):
+    """Noms du catalogue dont le modèle est présent dans le registre local"""
+    return [name for name, entry in MODEL_CATALOG.items() if registry.is_available(entry["id"])]
+
+
+def select_model_id(name, registry, duration=None, language="fr", int8=False, target_rtf=DEFAULT_TARGET_RTF):
+    """Identifiant du modèle à charger pour un nom du catalogue, "auto" ou un identifiant libre"""
+    if name == AUTO_MODEL:
+        name = choose_model(duration, language, target_rtf, available=available_models(registry), int8=int8)
+    return resolve_model_id(name)
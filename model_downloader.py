@@ -4,28 +4,15 @@ import time
 import threading
 import tkinter as tk
 from tkinter import ttk
+import importlib.util
 import customtkinter as ctk
-import torch
 
-# Try to import accelerate first to ensure it's available
-try:
-    import accelerate
-    from accelerate.utils import is_accelerate_available
-    HAS_ACCELERATE = True
-except ImportError:
-    HAS_ACCELERATE = False
+# Check for accelerate without importing it: torch and transformers are only
+# imported by the download thread, so the window opens immediately
+HAS_ACCELERATE = importlib.util.find_spec("accelerate") is not None
 
-from transformers import AutoProcessor, AutoModelForSpeechSeq2Seq
-
-# Define models path
-def get_models_dir():
-    """Get the directory where models should be stored"""
-    if hasattr(sys, '_MEIPASS'):  # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_dir = os.path.dirname(sys.executable)
-    else:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    return os.path.join(base_dir, "models")
+from model_catalog import DEFAULT_MODEL, MODEL_CATALOG, resolve_model_id
+from model_registry import ModelRegistry, get_models_dir
 
 class ModelDownloaderApp(ctk.CTk):
     def __init__(self):
@@ -63,11 +50,24 @@ class ModelDownloaderApp(ctk.CTk):
             "Welcome to AudioTrans Pro!\n\n"
             "Before you can use the application, we need to download the Whisper AI model. "
             "This is a one-time process and may take several minutes depending on your internet connection. "
-            "The model requires approximately 2GB of disk space.\n\n"
+            "Choose a model size below: larger models are more accurate but slower "
+            "(large-v3 needs approximately 3GB of disk space, small less than 1GB).\n\n"
             "Click 'Download Model' to begin."
         ))
         self.info_text.configure(state="disabled")
         
+        # Model selection
+        self.model_var = ctk.StringVar(value=DEFAULT_MODEL)
+        self.model_menu = ctk.CTkOptionMenu(
+            self.main_frame,
+            values=list(MODEL_CATALOG.keys()),
+            variable=self.model_var,
+            command=self.on_model_select,
+            width=200,
+            font=("Segoe UI", 12)
+        )
+        self.model_menu.pack(pady=(0, 10))
+        
         # Progress frame
         self.progress_frame = ctk.CTkFrame(self.main_frame)
         self.progress_frame.pack(fill="x", padx=10, pady=10)
@@ -132,10 +132,8 @@ class ModelDownloaderApp(ctk.CTk):
         
         # Check if model already exists
         self.models_dir = get_models_dir()
-        if self.check_model_exists():
-            self.status_var.set("Model already downloaded!")
-            self.progress_var.set(1.0)
-            self.download_btn.configure(state="disabled")
+        self.registry = ModelRegistry(self.models_dir)
+        self.on_model_select(self.model_var.get())
         
         # Check if accelerate is available
         if not HAS_ACCELERATE:
@@ -204,23 +202,26 @@ class ModelDownloaderApp(ctk.CTk):
         )
         exit_btn.pack(side="right", padx=20)
         
+    def on_model_select(self, choice):
+        """Update the status for the selected model"""
+        if self.check_model_exists():
+            self.status_var.set("Model already downloaded!")
+            self.progress_var.set(1.0)
+            self.download_btn.configure(state="disabled")
+        else:
+            self.status_var.set(f"Ready to download ({choice})")
+            self.progress_var.set(0.0)
+            self.download_btn.configure(state="normal")
+    
     def check_model_exists(self):
-        """Check if the model files already exist"""
-        # Basic check - this can be improved to verify all required files
-        model_id = "openai/whisper-large-v3"
-        cache_dir = self.models_dir
-        
-        # Check if the model directory exists and has files
-        if os.path.exists(cache_dir):
-            model_files = [f for f in os.listdir(cache_dir) if "whisper" in f.lower()]
-            if len(model_files) > 0:
-                return True
-        return False
+        """Check if the selected model is downloaded and matches its manifest entry"""
+        return self.registry.is_available(resolve_model_id(self.model_var.get()))
     
     def download_model(self):
         """Download the Whisper model"""
         self.download_btn.configure(state="disabled")
         self.skip_btn.configure(state="disabled")
+        self.model_menu.configure(state="disabled")
         
         # Create a thread for downloading
         threading.Thread(target=self._download_model_thread, daemon=True).start()
@@ -228,6 +229,9 @@ class ModelDownloaderApp(ctk.CTk):
     def _download_model_thread(self):
         """Background thread for model download"""
         try:
+            import torch
+            from transformers import AutoProcessor, AutoModelForSpeechSeq2Seq
+
             # Create models directory if it doesn't exist
             os.makedirs(self.models_dir, exist_ok=True)
             
@@ -236,7 +240,7 @@ class ModelDownloaderApp(ctk.CTk):
             self.progress_var.set(0.2)
             
             # Set cache directory for transformers
-            model_id = "openai/whisper-large-v3"
+            model_id = resolve_model_id(self.model_var.get())
             cache_dir = self.models_dir
             
             # Load model (this will download it)
@@ -267,7 +271,10 @@ class ModelDownloaderApp(ctk.CTk):
             )
             
             self.progress_var.set(0.9)
-            self.status_var.set("Finishing up...")
+            self.status_var.set("Verifying files...")
+            
+            # Record file sizes and hashes so the app can load the model offline
+            self.registry.register(model_id)
             
             # Save model configuration to verify it's properly downloaded
             config_file = os.path.join(cache_dir, "whisper_config.txt")
@@ -289,6 +296,7 @@ class ModelDownloaderApp(ctk.CTk):
             self.progress_var.set(0)
             self.download_btn.configure(state="normal")
             self.skip_btn.configure(state="normal")
+            self.model_menu.configure(state="normal")
     
     def show_success_dialog(self):
         """Show success dialog and offer to start the application"""
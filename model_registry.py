@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+from audio_cache import file_content_hash
+
+MANIFEST_FILE = "manifest.json"
+
+
+def get_models_dir():
+    """Dossier où sont stockés les modèles (à côté de l'exécutable ou des sources)"""
+    if hasattr(sys, '_MEIPASS'):  # PyInstaller crée un dossier temporaire référencé par _MEIPASS
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+
+    return os.path.join(base_dir, "models")
+
+
+class ModelNotAvailableError(FileNotFoundError):
+    """Le modèle demandé n'est pas présent (ou pas complet) dans le dossier des modèles"""
+
+
+class ModelRegistry:
+    """Registre local des modèles téléchargés, utilisé pour un chargement strictement hors ligne
+
+    Les modèles sont stockés par model_downloader dans la structure du cache Hugging Face
+    (models--<org>--<nom>/snapshots/<révision>). Le registre résout un identifiant de modèle
+    vers ce dossier et tient un manifeste (manifest.json) des fichiers avec leur taille et leur
+    empreinte SHA-256, afin de détecter un téléchargement incomplet sans interroger le hub.
+    """
+
+    def __init__(self, models_dir=None):
+        self.models_dir = models_dir or get_models_dir()
+        self.manifest_path = os.path.join(self.models_dir, MANIFEST_FILE)
+        self._lock = threading.Lock()
+
+    def load_manifest(self):
+        """Lire le manifeste (vide s'il est absent ou illisible)"""
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if isinstance(manifest.get("models"), dict):
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {"models": {}}
+
+    def save_manifest(self, manifest):
+        os.makedirs(self.models_dir, exist_ok=True)
+        temp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.manifest_path)
+
+    def repo_dir(self, model_id):
+        """Dossier du dépôt dans la structure du cache Hugging Face"""
+        return os.path.join(self.models_dir, "models--" + model_id.replace("/", "--"))
+
+    def find_snapshot(self, model_id):
+        """Chercher sur disque la révision téléchargée d'un modèle (None si absente)"""
+        repo_dir = self.repo_dir(model_id)
+        snapshots_dir = os.path.join(repo_dir, "snapshots")
+
+        # Révision pointée par refs/main, sinon la plus récente contenant une configuration
+        try:
+            with open(os.path.join(repo_dir, "refs", "main"), "r") as f:
+                revision = f.read().strip()
+            snapshot = os.path.join(snapshots_dir, revision)
+            if os.path.isfile(os.path.join(snapshot, "config.json")):
+                return snapshot
+        except OSError:
+            pass
+
+        if not os.path.isdir(snapshots_dir):
+            return None
+        candidates = [os.path.join(snapshots_dir, name) for name in os.listdir(snapshots_dir)]
+        candidates = [path for path in candidates if os.path.isfile(os.path.join(path, "config.json"))]
+        if not candidates:
+            return None
+        return max(candidates, key=os.path.getmtime)
+
+    @staticmethod
+    def list_files(snapshot):
+        """Fichiers d'une révision, en chemins relatifs"""
+        files = []
+        for root, dirs, names in os.walk(snapshot):
+            dirs.sort()
+            for name in sorted(names):
+                files.append(os.path.relpath(os.path.join(root, name), snapshot).replace(os.sep, "/"))
+        return files
+
+    def register(self, model_id, compute_hashes=True):
+        """Enregistrer dans le manifeste la révision présente sur disque et retourner son entrée"""
+        snapshot = self.find_snapshot(model_id)
+        if snapshot is None:
+            raise ModelNotAvailableError(f"Modèle {model_id} introuvable dans {self.models_dir}")
+
+        files = {}
+        for name in self.list_files(snapshot):
+            path = os.path.join(snapshot, name)
+            files[name] = {
+                "size": os.path.getsize(path),
+                "sha256": file_content_hash(path) if compute_hashes else None
+            }
+
+        entry = {
+            "path": os.path.relpath(snapshot, self.models_dir).replace(os.sep, "/"),
+            "revision": os.path.basename(snapshot),
+            "registered": datetime.now().isoformat(timespec="seconds"),
+            "files": files
+        }
+        with self._lock:
+            manifest = self.load_manifest()
+            manifest["models"][model_id] = entry
+            self.save_manifest(manifest)
+        return entry
+
+    def entry(self, model_id):
+        return self.load_manifest()["models"].get(model_id)
+
+    def verify(self, model_id, check_hashes=False):
+        """Comparer les fichiers sur disque au manifeste et retourner la liste des problèmes
+
+        Seules les tailles sont contrôlées par défaut ; check_hashes relit tous les fichiers.
+        """
+        entry = self.entry(model_id)
+        if entry is None:
+            return [f"{model_id} n'est pas enregistré dans {self.manifest_path}"]
+
+        snapshot = os.path.join(self.models_dir, entry["path"])
+        problems = []
+        for name, expected in entry["files"].items():
+            path = os.path.join(snapshot, name)
+            if not os.path.exists(path):
+                problems.append(f"{name}: fichier manquant")
+            elif os.path.getsize(path) != expected["size"]:
+                problems.append(f"{name}: taille {os.path.getsize(path)} au lieu de {expected['size']}")
+            elif check_hashes and expected.get("sha256") and file_content_hash(path) != expected["sha256"]:
+                problems.append(f"{name}: empreinte SHA-256 différente")
+        return problems
+
+    def resolve(self, model_id):
+        """Retourner le dossier local du modèle, sans jamais contacter le hub
+
+        Un chemin de dossier existant est utilisé tel quel. Une révision trouvée sur disque
+        mais absente du manifeste y est ajoutée (tailles seulement, les empreintes étant
+        calculées par model_downloader).
+        """
+        if os.path.isdir(model_id):
+            return model_id
+
+        entry = self.entry(model_id)
+        if entry is None:
+            if self.find_snapshot(model_id) is None:
+                raise ModelNotAvailableError(
+                    f"Modèle {model_id} introuvable dans {self.models_dir}. "
+                    "Lancez model_downloader pour le télécharger."
+                )
+            entry = self.register(model_id, compute_hashes=False)
+
+        problems = self.verify(model_id)
+        if problems:
+            raise ModelNotAvailableError(
+                f"Modèle {model_id} incomplet ou modifié ({'; '.join(problems[:3])}). "
+                "Relancez model_downloader pour le télécharger à nouveau."
+            )
+        return os.path.join(self.models_dir, entry["path"])
+
+    def revision(self, model_id):
+        """Identifiant de la révision locale d'un modèle (pour nommer ses fichiers dérivés)"""
+        if os.path.isdir(model_id):
+            # Dossier copié à la main : empreinte de la liste des fichiers, tailles et dates
+            digest = hashlib.sha256()
+            for name in self.list_files(model_id):
+                stat = os.stat(os.path.join(model_id, name))
+                digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+            return digest.hexdigest()[:12]
+        self.resolve(model_id)
+        return self.entry(model_id)["revision"]
+
+    def is_available(self, model_id):
+        try:
+            self.resolve(model_id)
+            return True
+        except ModelNotAvailableError:
+            return False
@@ -0,0 +1,185 @@
+import os
+import queue
+import threading
+from collections import deque
+import torch
+import torch.multiprocessing as mp
+from transformers import pipeline
+from transformers import StoppingCriteriaList
+from transformers.pipelines.base import pad_collate_fn
+
+from batch_sizing import is_out_of_memory, release_memory
+from progress import CancellationToken, TranscriptionCancelled
+
+# Nombre de lots en attente par processus : assez pour qu'aucun ne reste inactif
+PREFETCH_PER_WORKER = 2
+# Intervalle de vérification de l'annulation pendant l'attente d'un lot (secondes)
+POLL_INTERVAL_S = 0.2
+
+# Segments préparés d'avance (audio décodé et caractéristiques) pendant que le modèle calcule
+PREFETCH_CHUNKS = 8
+
+# État d'un processus de calcul (initialisé une fois par _init_worker)
+_worker = {}
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(iterable, depth=PREFETCH_CHUNKS):
+    """Produire les éléments de iterable dans un thread, avec au plus depth éléments d'avance
+
+    Le décodage et l'extraction des caractéristiques des segments suivants se font ainsi
+    pendant l'inférence du lot courant. Une exception du producteur est relancée chez le
+    consommateur ; fermer le générateur (annulation) arrête le producteur.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=POLL_INTERVAL_S)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(_END)
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            # Le générateur source (ex. décodage ffmpeg) est fermé par le thread qui l'exécute
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def default_threads_per_worker(workers):
+    """Partager les cœurs entre les processus de calcul"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def _init_worker(model, tokenizer, feature_extractor, torch_dtype, threads, cancel_event):
+    """Préparer un processus de calcul : threads, pipeline autour du modèle partagé"""
+    torch.set_num_threads(threads)
+    model.eval()
+    _worker["pipe"] = pipeline(
+        "automatic-speech-recognition",
+        model=model,
+        tokenizer=tokenizer,
+        feature_extractor=feature_extractor,
+        torch_dtype=torch_dtype,
+        device="cpu"
+    )
+    _worker["collate"] = pad_collate_fn(tokenizer, feature_extractor)
+    _worker["cancel_token"] = CancellationToken(cancel_event)
+
+
+def _forward(batch, forward_params):
+    """Exécuter un lot dans un processus de calcul et rendre la sortie de chaque segment"""
+    from transcription_engine import CancellationStoppingCriteria, unbatch_output
+
+    if _worker["cancel_token"].cancelled:
+        return []
+    params = {
+        **forward_params,
+        "stopping_criteria": StoppingCriteriaList([CancellationStoppingCriteria(_worker["cancel_token"])])
+    }
+    try:
+        outputs = _worker["pipe"].forward(_worker["collate"](batch), **params)
+    except Exception as e:
+        if not is_out_of_memory(e) or len(batch) == 1:
+            raise
+        outputs = None
+    if outputs is None:
+        release_memory()
+        half = len(batch) // 2
+        return _forward(batch[:half], forward_params) + _forward(batch[half:], forward_params)
+    return [unbatch_output(outputs, i) for i in range(len(batch))]
+
+
+class WorkerPool:
+    """Processus de calcul partageant les poids du modèle, pour transcrire un fichier sur tous les cœurs
+
+    Les poids sont placés en mémoire partagée (share_memory) et transmis aux processus au
+    démarrage : ils ne sont pas recopiés. Chaque processus dispose de cœurs / processus
+    threads. Les lots de segments sont distribués au fil de l'eau et les sorties rendues
+    dans l'ordre des segments, pour être assemblées par le pipeline du processus principal.
+    """
+
+    def __init__(self, engine, workers, threads_per_worker=None):
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or default_threads_per_worker(workers)
+        context = mp.get_context("spawn")
+        self.cancel_event = context.Event()
+        engine.model.share_memory()
+        self.pool = context.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(engine.model, engine.processor.tokenizer, engine.processor.feature_extractor,
+                      engine.torch_dtype, self.threads_per_worker, self.cancel_event)
+        )
+
+    def map_batches(self, batches, forward_params, cancel_token=None):
+        """Générer les sorties des segments de chaque lot, dans l'ordre des lots"""
+        self.cancel_event.clear()
+        pending = deque()
+        batches = iter(batches)
+        exhausted = False
+        try:
+            while True:
+                # Garder chaque processus alimenté sans extraire tout le fichier d'avance
+                while not exhausted and len(pending) < self.workers * PREFETCH_PER_WORKER:
+                    batch = next(batches, None)
+                    if batch is None:
+                        exhausted = True
+                        break
+                    pending.append(self.pool.apply_async(_forward, (batch, forward_params)))
+                if not pending:
+                    return
+                result = pending[0]
+                while not result.ready():
+                    if cancel_token is not None and cancel_token.cancelled:
+                        raise TranscriptionCancelled()
+                    result.wait(POLL_INTERVAL_S)
+                outputs = result.get()
+                pending.popleft()
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise TranscriptionCancelled()
+                yield from outputs
+        finally:
+            if pending:
+                # Annulation, erreur ou générateur abandonné : interrompre les lots encore
+                # envoyés et attendre leur fin, sinon ils reprendraient sur les processus
+                # au prochain appel (cancel_event effacé) et retarderaient la tâche suivante
+                self.cancel_event.set()
+                for result in pending:
+                    result.wait()
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
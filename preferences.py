@@ -0,0 +1,16 @@
+import os
+import json
+
+# Module léger (sans torch) : l'interface lit ses préférences avant de charger le moteur
+PREFERENCES_FILE = "audiotrans_preferences.json"
+
+
+def load_preferences_file(path=PREFERENCES_FILE):
+    """Lire le fichier de préférences JSON (dictionnaire vide si absent ou invalide)"""
+    try:
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"Erreur lors du chargement des préférences: {e}")
+    return {}
@@ -0,0 +1,100 @@
+import time
+import threading
+
+
+def format_duration(seconds):
+    """Formater une durée en secondes en format lisible"""
+    if seconds < 60:
+        return f"{seconds:.1f} secondes"
+    else:
+        minutes = int(seconds // 60)
+        secs = int(seconds % 60)
+        if minutes < 60:
+            return f"{minutes} minute{'s' if minutes > 1 else ''} {secs} seconde{'s' if secs > 1 else ''}"
+        else:
+            hours = int(minutes // 60)
+            mins = int(minutes % 60)
+            return f"{hours} heure{'s' if hours > 1 else ''} {mins} minute{'s' if mins > 1 else ''} {secs} seconde{'s' if secs > 1 else ''}"
+
+
+class TranscriptionCancelled(Exception):
+    """Transcription interrompue à la demande de l'utilisateur
+
+    partial_result contient le texte des segments terminés avant l'annulation et
+    metadata les métadonnées correspondantes (si disponibles).
+    """
+
+    def __init__(self, partial_result="", metadata=None):
+        super().__init__("La transcription a été annulée")
+        self.partial_result = partial_result
+        self.metadata = metadata
+
+
+class CancellationToken:
+    """Jeton d'annulation partagé entre l'interface et le thread de transcription"""
+
+    def __init__(self, event=None):
+        # event peut être un Event de multiprocessing pour être partagé entre processus
+        self._event = event or threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+class TranscriptionProgress:
+    """Avancement réel d'une transcription, calculé à partir des segments terminés"""
+
+    def __init__(self, total_chunks, total_audio_s):
+        self.total_chunks = total_chunks
+        self.total_audio_s = total_audio_s
+        self.chunks_done = 0
+        self.audio_done_s = 0.0
+        self.start_time = time.time()
+        self.last_update = self.start_time
+
+    def advance(self, chunks, audio_s):
+        """Enregistrer des segments terminés et la durée d'audio qu'ils couvrent"""
+        self.chunks_done += chunks
+        self.audio_done_s = min(self.total_audio_s, self.audio_done_s + audio_s)
+        self.last_update = time.time()
+
+    @property
+    def fraction(self):
+        if self.total_audio_s > 0:
+            return self.audio_done_s / self.total_audio_s
+        return self.chunks_done / self.total_chunks if self.total_chunks else 0.0
+
+    @property
+    def elapsed(self):
+        return time.time() - self.start_time
+
+    @property
+    def throughput(self):
+        """Secondes d'audio traitées par seconde de calcul"""
+        elapsed = self.last_update - self.start_time
+        return self.audio_done_s / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def real_time_factor(self):
+        """Temps de calcul par seconde d'audio (< 1 = plus rapide que le temps réel)"""
+        throughput = self.throughput
+        return 1.0 / throughput if throughput > 0 else None
+
+    @property
+    def eta(self):
+        """Temps restant estimé en secondes (None tant qu'aucun segment n'est terminé)"""
+        throughput = self.throughput
+        if throughput <= 0:
+            return None
+        return max(0.0, (self.total_audio_s - self.audio_done_s) / throughput)
+
+    def describe(self):
+        """Résumé lisible de l'avancement"""
+        text = f"{self.chunks_done}/{self.total_chunks} segments"
+        if self.eta is not None:
+            text += f" - reste ~{format_duration(self.eta)} - {self.throughput:.1f}x temps réel"
+        return text
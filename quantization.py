@@ -0,0 +1,95 @@
+import os
+import time
+import torch
+from transformers import AutoConfig, AutoModelForSpeechSeq2Seq, GenerationConfig
+from transformers.modeling_utils import no_init_weights
+
+# Sous-dossier de get_models_dir() contenant les modèles quantifiés
+QUANTIZED_DIR = "quantized"
+QUANTIZED_FORMAT_VERSION = 1
+
+
+def quantized_model_path(models_dir, model_id, revision):
+    """Fichier du modèle quantifié INT8 d'une révision donnée"""
+    name = model_id.strip("/\\").replace("/", "--").replace("\\", "--").replace(":", "")
+    return os.path.join(models_dir, QUANTIZED_DIR, f"{name}-{revision}-int8.pt")
+
+
+def quantize_model(model):
+    """Quantification dynamique INT8 des couches Linear (encodeur et décodeur)
+
+    Les poids sont stockés en int8 et les activations quantifiées à la volée : les
+    multiplications matricielles passent par les noyaux entiers du CPU (fbgemm/onednn).
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def build_quantized_model(model_path, save_path):
+    """Charger le modèle float32, le quantifier et l'enregistrer dans save_path"""
+    model = AutoModelForSpeechSeq2Seq.from_pretrained(
+        model_path,
+        torch_dtype=torch.float32,
+        attn_implementation="eager",
+        local_files_only=True
+    )
+    model.eval()
+    model = quantize_model(model)
+
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    temp_path = f"{save_path}.{os.getpid()}.tmp"
+    try:
+        torch.save({
+            "format_version": QUANTIZED_FORMAT_VERSION,
+            "torch_version": torch.__version__,
+            "created": time.time(),
+            "state_dict": model.state_dict()
+        }, temp_path)
+        os.replace(temp_path, save_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return model
+
+
+def load_quantized_model(model_path, save_path):
+    """Recharger un modèle quantifié enregistré (None s'il est absent ou incompatible)
+
+    La structure est construite depuis la configuration sans initialiser ni lire les poids
+    float32, puis les poids int8 sont chargés directement.
+    """
+    if not os.path.exists(save_path):
+        return None
+    try:
+        checkpoint = torch.load(save_path, map_location="cpu", weights_only=False)
+    except Exception as e:
+        print(f"Modèle quantifié illisible, il sera reconstruit: {e}")
+        return None
+    if (checkpoint.get("format_version") != QUANTIZED_FORMAT_VERSION
+            or checkpoint.get("torch_version") != torch.__version__):
+        return None
+
+    config = AutoConfig.from_pretrained(model_path, local_files_only=True)
+    with no_init_weights():
+        model = AutoModelForSpeechSeq2Seq.from_config(
+            config,
+            torch_dtype=torch.float32,
+            attn_implementation="eager"
+        )
+    model.eval()
+    model = quantize_model(model)
+    model.load_state_dict(checkpoint["state_dict"])
+    try:
+        model.generation_config = GenerationConfig.from_pretrained(model_path, local_files_only=True)
+    except OSError:
+        pass
+    return model
+
+
+def load_or_build_quantized_model(model_path, save_path, progress_callback=None):
+    """Charger le modèle INT8 persistant, en le construisant une première fois si besoin"""
+    model = load_quantized_model(model_path, save_path)
+    if model is None:
+        if progress_callback is not None:
+            progress_callback(0.3, "Quantification INT8 du modèle (première utilisation)...")
+        model = build_quantized_model(model_path, save_path)
+    return model
@@ -0,0 +1,112 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+from audio_cache import cached_content_hash, get_cache_dir
+
+# Limites par défaut du cache des transcriptions
+DEFAULT_MAX_MB = 256
+DEFAULT_MAX_ENTRIES = 5000
+
+
+class ResultCache:
+    """Cache disque des transcriptions terminées
+
+    La clé combine l'empreinte du contenu audio et tout ce qui influence le résultat
+    (modèle, langue, température, faisceau, horodatages, découpage...). Chaque entrée est
+    un fichier JSON contenant le résultat et ses métadonnées ; les moins récemment utilisées
+    sont supprimées au-delà de max_mb ou de max_entries.
+    """
+
+    def __init__(self, cache_dir=None, max_mb=DEFAULT_MAX_MB, max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir or get_cache_dir("results")
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, audio_file, params):
+        """Clé d'un fichier audio pour un jeu de paramètres de décodage"""
+        payload = json.dumps({"audio": cached_content_hash(audio_file), **params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, audio_file, params):
+        """Retourner (résultat, métadonnées) en cache ou None"""
+        entry = self.entry_path(self.key(audio_file, params))
+        if not os.path.exists(entry):
+            return None
+        try:
+            with open(entry, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            metadata = data["metadata"]
+            metadata["date"] = datetime.fromisoformat(metadata["date"])
+        except (OSError, ValueError, KeyError):
+            self._remove(entry)
+            return None
+
+        # Marquer l'entrée comme récemment utilisée pour l'éviction LRU
+        os.utime(entry)
+        # Le fichier source peut avoir été déplacé ou renommé depuis
+        metadata["source_file"] = audio_file
+        metadata["from_cache"] = True
+        return data["result"], metadata
+
+    def put(self, audio_file, params, transcription_result, metadata):
+        """Enregistrer une transcription terminée puis appliquer les limites du cache"""
+        entry = self.entry_path(self.key(audio_file, params))
+        data = {
+            "params": params,
+            "result": transcription_result,
+            "metadata": {**metadata, "date": metadata["date"].isoformat()},
+        }
+        temp_path = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, entry)
+        except (OSError, TypeError, ValueError) as e:
+            self._remove(temp_path)
+            print(f"Impossible d'écrire dans le cache des transcriptions: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Supprimer les entrées les moins récemment utilisées au-delà des limites"""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".json"):
+                    continue
+                entry = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(entry)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+
+            total = sum(size for _, size, _ in entries)
+            count = len(entries)
+            for _, size, entry in sorted(entries):
+                if total <= self.max_bytes and count <= self.max_entries:
+                    break
+                if self._remove(entry):
+                    total -= size
+                    count -= 1
+
+    def clear(self):
+        """Vider entièrement le cache"""
+        for name in os.listdir(self.cache_dir):
+            self._remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
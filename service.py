@@ -0,0 +1,431 @@
+import os
+import json
+import uuid
+import queue
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from model_registry import ModelRegistry
+from progress import CancellationToken, TranscriptionCancelled, TranscriptionProgress
+
+# Le service n'écoute que sur la machine locale : les clients lui transmettent des chemins de fichiers
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_SERVICE_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+# Tâches en attente au-delà de la tâche en cours ; au-delà, le service répond 503
+MAX_QUEUE = 8
+# Événements en attente d'envoi par tâche : un client qui ne lit plus ralentit sa tâche
+EVENT_BUFFER = 64
+# Intervalle des messages de maintien de connexion (détecte aussi les clients partis)
+HEARTBEAT_S = 1.0
+# Délai de la vérification de présence du service par les clients
+HEALTH_TIMEOUT_S = 0.5
+TERMINAL_EVENTS = ("result", "cancelled", "error")
+
+# Paramètres acceptés par /transcribe et leurs valeurs par défaut (ceux de TranscriptionEngine.transcribe)
+TRANSCRIBE_PARAMS = {
+    "language": "fr",
+    "temperature": 0.0,
+    "num_beams": 1,
+    "return_timestamps": False,
+    "vad": False,
+    "use_result_cache": True,
+    "stream": False,
+}
+
+
+class ServiceError(RuntimeError):
+    """Erreur signalée par le service local (ou service injoignable)"""
+
+
+class ServiceBusyError(ServiceError):
+    """File d'attente du service pleine : réessayer plus tard"""
+
+
+def serialize_metadata(metadata):
+    if metadata is None:
+        return None
+    return {**metadata, "date": metadata["date"].isoformat()}
+
+
+def restore_metadata(metadata):
+    if metadata is None:
+        return None
+    return {**metadata, "date": datetime.fromisoformat(metadata["date"])}
+
+
+def restore_chunks(chunks):
+    return [{**chunk, "timestamp": tuple(chunk["timestamp"])} for chunk in chunks]
+
+
+def restore_result(result):
+    if isinstance(result, dict) and "chunks" in result:
+        return {**result, "chunks": restore_chunks(result["chunks"])}
+    return result
+
+
+class ServiceJob:
+    """Tâche de transcription soumise au service et flux de ses événements"""
+
+    def __init__(self, params):
+        self.id = uuid.uuid4().hex[:12]
+        self.params = params
+        self.cancel_token = CancellationToken()
+        self.events = queue.Queue(maxsize=EVENT_BUFFER)
+        # Connexion du client terminée : plus personne ne lit les événements
+        self.closed = threading.Event()
+
+    def emit(self, event, droppable=False):
+        """Transmettre un événement au client
+
+        Un événement de progression est abandonné si le tampon est plein (le suivant le
+        remplacera) ; les autres attendent que le client lise, ce qui suspend la tâche.
+        """
+        if droppable:
+            try:
+                self.events.put_nowait(event)
+            except queue.Full:
+                pass
+            return
+        while not self.closed.is_set():
+            try:
+                self.events.put(event, timeout=HEARTBEAT_S)
+                return
+            except queue.Full:
+                continue
+
+
+class TranscriptionService:
+    """Moteur chargé une seule fois et partagé par les clients locaux (interface, ligne de commande)
+
+    Les tâches sont exécutées une à la fois, dans l'ordre d'arrivée, par un thread dédié.
+    La file est bornée à max_queue tâches en attente : au-delà, /transcribe répond 503.
+    """
+
+    def __init__(self, engine, max_queue=MAX_QUEUE, log=print):
+        self.engine = engine
+        self.max_queue = max_queue
+        self.log = log
+        self.jobs = queue.Queue(maxsize=max_queue)
+        self.active = {}
+        self.current = None
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def status(self):
+        return {
+            "status": "ok",
+            "model_id": self.engine.model_id,
+            "device": self.engine.device,
+            "int8": self.engine.int8,
+            "busy": self.current is not None,
+            "queued": self.jobs.qsize(),
+            "max_queue": self.max_queue
+        }
+
+    def submit(self, params):
+        """Mettre une tâche en file (ValueError si invalide, queue.Full si la file est pleine)"""
+        audio_file = params.get("audio_file")
+        if not audio_file or not os.path.isfile(audio_file):
+            raise ValueError(f"Fichier audio introuvable: {audio_file}")
+        unknown = set(params) - set(TRANSCRIBE_PARAMS) - {"audio_file"}
+        if unknown:
+            raise ValueError(f"Paramètres inconnus: {', '.join(sorted(unknown))}")
+        job = ServiceJob({**TRANSCRIBE_PARAMS, **params})
+        with self._lock:
+            self.jobs.put_nowait(job)
+            self.active[job.id] = job
+        return job
+
+    def cancel(self, job_id):
+        job = self.active.get(job_id)
+        if job is None:
+            return False
+        job.cancel_token.cancel()
+        return True
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            self.current = job
+            try:
+                self._process(job)
+            finally:
+                self.current = None
+                with self._lock:
+                    self.active.pop(job.id, None)
+
+    def _process(self, job):
+        params = job.params
+        if job.cancel_token.cancelled:
+            job.emit({"event": "cancelled", "partial_result": "", "metadata": None})
+            return
+        job.emit({"event": "started"})
+        self.log(f"Transcription de {params['audio_file']} ({job.id})")
+
+        def on_progress(progress):
+            job.emit({
+                "event": "progress",
+                "chunks_done": progress.chunks_done,
+                "total_chunks": progress.total_chunks,
+                "audio_done_s": progress.audio_done_s,
+                "total_audio_s": progress.total_audio_s
+            }, droppable=True)
+
+        def on_chunks(chunks):
+            job.emit({"event": "chunks", "chunks": chunks})
+
+        try:
+            result, metadata = self.engine.transcribe(
+                params["audio_file"],
+                language=params["language"],
+                temperature=params["temperature"],
+                num_beams=params["num_beams"],
+                return_timestamps=params["return_timestamps"],
+                progress_callback=on_progress,
+                chunk_callback=on_chunks if params["stream"] else None,
+                cancel_token=job.cancel_token,
+                vad=params["vad"],
+                use_result_cache=params["use_result_cache"]
+            )
+            job.emit({"event": "result", "result": result, "metadata": serialize_metadata(metadata)})
+        except TranscriptionCancelled as e:
+            job.emit({"event": "cancelled", "partial_result": e.partial_result,
+                      "metadata": serialize_metadata(e.metadata)})
+        except Exception as e:
+            self.log(f"Erreur ({job.id}): {e}")
+            job.emit({"event": "error", "message": str(e)})
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """GET /health, POST /transcribe (réponse NDJSON en continu), POST /jobs/<id>/cancel"""
+
+    server_version = "AudioTransService/1.0"
+
+    def log_message(self, format, *args):
+        # Les vérifications de présence (/health) seraient trop bavardes
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def write_event(self, event):
+        self.wfile.write(json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, self.server.service.status())
+        else:
+            self.send_json(404, {"error": "Ressource inconnue"})
+
+    def do_POST(self):
+        service = self.server.service
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+            if service.cancel(parts[1]):
+                self.send_json(200, {"cancelled": parts[1]})
+            else:
+                self.send_json(404, {"error": "Tâche inconnue ou terminée"})
+            return
+        if self.path != "/transcribe":
+            self.send_json(404, {"error": "Ressource inconnue"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            params = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(params, dict):
+                raise ValueError("Le corps de la requête doit être un objet JSON")
+            job = service.submit(params)
+        except (ValueError, TypeError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        except queue.Full:
+            self.send_json(503, {"error": "File d'attente du service pleine"},
+                           headers={"Retry-After": "5"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            self.write_event({"event": "queued", "job_id": job.id, "position": service.jobs.qsize()})
+            while True:
+                try:
+                    event = job.events.get(timeout=HEARTBEAT_S)
+                except queue.Empty:
+                    event = {"event": "heartbeat"}
+                self.write_event(event)
+                if event["event"] in TERMINAL_EVENTS:
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            # Client parti : inutile de poursuivre sa transcription
+            job.cancel_token.cancel()
+        finally:
+            job.closed.set()
+
+
+def serve(engine, host=DEFAULT_HOST, port=DEFAULT_PORT, max_queue=MAX_QUEUE, log=print):
+    """Charger et préchauffer le moteur, puis servir les clients jusqu'à l'interruption"""
+    if not engine.is_loaded:
+        engine.load(progress_callback=lambda fraction, message: log(f"  {message}"))
+    engine.warm_up()
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.daemon_threads = True
+    server.service = TranscriptionService(engine, max_queue, log)
+    log(f"Service de transcription prêt sur http://{host}:{server.server_address[1]} ({engine.model_id})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        engine.close()
+
+
+class ServiceClient:
+    """Client du service local, avec l'interface de transcription de TranscriptionEngine
+
+    Le modèle reste chargé dans le service : load() vérifie seulement sa présence et
+    transcribe() rend (résultat, métadonnées) comme le moteur local. Les options de
+    chargement (int8, assisted...) sont celles du service.
+    """
+
+    def __init__(self, url=DEFAULT_SERVICE_URL):
+        self.url = url.rstrip("/")
+        self.registry = ModelRegistry()
+        self.model_id = None
+        # Modèle demandé au dernier load() ; le service garde le sien (model_id)
+        self.requested_model_id = None
+        self.device = None
+        self.int8 = False
+        self.assisted = False
+        self.assistant_model = None
+        self.audio_cache = None
+        self.memory_budget_mb = None
+        self.workers = 1
+        self.status = None
+
+    @classmethod
+    def connect(cls, url=DEFAULT_SERVICE_URL, timeout=HEALTH_TIMEOUT_S):
+        """Client connecté si un service répond à url, None sinon"""
+        client = cls(url)
+        try:
+            client.load(timeout=timeout)
+        except ServiceError:
+            return None
+        return client
+
+    @property
+    def is_loaded(self):
+        return self.status is not None
+
+    def health(self, timeout=HEALTH_TIMEOUT_S):
+        try:
+            with urllib.request.urlopen(self.url + "/health", timeout=timeout) as response:
+                return json.loads(response.read())
+        except (OSError, ValueError) as e:
+            raise ServiceError(f"Service de transcription injoignable ({self.url}): {e}")
+
+    def load(self, progress_callback=None, timeout=HEALTH_TIMEOUT_S):
+        """Vérifier que le service répond et lire le modèle qu'il a chargé"""
+        requested = self.model_id
+        self.status = self.health(timeout)
+        self.model_id = self.status["model_id"]
+        self.requested_model_id = requested or self.model_id
+        self.device = self.status["device"]
+        self.int8 = self.status["int8"]
+        if progress_callback is not None:
+            message = f"Modèle {self.model_id} chargé par le service local"
+            if requested and requested != self.model_id:
+                message += f" ({requested} ignoré)"
+            progress_callback(0.9, message)
+        return self.status
+
+    def warm_up(self, language="fr"):
+        """Le service préchauffe son modèle au démarrage"""
+
+    def prefetch_audio(self, audio_file, vad=False):
+        """Le service décode lui-même les fichiers qu'il reçoit"""
+
+    def close(self):
+        pass
+
+    def cancel(self, job_id):
+        request = urllib.request.Request(f"{self.url}/jobs/{job_id}/cancel", data=b"", method="POST")
+        try:
+            urllib.request.urlopen(request, timeout=HEALTH_TIMEOUT_S).close()
+        except OSError:
+            pass
+
+    def transcribe(self, audio_file, language="fr", temperature=0.0, num_beams=1,
+                   return_timestamps=False, duration=None, progress_callback=None, chunk_callback=None,
+                   cancel_token=None, vad=False, use_result_cache=True):
+        """Transcrire audio_file dans le service et retourner (résultat, métadonnées)"""
+        body = json.dumps({
+            "audio_file": os.path.abspath(audio_file),
+            "language": language,
+            "temperature": temperature,
+            "num_beams": num_beams,
+            "return_timestamps": return_timestamps,
+            "vad": vad,
+            "use_result_cache": use_result_cache,
+            "stream": chunk_callback is not None
+        }).encode("utf-8")
+        request = urllib.request.Request(self.url + "/transcribe", data=body,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            response = urllib.request.urlopen(request)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                message = str(e)
+            raise (ServiceBusyError if e.code == 503 else ServiceError)(message)
+        except OSError as e:
+            raise ServiceError(f"Service de transcription injoignable ({self.url}): {e}")
+
+        job_id = None
+        cancel_sent = False
+        progress = None
+        with response:
+            for line in response:
+                event = json.loads(line)
+                kind = event["event"]
+                if kind == "queued":
+                    job_id = event["job_id"]
+                elif kind == "progress":
+                    if progress is None:
+                        progress = TranscriptionProgress(event["total_chunks"], event["total_audio_s"])
+                    progress.advance(event["chunks_done"] - progress.chunks_done,
+                                     event["audio_done_s"] - progress.audio_done_s)
+                    if progress_callback is not None:
+                        progress_callback(progress)
+                elif kind == "chunks" and chunk_callback is not None:
+                    chunk_callback(restore_chunks(event["chunks"]))
+                elif kind == "result":
+                    return restore_result(event["result"]), restore_metadata(event["metadata"])
+                elif kind == "cancelled":
+                    raise TranscriptionCancelled(restore_result(event["partial_result"]),
+                                                 restore_metadata(event["metadata"]))
+                elif kind == "error":
+                    raise ServiceError(event["message"])
+
+                # Les messages de maintien de connexion permettent de transmettre l'annulation
+                if cancel_token is not None and cancel_token.cancelled and job_id and not cancel_sent:
+                    self.cancel(job_id)
+                    cancel_sent = True
+        raise ServiceError("Connexion au service interrompue")
@@ -0,0 +1,67 @@
+import sys
+import time
+import importlib
+import threading
+
+# Instant du démarrage : ce module est importé en premier par l'interface
+PROCESS_START = time.perf_counter()
+# Budget de démarrage : délai visé entre le lancement et l'affichage de la fenêtre (secondes)
+WINDOW_BUDGET_S = 1.5
+
+
+class BackgroundImport:
+    """Importer des modules lourds (torch, transformers...) dans un thread
+
+    La fenêtre s'affiche sans les attendre ; module(name) bloque seulement si l'import
+    n'est pas terminé. import_times donne la durée de chaque import (voir report()).
+    """
+
+    def __init__(self, *names):
+        self.names = names
+        self.import_times = {}
+        self.error = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            for name in self.names:
+                start_time = time.perf_counter()
+                importlib.import_module(name)
+                self.import_times[name] = time.perf_counter() - start_time
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    def module(self, name):
+        """Module importé (démarre l'import si besoin et attend sa fin)"""
+        self.start()
+        self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return sys.modules[name]
+
+    def report(self):
+        """Durée de chaque import terminé (ex. transcription_engine 3.20 s, checkpoint 0.04 s)"""
+        return ", ".join(f"{name} {seconds:.2f} s" for name, seconds in self.import_times.items())
+
+
+def check_startup_budget(label="Fenêtre affichée"):
+    """Temps écoulé depuis le démarrage, avec un avertissement si le budget est dépassé"""
+    elapsed = time.perf_counter() - PROCESS_START
+    if elapsed > WINDOW_BUDGET_S:
+        print(f"Démarrage lent : {label.lower()} en {elapsed:.2f} s (budget {WINDOW_BUDGET_S:.1f} s)")
+    return elapsed
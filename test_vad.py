@@ -0,0 +1,33 @@
+import numpy as np
+
+from vad import SpeechTimeline, detect_speech_regions
+
+SAMPLING_RATE = 16000
+
+
+def speech_like(duration_s, rng, level=0.1):
+    """Bruit modulé en amplitude (syllabes de 200 ms, environ 10 dB de variation)"""
+    n = int(duration_s * SAMPLING_RATE)
+    t = np.arange(n) / SAMPLING_RATE
+    envelope = level * (0.66 + 0.34 * np.sin(2 * np.pi * 2.5 * t))
+    return (rng.standard_normal(n) * envelope).astype(np.float32)
+
+
+def test_continuous_speech_is_kept():
+    rng = np.random.default_rng(0)
+    audio = speech_like(30, rng)
+    timeline = SpeechTimeline.from_audio(audio, SAMPLING_RATE)
+    assert timeline.speech_duration >= 29.5
+
+
+def test_pauses_are_removed():
+    rng = np.random.default_rng(1)
+    silence = (rng.standard_normal(3 * SAMPLING_RATE) * 1e-4).astype(np.float32)
+    audio = np.concatenate([speech_like(5, rng), silence, speech_like(5, rng)])
+    regions = detect_speech_regions(audio, SAMPLING_RATE)
+    assert len(regions) == 2
+    assert 9.5 <= sum(end - start for start, end in regions) / SAMPLING_RATE <= 11.5
+
+
+def test_digital_silence_has_no_speech():
+    assert detect_speech_regions(np.zeros(5 * SAMPLING_RATE, dtype=np.float32), SAMPLING_RATE) == []
@@ -0,0 +1,171 @@
+import os
+
+from instrumentation import format_metrics_lines
+from progress import format_duration
+
+# Fréquence d'échantillonnage attendue par Whisper
+SAMPLING_RATE = 16000
+
+# Extensions audio reconnues (identiques au filtre du dialogue d'ouverture)
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg")
+
+
+def get_audio_duration(file_path, audio_cache=None):
+    """Obtenir la durée d'un fichier audio en secondes (0 si indéterminée)
+
+    Si l'audio décodé est déjà dans audio_cache, la durée en est tirée sans relire le fichier.
+    """
+    if audio_cache is not None:
+        duration = audio_cache.cached_duration(file_path, SAMPLING_RATE)
+        if duration is not None:
+            return duration
+    import librosa  # import coûteux (numba), différé jusqu'au premier usage
+
+    duration = librosa.get_duration(path=file_path)
+    return duration if duration is not None else 0
+
+
+def format_timestamp(seconds):
+    """Formater un horodatage en minutes:secondes"""
+    minutes = int(seconds // 60)
+    secs = int(seconds % 60)
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def format_chunk_line(chunk):
+    """Formater un segment horodaté sur une ligne ([mm:ss] texte)"""
+    start = chunk.get("timestamp", [0])[0]
+    return f"[{format_timestamp(start)}] " + chunk.get("text", "")
+
+
+def result_text(transcription_result):
+    """Retourner le texte brut d'un résultat de transcription"""
+    if isinstance(transcription_result, dict) and "text" in transcription_result:
+        return transcription_result["text"]
+    return str(transcription_result)
+
+
+def has_timestamp_chunks(transcription_result, metadata):
+    """Indiquer si le résultat doit être rendu avec ses horodatages"""
+    return (metadata.get('has_timestamps', False)
+            and isinstance(transcription_result, dict)
+            and "chunks" in transcription_result)
+
+
+def save_txt_file(save_path, transcription_result, metadata):
+    """Sauvegarder la transcription sous forme de fichier texte"""
+    with open(save_path, 'w', encoding='utf-8') as f:
+        f.write("TRANSCRIPTION AUDIO\n")
+        f.write("=" * 50 + "\n\n")
+        f.write(f"Fichier source: {metadata['source_file']}\n")
+        f.write(f"Date de transcription: {metadata['date'].strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"Langue: {metadata['language']}\n")
+        f.write(f"Durée: {format_duration(metadata['duration'])}\n")
+        if "speech_duration" in metadata:
+            f.write(f"Parole détectée: {format_duration(metadata['speech_duration'])}\n")
+        f.write(f"Temps de traitement: {format_duration(metadata['processing_time'])}\n")
+        if metadata.get("metrics"):
+            f.write("Détail du traitement:\n")
+            for line in format_metrics_lines(metadata["metrics"]):
+                f.write(f"  {line}\n")
+        f.write("\n" + "=" * 50 + "\n\n")
+
+        # Si le résultat contient des timestamps, formatez-les
+        if has_timestamp_chunks(transcription_result, metadata):
+            f.write("TRANSCRIPTION AVEC HORODATAGES :\n\n")
+            for chunk in transcription_result["chunks"]:
+                f.write(format_chunk_line(chunk) + "\n")
+        else:
+            # Texte normal sans horodatage
+            f.write(result_text(transcription_result))
+
+
+def save_docx_file(save_path, transcription_result, metadata):
+    """Sauvegarder la transcription sous forme de document Word"""
+    from docx import Document
+
+    # Créer un nouveau document
+    doc = Document()
+
+    # Ajouter un titre
+    doc.add_heading('Transcription Audio', 0)
+
+    # Ajouter les métadonnées
+    rows = [
+        ('Fichier source', metadata['source_file']),
+        ('Date de transcription', metadata['date'].strftime('%Y-%m-%d %H:%M:%S')),
+        ('Langue', metadata['language']),
+        ('Durée', format_duration(metadata['duration'])),
+        ('Temps de traitement', format_duration(metadata['processing_time'])),
+    ]
+    if "speech_duration" in metadata:
+        rows.insert(4, ('Parole détectée', format_duration(metadata['speech_duration'])))
+    metadata_table = doc.add_table(rows=len(rows), cols=2)
+    metadata_table.style = 'Table Grid'
+    for row, (label, value) in zip(metadata_table.rows, rows):
+        row.cells[0].text = label
+        row.cells[1].text = value
+
+    if metadata.get("metrics"):
+        doc.add_paragraph('Détail du traitement')
+        for line in format_metrics_lines(metadata["metrics"]):
+            doc.add_paragraph(line, style='List Bullet')
+
+    doc.add_paragraph('')  # Ajouter un espace
+
+    # Vérifier si nous avons des timestamps
+    if has_timestamp_chunks(transcription_result, metadata):
+        doc.add_heading('Transcription avec horodatages', level=1)
+
+        # Ajouter un tableau pour les horodatages
+        timestamps_table = doc.add_table(rows=1, cols=2)
+        timestamps_table.style = 'Table Grid'
+
+        # En-têtes du tableau
+        header_cells = timestamps_table.rows[0].cells
+        header_cells[0].text = 'Temps'
+        header_cells[1].text = 'Texte'
+
+        # Ajouter les chunks avec horodatages
+        for chunk in transcription_result["chunks"]:
+            start = chunk.get("timestamp", [0])[0]
+            row_cells = timestamps_table.add_row().cells
+            row_cells[0].text = format_timestamp(start)
+            row_cells[1].text = chunk.get("text", "")
+    else:
+        # Ajouter la transcription normale
+        doc.add_heading('Transcription', level=1)
+        doc.add_paragraph(result_text(transcription_result))
+
+    # Sauvegarder le document
+    doc.save(save_path)
+
+
+SAVE_FUNCTIONS = {"txt": save_txt_file, "docx": save_docx_file}
+
+
+class StreamingTextWriter:
+    """Écrire les segments dans un fichier partiel au fur et à mesure du décodage
+
+    Le fichier partiel (<sortie>.part) est vidé sur disque à chaque segment et supprimé
+    une fois la transcription finale sauvegardée.
+    """
+
+    def __init__(self, save_path, source_file):
+        self.path = save_path + ".part"
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.file.write("TRANSCRIPTION AUDIO (EN COURS)\n")
+        self.file.write("=" * 50 + "\n\n")
+        self.file.write(f"Fichier source: {source_file}\n\n")
+        self.file.flush()
+
+    def write_chunks(self, chunks):
+        for chunk in chunks:
+            self.file.write(format_chunk_line(chunk) + "\n")
+        self.file.flush()
+
+    def close(self, remove=True):
+        if not self.file.closed:
+            self.file.close()
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
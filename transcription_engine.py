@@ -0,0 +1,977 @@
+import os
+import sys
+import math
+import platform
+import time
+from datetime import datetime
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+import numpy as np
+import torch
+
+# Try to import accelerate - it's optional but will improve performance
+try:
+    import accelerate
+    HAS_ACCELERATE = True
+except ImportError:
+    HAS_ACCELERATE = False
+
+from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+from transformers import StoppingCriteria, StoppingCriteriaList
+from transformers.pipelines.audio_utils import ffmpeg_read
+from transformers.pipelines.base import pad_collate_fn
+
+from audio_stream import AudioStream
+from batch_scheduler import CROSS_BATCH_MAX_S, PREFETCH_FILES, BatchScheduler
+from batch_sizing import adaptive_batch_size, is_out_of_memory, release_memory
+from chunking import FRAME_S, SEARCH_S, silence_windows
+from model_catalog import DEFAULT_MODEL, MODEL_CATALOG, draft_model_id, resolve_model_id
+from instrumentation import StageMetrics, log_metrics
+from model_registry import ModelRegistry
+from parallel import PREFETCH_CHUNKS, WorkerPool, prefetch
+from progress import TranscriptionCancelled, TranscriptionProgress
+from quantization import load_or_build_quantized_model, quantized_model_path
+from transcript_files import SAMPLING_RATE, get_audio_duration
+from vad import SpeechTimeline
+
+# Paramètres par défaut du modèle et du pipeline
+MODEL_ID = MODEL_CATALOG[DEFAULT_MODEL]["id"]
+CHUNK_LENGTH_S = 30
+STRIDE_LENGTH_S = 5
+BATCH_SIZE = 4
+# Préchauffage : court silence décodé sur quelques jetons après le chargement
+WARM_UP_S = 1.0
+WARM_UP_TOKENS = 4
+# Au-delà de cette durée, l'audio est décodé par blocs pendant la transcription plutôt
+# que chargé en entier (mémoire constante quelle que soit la durée du fichier)
+STREAM_AUDIO_MIN_S = 600
+
+# Profil d'inférence mesuré par "audiotrans autotune", à côté des préférences
+PROFILE_FILE = "audiotrans_profile.json"
+
+TORCH_DTYPES = {"float32": torch.float32, "float16": torch.float16, "bfloat16": torch.bfloat16}
+
+
+def machine_signature(model_id, device):
+    """Identifiant de la machine et du modèle auxquels un profil d'inférence s'applique"""
+    return "|".join([
+        model_id,
+        device,
+        f"{os.cpu_count()} cpu",
+        platform.machine(),
+        platform.processor() or sys.platform,
+        f"torch {torch.__version__}"
+    ])
+
+
+def load_profile(model_id, device, path=PROFILE_FILE):
+    """Profil d'inférence enregistré pour ce modèle sur cette machine (None sinon)"""
+    try:
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                return json.load(f).get("profiles", {}).get(machine_signature(model_id, device))
+    except Exception as e:
+        print(f"Erreur lors du chargement du profil d'inférence: {e}")
+    return None
+
+
+def save_profile(profile, model_id, device, path=PROFILE_FILE):
+    """Enregistrer le profil d'inférence de ce modèle sur cette machine"""
+    data = {"profiles": {}}
+    try:
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                data = json.load(f)
+    except Exception:
+        pass
+    data.setdefault("profiles", {})[machine_signature(model_id, device)] = profile
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def apply_thread_settings(profile):
+    """Appliquer les nombres de threads PyTorch d'un profil"""
+    if profile.get("intra_op_threads"):
+        torch.set_num_threads(profile["intra_op_threads"])
+    if profile.get("inter_op_threads") and torch.get_num_interop_threads() != profile["inter_op_threads"]:
+        try:
+            torch.set_num_interop_threads(profile["inter_op_threads"])
+        except RuntimeError:
+            # Réglable une seule fois, avant tout calcul parallèle : on garde la valeur actuelle
+            pass
+
+
+def get_device():
+    """Retourner le périphérique et le type de données à utiliser pour le modèle"""
+    device = "cuda:0" if torch.cuda.is_available() else "cpu"
+    torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+    return device, torch_dtype
+
+
+def decode_audio(file_path, sampling_rate=SAMPLING_RATE):
+    """Décoder un fichier audio en tableau mono float32 (comme le fait le pipeline)"""
+    with open(file_path, "rb") as f:
+        return ffmpeg_read(f.read(), sampling_rate)
+
+
+def count_chunks(n_samples, chunk_len, stride_left, stride_right):
+    """Nombre de segments produits par le découpage du pipeline pour n_samples échantillons"""
+    if n_samples <= 0:
+        return 0
+    step = chunk_len - stride_left - stride_right
+    if n_samples <= chunk_len:
+        return 1
+    return int(math.ceil((n_samples - chunk_len) / step)) + 1
+
+
+def normalize_result(raw_result):
+    """Convertir la sortie du pipeline en résultat de transcription exploitable"""
+    if isinstance(raw_result, dict):
+        if "chunks" in raw_result:
+            # Résultat avec timestamps : on conserve le texte brut pour la sauvegarde
+            raw_result["text"] = " ".join([chunk.get("text", "") for chunk in raw_result["chunks"]])
+            return raw_result
+        # Résultat normal au format dict
+        return raw_result["text"]
+    # Résultat sous forme de chaîne
+    return str(raw_result)
+
+
+class CancellationStoppingCriteria(StoppingCriteria):
+    """Arrêter generate() au prochain token dès que le jeton est annulé"""
+
+    def __init__(self, token):
+        self.token = token
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.token.cancelled, dtype=torch.bool, device=input_ids.device)
+
+
+def unbatch_output(outputs, index):
+    """Extraire la sortie d'un segment d'un lot (comme le fait l'itérateur du pipeline)"""
+    item = {}
+    for key, value in outputs.items():
+        if isinstance(value, torch.Tensor):
+            item[key] = value[index].unsqueeze(0)
+        elif isinstance(value, (list, tuple)):
+            item[key] = value[index]
+        else:
+            item[key] = value
+    return item
+
+
+def iter_batches(items, batch_size):
+    """Regrouper un itérable en listes de batch_size éléments (la dernière peut être plus courte)"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class TranscriptionEngine:
+    """Modèle Whisper et pipeline ASR chargés une seule fois et réutilisables"""
+
+    def __init__(self, model_id=MODEL_ID, audio_cache=None, result_cache=None, registry=None, int8=False,
+                 assisted=False, assistant_model_id=None, profile=None, memory_budget_mb=None, workers=1,
+                 checkpoints=None, chunking="stride"):
+        # Un nom du catalogue ("small", "large-v3"...) ou un identifiant Hugging Face
+        self.model_id = resolve_model_id(model_id)
+        self.registry = registry or ModelRegistry()
+        self.audio_cache = audio_cache
+        self.result_cache = result_cache
+        # Points de reprise par segment (CheckpointStore) : une transcription interrompue reprend
+        self.checkpoints = checkpoints
+        self.model = None
+        self.processor = None
+        self.pipe = None
+        self.device, self.torch_dtype = get_device()
+        # La quantification dynamique INT8 ne concerne que l'inférence sur CPU
+        self.int8 = int8 and self.device == "cpu"
+        # Décodage assisté : un petit modèle propose les jetons, le modèle principal les vérifie
+        self.assisted = assisted
+        self.assistant_model_id = resolve_model_id(assistant_model_id) if assistant_model_id else None
+        self.assistant_model = None
+        # Profil d'inférence imposé ; sinon celui d'autotune pour ce modèle et cette machine
+        self.profile = profile
+        self.attn_implementation = "eager"
+        # Lot maximal mesuré par autotune (None : seul le budget mémoire décide)
+        self.batch_size = None
+        # Budget mémoire des lots en Mo (None : une part de la mémoire libre)
+        self.memory_budget_mb = memory_budget_mb
+        # Lot réduit après un manque de mémoire, par nombre de faisceaux
+        self.oom_batch_limits = {}
+        # Processus de calcul sur CPU (1 : tout dans le processus courant)
+        self.workers = max(1, int(workers or 1))
+        self.worker_pool = None
+        # Découpage en fenêtres : "stride" (30 s recouvrantes de 5 s, celui du pipeline) ou
+        # "silence" (fenêtres sans recouvrement coupées sur les pauses)
+        self.chunking = chunking
+        # Durée à partir de laquelle l'audio est décodé par blocs (None : toujours en entier)
+        self.stream_audio_min_s = STREAM_AUDIO_MIN_S
+        # Segments préparés d'avance dans un thread pendant l'inférence (0 : en série)
+        self.prefetch_chunks = PREFETCH_CHUNKS
+        # Fichier suivant d'un lot décodé en arrière-plan : (chemin, Future)
+        self._next_audio = None
+        self._prefetch_executor = None
+
+    @property
+    def is_loaded(self):
+        return self.pipe is not None
+
+    def load(self, progress_callback=None):
+        """Charger le modèle, le processeur et construire le pipeline
+
+        progress_callback(fraction, message) est appelé avant chaque étape.
+        Le modèle est lu uniquement depuis le dossier local résolu par le registre (aucun
+        accès au hub) ; ModelNotAvailableError est levée s'il n'a pas été téléchargé.
+        En mode int8, le modèle quantifié est lu depuis models/quantized (et construit puis
+        enregistré au premier chargement). Avec plusieurs processus de calcul (CPU), ceux-ci
+        sont démarrés ici et reçoivent les poids en mémoire partagée.
+        """
+        def report(fraction, message):
+            if progress_callback is not None:
+                progress_callback(fraction, message)
+
+        self.close()
+        report(0.1, "Recherche du modèle local...")
+        model_path = self.registry.resolve(self.model_id)
+        self.apply_profile()
+
+        report(0.2, "Chargement du modèle Whisper...")
+        self.model = self._load_weights(self.model_id, model_path, report)
+        self.assistant_model = None
+        if self.assisted:
+            report(0.5, "Chargement du modèle d'ébauche...")
+            self.load_assistant(report)
+
+        report(0.6, "Chargement du processeur...")
+
+        self.model.to(self.device)
+        self.processor = AutoProcessor.from_pretrained(model_path, local_files_only=True)
+
+        report(0.8, "Initialisation du pipeline...")
+
+        # Création du pipeline avec des paramètres optimisés
+        self.pipe = pipeline(
+            "automatic-speech-recognition",
+            model=self.model,
+            tokenizer=self.processor.tokenizer,
+            feature_extractor=self.processor.feature_extractor,
+            chunk_length_s=CHUNK_LENGTH_S,
+            stride_length_s=STRIDE_LENGTH_S,
+            torch_dtype=self.torch_dtype,
+            device=self.device
+        )
+
+        if self.workers > 1 and self.device == "cpu":
+            report(0.9, f"Démarrage de {self.workers} processus de calcul...")
+            self.worker_pool = WorkerPool(self, self.workers)
+
+        report(1.0, "Modèle chargé avec succès")
+        return self.pipe
+
+    def warm_up(self, language="fr"):
+        """Exécuter une inférence sur un court silence pour payer les initialisations ponctuelles
+
+        La première inférence choisit les noyaux de calcul, remplit les caches de
+        l'allocateur et initialise les bibliothèques GPU : ce coût est payé ici plutôt que
+        par la première transcription. Le segment est complété à 30 s comme tout autre.
+        """
+        if self.pipe is None:
+            raise RuntimeError("Le modèle n'est pas chargé")
+        audio = np.zeros(int(WARM_UP_S * SAMPLING_RATE), dtype=np.float32)
+        preprocess_params, forward_params, _ = self.pipeline_params(language)
+        forward_params["max_new_tokens"] = WARM_UP_TOKENS
+        for _ in self.iter_chunk_outputs(audio, preprocess_params, forward_params, batch_size=1):
+            pass
+
+    def close(self):
+        """Arrêter les processus de calcul (le modèle reste chargé dans ce processus)"""
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+            self.worker_pool = None
+
+    def apply_profile(self):
+        """Appliquer le profil d'inférence (attention, type de données, lot, threads)"""
+        profile = self.profile
+        if profile is None:
+            profile = load_profile(self.model_id, self.device) or {}
+        self.device, self.torch_dtype = get_device()
+        # Le modèle INT8 est construit sur une base float32
+        if profile.get("dtype") in TORCH_DTYPES and not self.int8:
+            self.torch_dtype = TORCH_DTYPES[profile["dtype"]]
+        self.attn_implementation = profile.get("attn_implementation", "eager")
+        self.batch_size = profile.get("batch_size")
+        self.oom_batch_limits = {}
+        apply_thread_settings(profile)
+        return profile
+
+    def _load_weights(self, model_id, model_path, report):
+        """Charger les poids d'un modèle (quantifiés INT8 si demandé)"""
+        # Optimisations pour la mémoire et les performances
+        # Vérifier si accélerate est disponible avant d'utiliser les options qui en dépendent
+        model_kwargs = {
+            "torch_dtype": self.torch_dtype,
+            "attn_implementation": self.attn_implementation,  # "eager" sauf profil mesuré
+            "local_files_only": True
+        }
+
+        # Ajouter les options qui nécessitent Accelerate uniquement si disponible
+        if HAS_ACCELERATE:
+            model_kwargs.update({
+                "low_cpu_mem_usage": True,
+                "use_safetensors": True
+            })
+
+        if self.int8:
+            save_path = quantized_model_path(self.registry.models_dir, model_id,
+                                             self.registry.revision(model_id))
+            return load_or_build_quantized_model(model_path, save_path, progress_callback=report)
+        return AutoModelForSpeechSeq2Seq.from_pretrained(
+            model_path,
+            **model_kwargs
+        )
+
+    def load_assistant(self, progress_callback=None):
+        """Charger le modèle d'ébauche du décodage assisté (None s'il n'est pas utilisable)
+
+        Le modèle d'ébauche doit partager le vocabulaire du modèle principal (distil-large-v3
+        pour large-v3). Le texte produit reste celui du modèle principal en décodage glouton ;
+        le gain dépend du taux d'acceptation des jetons proposés, plus faible hors anglais.
+        """
+        def report(fraction, message):
+            if progress_callback is not None:
+                progress_callback(fraction, message)
+
+        self.assistant_model = None
+        assistant_id = self.assistant_model_id or draft_model_id(self.model_id)
+        if assistant_id is None:
+            report(0.5, f"Décodage assisté indisponible : aucun modèle d'ébauche pour {self.model_id}")
+            return None
+        if not self.registry.is_available(assistant_id):
+            report(0.5, f"Décodage assisté indisponible : {assistant_id} n'est pas téléchargé")
+            return None
+
+        assistant = self._load_weights(assistant_id, self.registry.resolve(assistant_id), report)
+        if assistant.config.vocab_size != self.model.config.vocab_size:
+            report(0.5, f"Décodage assisté indisponible : vocabulaire de {assistant_id} incompatible")
+            return None
+        self.assistant_model = assistant.to(self.device)
+        return self.assistant_model
+
+    def uses_assistant(self, num_beams):
+        """Le décodage assisté ne s'applique qu'à la recherche gloutonne (un seul faisceau)"""
+        return self.assisted and self.assistant_model is not None and num_beams == 1
+
+    def load_audio(self, audio_file, sampling_rate=SAMPLING_RATE):
+        """Décoder un fichier audio, via le cache audio s'il est configuré"""
+        if self.audio_cache is not None:
+            return self.audio_cache.load(audio_file, sampling_rate, decode_audio)
+        return decode_audio(audio_file, sampling_rate)
+
+    def result_cache_params(self, language, temperature, num_beams, return_timestamps, streaming, vad):
+        """Tout ce qui influence le texte produit, pour la clé du cache des transcriptions"""
+        preprocess_params = self.pipe._preprocess_params if self.pipe is not None else {}
+        return {
+            "model_id": self.model_id,
+            "int8": self.int8,
+            "language": language,
+            "temperature": round(float(temperature), 4),
+            "num_beams": int(num_beams),
+            "dtype": str(self.torch_dtype).replace("torch.", ""),
+            "assisted": self.uses_assistant(num_beams),
+            "return_timestamps": bool(return_timestamps),
+            # Le mode continu fait générer les horodatages, ce qui peut changer le texte
+            "timestamp_tokens": bool(return_timestamps or streaming),
+            "chunk_length_s": preprocess_params.get("chunk_length_s", CHUNK_LENGTH_S),
+            "stride_length_s": preprocess_params.get("stride_length_s", STRIDE_LENGTH_S),
+            "vad": bool(vad),
+            # Absent en mode "stride" : les entrées du cache antérieures restent valables
+            **({"chunking": self.chunking} if self.chunking != "stride" else {}),
+        }
+
+    def pipeline_params(self, language="fr", temperature=0.0, num_beams=1, return_timestamps=False):
+        """Paramètres (prétraitement, inférence, post-traitement) d'un appel au pipeline"""
+        preprocess_params, forward_params, postprocess_params = self.pipe._sanitize_parameters(
+            return_timestamps=return_timestamps,
+            generate_kwargs={
+                "task": "transcribe",
+                "language": language,
+                "temperature": temperature,
+                "num_beams": num_beams
+            }
+        )
+        if self.uses_assistant(num_beams):
+            forward_params["assistant_model"] = self.assistant_model
+        # Les paramètres du pipeline (chunk_length_s, stride_length_s) restent la référence
+        return (
+            {**self.pipe._preprocess_params, **preprocess_params},
+            {**self.pipe._forward_params, **forward_params},
+            {**self.pipe._postprocess_params, **postprocess_params},
+        )
+
+    def window_samples(self, preprocess_params):
+        """(longueur de fenêtre, stride gauche, stride droit) en échantillons, comme le pipeline"""
+        chunk_length_s = preprocess_params.get("chunk_length_s") or 0
+        stride_length_s = preprocess_params.get("stride_length_s")
+        if stride_length_s is None:
+            stride_length_s = chunk_length_s / 6
+        if isinstance(stride_length_s, (int, float)):
+            stride_length_s = [stride_length_s, stride_length_s]
+        sampling_rate = self.pipe.feature_extractor.sampling_rate
+        align_to = getattr(self.model.config, "inputs_to_logits_ratio", 1)
+        return tuple(int(round(seconds * sampling_rate / align_to) * align_to)
+                     for seconds in (chunk_length_s, stride_length_s[0], stride_length_s[1]))
+
+    def chunk_layout(self, n_samples, preprocess_params):
+        """Nombre de segments pour n_samples selon la configuration de découpage"""
+        if not preprocess_params.get("chunk_length_s"):
+            return 1
+        if self.chunking == "silence":
+            # Estimation : les coupes tombent en moyenne au milieu de la zone de recherche
+            chunk_len = self.window_samples(preprocess_params)[0]
+            sampling_rate = self.pipe.feature_extractor.sampling_rate
+            return max(1, math.ceil(n_samples / (chunk_len - SEARCH_S * sampling_rate / 2)))
+        return count_chunks(n_samples, *self.window_samples(preprocess_params))
+
+    def open_audio(self, audio_file, duration=None, vad=False):
+        """Audio d'un fichier : en entier (ou projeté depuis le cache), ou décodé par blocs
+
+        Un long fichier absent du cache audio est lu par un AudioStream. La détection de
+        parole a besoin de tout le signal : avec vad, le fichier est toujours décodé en entier.
+        Un fichier déjà décodé en arrière-plan (prefetch_audio) est repris tel quel.
+        """
+        if self._next_audio is not None and self._next_audio[0] == audio_file:
+            future = self._next_audio[1]
+            self._next_audio = None
+            try:
+                audio = future.result()
+            except Exception:
+                audio = None  # l'erreur éventuelle se reproduira ci-dessous
+            if audio is not None and not (vad and isinstance(audio, AudioStream)):
+                return audio
+        return self._open_audio(audio_file, duration, vad)
+
+    def _open_audio(self, audio_file, duration=None, vad=False):
+        sampling_rate = self.pipe.feature_extractor.sampling_rate
+        cached = self.audio_cache.get(audio_file, sampling_rate) if self.audio_cache is not None else None
+        if cached is not None:
+            return cached
+        if not vad and self.stream_audio_min_s is not None and self.pipe._preprocess_params.get("chunk_length_s"):
+            if duration is None:
+                try:
+                    duration = get_audio_duration(audio_file)
+                except Exception:
+                    duration = 0
+            if duration >= self.stream_audio_min_s:
+                return AudioStream(audio_file, sampling_rate, duration)
+        return self.load_audio(audio_file, sampling_rate)
+
+    def prefetch_audio(self, audio_file, vad=False):
+        """Décoder en arrière-plan le prochain fichier d'un lot pendant la transcription en cours
+
+        Le fichier est décodé (et mis dans le cache audio) par un thread ; transcribe() le
+        reprend sans attendre s'il est prêt. Un fichier assez long pour être décodé par blocs
+        ne l'est pas d'avance.
+        """
+        if self.pipe is None:
+            return
+        if self._prefetch_executor is None:
+            self._prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch-audio")
+        self._next_audio = (audio_file, self._prefetch_executor.submit(self._open_audio, audio_file, None, vad))
+
+    def iter_windows(self, audio, preprocess_params):
+        """Fenêtres (signal, stride, is_last) d'un AudioStream ou du découpage aligné sur les silences"""
+        chunk_len, stride_left, stride_right = self.window_samples(preprocess_params)
+        if self.chunking == "silence":
+            sampling_rate = self.pipe.feature_extractor.sampling_rate
+            blocks = audio.blocks() if isinstance(audio, AudioStream) else [audio]
+            return silence_windows(blocks, chunk_len, int(SEARCH_S * sampling_rate), int(FRAME_S * sampling_rate))
+        return audio.windows(chunk_len, stride_left, stride_right)
+
+    def window_features(self, windows, skip_chunks=0):
+        """Caractéristiques log-mel de chaque fenêtre, comme les calcule pipe.preprocess"""
+        feature_extractor = self.pipe.feature_extractor
+        # Les fenêtres déjà décodées (point de reprise) sont lues mais pas analysées
+        for chunk, stride, is_last in islice(windows, skip_chunks, None):
+            processed = feature_extractor(chunk, sampling_rate=feature_extractor.sampling_rate, return_tensors="pt")
+            if self.pipe.torch_dtype is not None:
+                processed = processed.to(dtype=self.pipe.torch_dtype)
+            yield {"is_last": is_last, "stride": stride, **processed}
+
+    def chunk_features(self, audio, preprocess_params, skip_chunks=0):
+        """Caractéristiques de chaque segment, par le découpage du pipeline ou par fenêtres"""
+        if isinstance(audio, AudioStream) or self.chunking == "silence":
+            return self.window_features(self.iter_windows(audio, preprocess_params), skip_chunks)
+        inputs = {"raw": audio, "sampling_rate": self.pipe.feature_extractor.sampling_rate}
+        features = self.pipe.preprocess(inputs, **preprocess_params)
+        return islice(features, skip_chunks, None) if skip_chunks else features
+
+    def plan_batch_size(self, num_beams=1):
+        """Taille de lot adaptée à la mémoire disponible, au type de données et aux faisceaux"""
+        if self.uses_assistant(num_beams):
+            # La génération assistée ne traite qu'un segment à la fois
+            return 1
+        size = adaptive_batch_size(self.model.config, self.torch_dtype, num_beams, self.device,
+                                   memory_budget_mb=self.memory_budget_mb, upper_bound=self.batch_size)
+        return min(size, self.oom_batch_limits.get(num_beams, size))
+
+    def iter_chunk_outputs(self, audio, preprocess_params, forward_params, batch_size=BATCH_SIZE,
+                           cancel_token=None, metrics=None, skip_chunks=0):
+        """Générer la sortie du modèle de chaque segment, lot par lot, dans l'ordre
+
+        En cas de manque de mémoire, le lot est coupé en deux et rejoué ; la taille réduite
+        est conservée pour les lots suivants (et les prochains fichiers). Avec des processus
+        de calcul, le lot est réparti entre eux et les sorties sont rendues dans l'ordre.
+        metrics (StageMetrics) reçoit les temps des caractéristiques et du modèle, par lot.
+        Les skip_chunks premiers segments (déjà décodés, point de reprise) sont sautés.
+        """
+        features = self.chunk_features(audio, preprocess_params, skip_chunks)
+        if self.prefetch_chunks:
+            # "features" mesure alors l'attente du modèle sur les segments, pas leur préparation
+            features = prefetch(features, self.prefetch_chunks)
+        if metrics is not None:
+            features = metrics.time_iter("features", features)
+        # Le modèle d'ébauche n'est pas transmis aux processus de calcul
+        if self.worker_pool is not None and "assistant_model" not in forward_params:
+            batches = iter_batches(features, max(1, batch_size // self.workers))
+            outputs = self.worker_pool.map_batches(batches, forward_params, cancel_token)
+            yield from metrics.time_iter("inference", outputs) if metrics is not None else outputs
+            return
+
+        collate = pad_collate_fn(self.pipe.tokenizer, self.pipe.feature_extractor)
+        num_beams = forward_params.get("num_beams", 1)
+        batch = []
+        since = metrics.snapshot() if metrics is not None else None
+        for model_inputs in features:
+            batch.append(model_inputs)
+            if len(batch) >= min(batch_size, self.oom_batch_limits.get(num_beams, batch_size)):
+                yield from self._forward_batch(batch, collate, forward_params, cancel_token, metrics)
+                if metrics is not None:
+                    metrics.add_batch(len(batch), since)
+                    since = metrics.snapshot()
+                batch = []
+        if batch:
+            yield from self._forward_batch(batch, collate, forward_params, cancel_token, metrics)
+            if metrics is not None:
+                metrics.add_batch(len(batch), since)
+
+    def _forward_batch(self, batch, collate, forward_params, cancel_token=None, metrics=None):
+        """Exécuter le modèle sur un lot de segments et rendre leurs sorties une à une"""
+        if cancel_token is not None:
+            if cancel_token.cancelled:
+                raise TranscriptionCancelled()
+            forward_params = {
+                **forward_params,
+                "stopping_criteria": StoppingCriteriaList([CancellationStoppingCriteria(cancel_token)])
+            }
+        try:
+            # Le temps de l'encodeur est mesuré à part (track_module) : "decoder" couvre la génération
+            with metrics.stage("decoder") if metrics is not None else nullcontext():
+                outputs = self.pipe.forward(collate(batch), **forward_params)
+        except Exception as e:
+            if not is_out_of_memory(e) or len(batch) == 1:
+                raise
+            outputs = None
+        if outputs is None:
+            # Manque de mémoire : rejouer le lot en deux moitiés plutôt qu'abandonner le fichier
+            release_memory()
+            half = len(batch) // 2
+            num_beams = forward_params.get("num_beams", 1)
+            if half < self.oom_batch_limits.get(num_beams, len(batch)):
+                self.oom_batch_limits[num_beams] = half
+                print(f"Mémoire insuffisante : lots réduits à {half} segment(s)")
+            yield from self._forward_batch(batch[:half], collate, forward_params, cancel_token, metrics)
+            yield from self._forward_batch(batch[half:], collate, forward_params, cancel_token, metrics)
+            return
+
+        # Un lot interrompu en cours de décodage est incomplet : on l'écarte
+        if cancel_token is not None and cancel_token.cancelled:
+            raise TranscriptionCancelled()
+        for i in range(len(batch)):
+            yield unbatch_output(outputs, i)
+
+    def stitch_outputs(self, model_outputs, postprocess_params):
+        """Assembler les sorties des segments en un résultat (texte, et phrases horodatées)
+
+        En mode "stride", le pipeline fusionne les zones de recouvrement. Les fenêtres
+        alignées sur les silences ne se recouvrent pas : chacune est décodée seule et ses
+        horodatages sont décalés du début de la fenêtre, sans recherche de recouvrement qui
+        pourrait fusionner à tort deux fenêtres voisines.
+        """
+        if self.chunking != "silence":
+            return self.pipe.postprocess(model_outputs, **postprocess_params)
+        sampling_rate = self.pipe.feature_extractor.sampling_rate
+        texts = []
+        chunks = []
+        offset_s = 0.0
+        for output in model_outputs:
+            window_s = output["stride"][0] / sampling_rate
+            decoded = self.pipe.postprocess([dict(output)], **postprocess_params)
+            texts.append(decoded["text"])
+            for chunk in decoded.get("chunks", []):
+                start, end = chunk["timestamp"]
+                chunks.append({**chunk, "timestamp": (offset_s + (start or 0.0),
+                                                      offset_s + (end if end is not None else window_s))})
+            offset_s += window_s
+        result = {"text": "".join(texts)}
+        if postprocess_params.get("return_timestamps"):
+            result["chunks"] = chunks
+        return result
+
+    def decode_chunk(self, output, offset_s, owned_s):
+        """Décoder un segment seul et garder les phrases qui commencent dans sa zone propre
+
+        Les zones de recouvrement (stride) appartiennent au segment voisin : on ne garde que
+        les phrases qui débutent dans [0, owned_s) pour ne pas dupliquer de texte.
+        """
+        decoded = self.pipe.postprocess([dict(output)], return_timestamps=True)
+        chunks = []
+        for chunk in decoded.get("chunks", []):
+            start, end = chunk["timestamp"]
+            start = start or 0.0
+            if start < 0 or start >= owned_s:
+                continue
+            end = offset_s + (end if end is not None else owned_s)
+            chunks.append({"text": chunk["text"], "timestamp": (offset_s + start, end)})
+        return chunks
+
+    def run_pipeline(self, audio_file, language="fr", temperature=0.0, num_beams=1, return_timestamps=False,
+                     progress_callback=None, audio=None, chunk_callback=None, cancel_token=None, metrics=None,
+                     checkpoint=None):
+        """Exécuter le pipeline sur un fichier et retourner sa sortie brute
+
+        progress_callback(progress) reçoit un TranscriptionProgress après chaque lot de segments.
+        chunk_callback(chunks) active le mode continu : il reçoit la liste des phrases horodatées
+        ({"text", "timestamp"}) de chaque segment dès qu'il est décodé. Dans ce mode le modèle
+        génère toujours les horodatages afin de pouvoir écarter les zones de recouvrement.
+        cancel_token (CancellationToken) est vérifié entre les lots et pendant le décodage ;
+        l'annulation lève TranscriptionCancelled avec le texte des segments déjà terminés.
+        metrics (StageMetrics) reçoit le temps et la mémoire de chaque étape.
+        checkpoint (ChunkCheckpoint) reçoit la sortie de chaque segment terminé ; les segments
+        qu'il contient déjà ne sont pas recalculés.
+        """
+        if self.pipe is None:
+            raise RuntimeError("Le modèle n'est pas chargé")
+
+        if audio is None:
+            audio = self.load_audio(audio_file, self.pipe.feature_extractor.sampling_rate)
+        sampling_rate = self.pipe.feature_extractor.sampling_rate
+        preprocess_params, forward_params, postprocess_params = self.pipeline_params(
+            language, temperature, num_beams, return_timestamps)
+
+        if chunk_callback is not None:
+            forward_params["return_timestamps"] = True
+
+        progress = TranscriptionProgress(self.chunk_layout(len(audio), preprocess_params), len(audio) / sampling_rate)
+        if progress_callback is not None:
+            progress_callback(progress)
+
+        model_outputs = checkpoint.load() if checkpoint is not None else []
+        # Segments repris : rediffusés pour que l'affichage et la progression soient complets
+        for output in model_outputs:
+            self._report_chunk(output, audio, progress, progress_callback, chunk_callback, metrics)
+
+        batch_size = self.plan_batch_size(num_beams)
+        chunk_outputs = self.iter_chunk_outputs(audio, preprocess_params, forward_params,
+                                                batch_size=batch_size, cancel_token=cancel_token, metrics=metrics,
+                                                skip_chunks=len(model_outputs))
+        encoder_tracking = nullcontext()
+        if metrics is not None:
+            encoder_tracking = metrics.track_module(self.model.get_encoder(), "encoder")
+        try:
+            with encoder_tracking:
+                for output in chunk_outputs:
+                    model_outputs.append(output)
+                    if checkpoint is not None:
+                        checkpoint.append(output)
+                    self._report_chunk(output, audio, progress, progress_callback, chunk_callback, metrics)
+        except TranscriptionCancelled:
+            partial = self.stitch_outputs(model_outputs, postprocess_params) if model_outputs else ""
+            raise TranscriptionCancelled(partial_result=partial)
+
+        with metrics.stage("postprocess") if metrics is not None else nullcontext():
+            return self.stitch_outputs(model_outputs, postprocess_params)
+
+    def _report_chunk(self, output, audio, progress, progress_callback=None, chunk_callback=None,
+                      metrics=None):
+        """Faire avancer la progression et diffuser le texte d'un segment terminé"""
+        sampling_rate = self.pipe.feature_extractor.sampling_rate
+        stride = output.get("stride")
+        if stride is not None:
+            chunk_samples, stride_left, stride_right = stride
+            audio_s = (chunk_samples - stride_left - stride_right) / sampling_rate
+        else:
+            audio_s = len(audio) / sampling_rate
+        if chunk_callback is not None:
+            with metrics.stage("postprocess") if metrics is not None else nullcontext():
+                chunks = self.decode_chunk(output, progress.audio_done_s, audio_s)
+            chunk_callback(chunks)
+        progress.advance(1, audio_s)
+        if progress_callback is not None:
+            progress_callback(progress)
+
+    def transcribe(self, audio_file, language="fr", temperature=0.0, num_beams=1,
+                   return_timestamps=False, duration=None, progress_callback=None, chunk_callback=None,
+                   cancel_token=None, vad=False, use_result_cache=True):
+        """Transcrire un fichier et retourner (résultat, métadonnées)
+
+        En cas d'annulation, TranscriptionCancelled porte le résultat partiel normalisé et
+        ses métadonnées (avec "cancelled": True).
+        Avec vad=True, seules les zones de parole détectées sont transcrites et les
+        horodatages sont replacés sur la chronologie d'origine.
+        Si un cache des transcriptions est configuré et use_result_cache est vrai, un fichier
+        déjà transcrit avec les mêmes paramètres est rendu sans inférence.
+        Avec des points de reprise (checkpoints), une transcription interrompue (annulation,
+        erreur, arrêt du processus) relancée avec les mêmes paramètres reprend après le
+        dernier segment terminé ; metadata["resumed_chunks"] indique les segments repris.
+        """
+        cache_params = self.result_cache_params(language, temperature, num_beams, return_timestamps,
+                                                chunk_callback is not None, vad)
+        if self.result_cache is not None and use_result_cache:
+            cached = self.result_cache.get(audio_file, cache_params)
+            if cached is not None:
+                return cached
+
+        start_time = time.time()
+        checkpoint = self.checkpoints.open(audio_file, cache_params) if self.checkpoints is not None else None
+        metrics = StageMetrics()
+        # Un long fichier est décodé par blocs pendant la transcription (étape "features")
+        with metrics.stage("decode_audio"):
+            audio = self.open_audio(audio_file, duration, vad)
+        if duration is None:
+            duration = len(audio) / SAMPLING_RATE
+
+        timeline = None
+        if vad:
+            with metrics.stage("vad"):
+                timeline = SpeechTimeline.from_audio(audio, SAMPLING_RATE)
+            audio = timeline.audio
+            if chunk_callback is not None:
+                stream_callback = chunk_callback
+                chunk_callback = lambda chunks: stream_callback(timeline.remap_chunks(chunks))
+
+        def build_metadata():
+            metadata = {
+                "source_file": audio_file,
+                "date": datetime.now(),
+                "language": language,
+                "duration": duration,
+                "processing_time": time.time() - start_time,
+                "has_timestamps": return_timestamps
+            }
+            if timeline is not None:
+                metadata["speech_duration"] = timeline.speech_duration
+            if checkpoint is not None and checkpoint.resumed:
+                metadata["resumed_chunks"] = checkpoint.resumed
+            metadata["metrics"] = metrics.summary()
+            return metadata
+
+        def finalize(raw_result):
+            if timeline is not None and isinstance(raw_result, dict) and "chunks" in raw_result:
+                raw_result["chunks"] = timeline.remap_chunks(raw_result["chunks"])
+            return normalize_result(raw_result)
+
+        # Aucune parole détectée : inutile de solliciter le modèle
+        if timeline is not None and len(audio) == 0:
+            empty_result = {"text": "", "chunks": []} if return_timestamps else {"text": ""}
+            metadata = build_metadata()
+            log_metrics(metadata)
+            return normalize_result(empty_result), metadata
+
+        try:
+            raw_result = self.run_pipeline(audio_file, language, temperature, num_beams, return_timestamps,
+                                           progress_callback=progress_callback, audio=audio,
+                                           chunk_callback=chunk_callback, cancel_token=cancel_token,
+                                           metrics=metrics, checkpoint=checkpoint)
+        except TranscriptionCancelled as e:
+            metadata = build_metadata()
+            metadata["cancelled"] = True
+            log_metrics(metadata)
+            raise TranscriptionCancelled(finalize(e.partial_result), metadata)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+        if checkpoint is not None:
+            checkpoint.remove()
+        transcription_result, metadata = finalize(raw_result), build_metadata()
+        log_metrics(metadata)
+        if self.result_cache is not None and use_result_cache:
+            self.result_cache.put(audio_file, cache_params, transcription_result, metadata)
+        return transcription_result, metadata
+
+    def transcribe_batch(self, requests, cancel_token=None):
+        """Transcrire une série de fichiers en partageant les lots du modèle entre fichiers
+
+        requests est un itérable de (clé, fichier, paramètres), les paramètres étant ceux de
+        transcribe() (language, temperature, num_beams, return_timestamps, vad,
+        use_result_cache). Les segments des fichiers courts sont regroupés par paramètres de
+        décodage en lots complets (BatchScheduler) : un message de 20 s n'occupe plus un lot
+        à lui seul. Génère (clé, résultat, métadonnées, erreur) dès qu'un fichier est terminé,
+        pas forcément dans l'ordre des demandes ; l'erreur d'un fichier n'arrête pas les autres.
+        Les fichiers de plus de CROSS_BATCH_MAX_S secondes remplissent déjà leurs lots : ils
+        sont transcrits seuls par transcribe(). Les demandes sont lues au fur et à mesure et
+        le fichier suivant est préparé (décodage, caractéristiques) pendant l'inférence.
+        Avec des processus de calcul, chacun reçoit un lot à chaque appel au modèle.
+        Chaque fichier a ses propres mesures (metadata["metrics"]) : le temps d'un appel au
+        modèle est réparti entre ses fichiers au prorata de leurs segments. Les fichiers
+        courts n'ont pas de point de reprise : interrompus, ils sont retranscrits en entier.
+        """
+        if self.pipe is None:
+            raise RuntimeError("Le modèle n'est pas chargé")
+        collate = pad_collate_fn(self.pipe.tokenizer, self.pipe.feature_extractor)
+        workers = self.workers if self.worker_pool is not None else 1
+        groups = {}  # groupe -> (paramètres d'inférence, taille de lot)
+        files = {}  # index de la demande -> fichier dont les segments sont en cours
+
+        def batch_size(group):
+            size = groups[group][1]
+            return min(size, self.oom_batch_limits.get(group[2], size))
+
+        def forward(group, batches, keys):
+            forward_params = groups[group][0]
+            metrics = StageMetrics()
+            if self.worker_pool is not None and "assistant_model" not in forward_params:
+                outputs = list(metrics.time_iter("inference",
+                                                 self.worker_pool.map_batches(batches, forward_params, cancel_token)))
+            else:
+                outputs = []
+                with metrics.track_module(self.model.get_encoder(), "encoder"):
+                    for batch in batches:
+                        outputs.extend(self._forward_batch(batch, collate, forward_params, cancel_token, metrics))
+            self._share_batch_metrics(metrics, [key for batch_keys in keys for key in batch_keys], files)
+            return outputs
+
+        scheduler = BatchScheduler(forward, batch_size, batches_per_call=workers)
+        prepared = (self._prepare_batch_file(index, *request) for index, request in enumerate(requests))
+        if self.prefetch_chunks:
+            prepared = prefetch(prepared, PREFETCH_FILES)
+        try:
+            for item in prepared:
+                if "error" in item:
+                    yield item["key"], None, None, item["error"]
+                elif "cached" in item:
+                    yield (item["key"], *item["cached"], None)
+                elif "features" not in item:
+                    # Fichier long : transcrit seul, sans attendre les lots partagés
+                    try:
+                        result, metadata = self.transcribe(item["audio_file"], duration=item["duration"],
+                                                           cancel_token=cancel_token, **item["params"])
+                    except TranscriptionCancelled:
+                        raise
+                    except Exception as e:
+                        yield item["key"], None, None, e
+                        continue
+                    yield item["key"], result, metadata, None
+                else:
+                    features = item.pop("features")
+                    if not features:
+                        yield self._finish_batch_file(item, [])
+                        continue
+                    group = item["group"]
+                    if group not in groups:
+                        # Le lot planifié est partagé entre les processus de calcul
+                        groups[group] = (item["forward_params"], max(1, self.plan_batch_size(group[2]) // workers))
+                    files[item["index"]] = item
+                    for slot, error in scheduler.add(item["index"], group, features):
+                        yield self._finish_batch_file(files.pop(slot.key), slot.outputs, error)
+            for slot, error in scheduler.flush():
+                yield self._finish_batch_file(files.pop(slot.key), slot.outputs, error)
+        finally:
+            prepared.close()
+
+    def _prepare_batch_file(self, index, key, audio_file, params):
+        """Préparer un fichier de transcribe_batch : résultat en cache, fichier long, ou segments"""
+        item = {"index": index, "key": key, "audio_file": audio_file, "params": params, "start_time": time.time()}
+        options = {"language": "fr", "temperature": 0.0, "num_beams": 1, "return_timestamps": False,
+                   "vad": False, "use_result_cache": True, **params}
+        try:
+            item["cache_params"] = self.result_cache_params(options["language"], options["temperature"],
+                                                            options["num_beams"], options["return_timestamps"],
+                                                            False, options["vad"])
+            if self.result_cache is not None and options["use_result_cache"]:
+                cached = self.result_cache.get(audio_file, item["cache_params"])
+                if cached is not None:
+                    item["cached"] = cached
+                    return item
+            metrics = StageMetrics()
+            with metrics.stage("decode_audio"):
+                duration = get_audio_duration(audio_file, self.audio_cache)
+                item["duration"] = duration
+                if duration > CROSS_BATCH_MAX_S:
+                    return item
+                audio = self.open_audio(audio_file, duration, options["vad"])
+            item["metrics"] = metrics
+            item["duration"] = duration or len(audio) / SAMPLING_RATE
+            if options["vad"]:
+                with metrics.stage("vad"):
+                    item["timeline"] = SpeechTimeline.from_audio(audio, SAMPLING_RATE)
+                audio = item["timeline"].audio
+            preprocess_params, item["forward_params"], item["postprocess_params"] = self.pipeline_params(
+                options["language"], options["temperature"], options["num_beams"], options["return_timestamps"])
+            # Seuls les segments d'un même groupe partagent un lot
+            item["group"] = (options["language"], round(float(options["temperature"]), 4),
+                             int(options["num_beams"]), bool(options["return_timestamps"]))
+            with metrics.stage("features"):
+                item["features"] = list(self.chunk_features(audio, preprocess_params)) if len(audio) else []
+        except Exception as e:
+            item["error"] = e
+        return item
+
+    def _finish_batch_file(self, item, outputs, error=None):
+        """Assembler le résultat d'un fichier de transcribe_batch dont tous les segments sont décodés"""
+        if isinstance(error, TranscriptionCancelled):
+            raise error
+        if error is not None:
+            return item["key"], None, None, error
+        options = {"language": "fr", "return_timestamps": False, "use_result_cache": True, **item["params"]}
+        timeline = item.get("timeline")
+        metrics = item["metrics"]
+        try:
+            if outputs:
+                with metrics.stage("postprocess"):
+                    raw_result = self.stitch_outputs(outputs, item["postprocess_params"])
+            else:
+                # Aucune parole détectée : le modèle n'a pas été sollicité
+                raw_result = {"text": "", "chunks": []} if options["return_timestamps"] else {"text": ""}
+            if timeline is not None and isinstance(raw_result, dict) and "chunks" in raw_result:
+                raw_result["chunks"] = timeline.remap_chunks(raw_result["chunks"])
+            result = normalize_result(raw_result)
+        except Exception as e:
+            return item["key"], None, None, e
+        metadata = {
+            "source_file": item["audio_file"],
+            "date": datetime.now(),
+            "language": options["language"],
+            "duration": item["duration"],
+            "processing_time": time.time() - item["start_time"],
+            "has_timestamps": options["return_timestamps"]
+        }
+        if timeline is not None:
+            metadata["speech_duration"] = timeline.speech_duration
+        metadata["metrics"] = metrics.summary()
+        log_metrics(metadata)
+        if self.result_cache is not None and options["use_result_cache"]:
+            self.result_cache.put(item["audio_file"], item["cache_params"], result, metadata)
+        return item["key"], result, metadata, None
+
+    def _share_batch_metrics(self, metrics, keys, files):
+        """Répartir les mesures d'un appel au modèle entre ses fichiers, au prorata de leurs segments"""
+        counts = {}
+        for key in keys:
+            counts[key] = counts.get(key, 0) + 1
+        for key, chunks in counts.items():
+            file_metrics = files[key]["metrics"]
+            share = chunks / len(keys)
+            batch = {"index": len(file_metrics.batches), "chunks": chunks, "shared_chunks": len(keys)}
+            for name, stage in metrics.stages.items():
+                file_metrics.add(name, stage["wall_s"] * share, stage["cpu_s"] * share)
+                batch[name] = {"wall_s": round(stage["wall_s"] * share, 4), "cpu_s": round(stage["cpu_s"] * share, 4)}
+            file_metrics.batches.append(batch)
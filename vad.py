@@ -0,0 +1,136 @@
+import bisect
+import numpy as np
+
+# Paramètres par défaut de la détection d'activité vocale (VAD) par énergie
+FRAME_S = 0.03
+THRESHOLD_MARGIN_DB = 12.0
+# Percentile de l'énergie pris comme niveau de crête de la parole (robuste aux clics)
+PEAK_PERCENTILE = 95
+ABSOLUTE_FLOOR_DB = -55.0
+MIN_SPEECH_S = 0.25
+MIN_SILENCE_S = 0.6
+PADDING_S = 0.2
+# Silence inséré entre deux zones de parole lors de leur concaténation
+GAP_S = 0.3
+
+
+def frame_energy_db(audio, frame_len):
+    """Énergie RMS (en dB) de chaque trame de frame_len échantillons"""
+    n_frames = int(np.ceil(len(audio) / frame_len))
+    padded = np.zeros(n_frames * frame_len, dtype=np.float32)
+    padded[:len(audio)] = audio
+    frames = padded.reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def _runs(mask):
+    """Liste des intervalles [début, fin) où mask est vrai"""
+    if not len(mask):
+        return []
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def detect_speech_regions(audio, sampling_rate=16000, frame_s=FRAME_S, margin_db=THRESHOLD_MARGIN_DB,
+                          floor_db=ABSOLUTE_FLOOR_DB, min_speech_s=MIN_SPEECH_S, min_silence_s=MIN_SILENCE_S,
+                          padding_s=PADDING_S):
+    """Détecter les zones de parole d'un signal mono et les retourner en échantillons [début, fin)
+
+    Le seuil s'adapte au bruit de fond de l'enregistrement (10e percentile de l'énergie des
+    trames + margin_db) sans descendre sous floor_db ni dépasser la crête de la parole
+    (PEAK_PERCENTILE) - margin_db. Si le bruit de fond ne se distingue pas de la parole
+    (écart inférieur à margin_db : parole continue, faible dynamique), tout le signal est
+    gardé plutôt que de risquer de l'écarter. Les silences plus courts que
+    min_silence_s sont comblés, les zones de parole plus courtes que min_speech_s écartées
+    et chaque zone est élargie de padding_s pour ne pas couper les attaques de mots.
+    """
+    if len(audio) == 0:
+        return []
+
+    frame_len = max(1, int(round(frame_s * sampling_rate)))
+    energy = frame_energy_db(audio, frame_len)
+    noise_db = float(np.percentile(energy, 10))
+    peak_db = float(np.percentile(energy, PEAK_PERCENTILE))
+    if peak_db <= floor_db:
+        return []
+    if peak_db - noise_db < margin_db:
+        return [(0, len(audio))]
+    threshold = max(floor_db, min(noise_db + margin_db, peak_db - margin_db))
+    speech = energy > threshold
+
+    # Combler les courts silences à l'intérieur de la parole
+    min_silence_frames = int(round(min_silence_s / frame_s))
+    for start, end in _runs(~speech):
+        if start > 0 and end < len(speech) and end - start < min_silence_frames:
+            speech[start:end] = True
+
+    # Écarter les bruits trop courts pour être de la parole
+    min_speech_frames = int(round(min_speech_s / frame_s))
+    regions = []
+    padding = int(round(padding_s * sampling_rate))
+    for start, end in _runs(speech):
+        if end - start < min_speech_frames:
+            continue
+        region_start = max(0, start * frame_len - padding)
+        region_end = min(len(audio), end * frame_len + padding)
+        if regions and region_start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], region_end)
+        else:
+            regions.append((region_start, region_end))
+    return regions
+
+
+class SpeechTimeline:
+    """Audio réduit aux zones de parole et correspondance avec la chronologie d'origine"""
+
+    def __init__(self, audio, regions, sampling_rate=16000, gap_s=GAP_S):
+        self.sampling_rate = sampling_rate
+        self.regions = regions
+        self.original_duration = len(audio) / sampling_rate
+
+        gap = np.zeros(int(round(gap_s * sampling_rate)), dtype=np.float32)
+        pieces = []
+        # Début de chaque zone dans l'audio réduit et dans l'audio d'origine (en secondes)
+        self.compact_starts = []
+        self.original_starts = []
+        self.region_lengths = []
+        position = 0
+        for index, (start, end) in enumerate(regions):
+            if index:
+                pieces.append(gap)
+                position += len(gap)
+            pieces.append(np.asarray(audio[start:end], dtype=np.float32))
+            self.compact_starts.append(position / sampling_rate)
+            self.original_starts.append(start / sampling_rate)
+            self.region_lengths.append((end - start) / sampling_rate)
+            position += end - start
+        self.audio = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+
+    @classmethod
+    def from_audio(cls, audio, sampling_rate=16000, **vad_kwargs):
+        """Construire la chronologie à partir de la détection de parole"""
+        return cls(audio, detect_speech_regions(audio, sampling_rate, **vad_kwargs), sampling_rate)
+
+    @property
+    def speech_duration(self):
+        return sum(self.region_lengths)
+
+    def to_original(self, t):
+        """Convertir un instant de l'audio réduit en instant de l'enregistrement d'origine"""
+        if t is None or not self.compact_starts:
+            return t
+        index = max(0, bisect.bisect_right(self.compact_starts, t) - 1)
+        # Un instant tombant dans le silence inséré est rattaché à la fin de la zone précédente
+        offset = min(t - self.compact_starts[index], self.region_lengths[index])
+        return self.original_starts[index] + max(0.0, offset)
+
+    def remap_chunks(self, chunks):
+        """Replacer les horodatages d'une liste de phrases sur la chronologie d'origine"""
+        remapped = []
+        for chunk in chunks:
+            start, end = chunk.get("timestamp", (0.0, None))
+            remapped.append({**chunk, "timestamp": (self.to_original(start), self.to_original(end))})
+        return remapped